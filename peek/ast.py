@@ -1,6 +1,6 @@
 from abc import ABCMeta, abstractmethod
 from contextlib import contextmanager
-from typing import List, Union
+from typing import List, Optional, Union
 
 from peek.common import PeekToken
 
@@ -80,6 +80,9 @@ class Visitor(metaclass=ABCMeta):
 
 
 class Node(metaclass=ABCMeta):
+    # Text of a top level statement as it was written, set by the parser
+    source: Optional[str] = None
+
     @abstractmethod
     def accept(self, visitor: Visitor):
         pass
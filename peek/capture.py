@@ -1,10 +1,37 @@
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
 from abc import ABCMeta
 
+_logger = logging.getLogger(__name__)
+
+# Size of the write buffer of capture files
+CAPTURE_BUFFER_SIZE = 1024 * 1024
+
+# Maximum number of characters waiting to be written. Text captured beyond it, e.g. when the disk cannot keep up,
+# is dropped instead of growing memory without bound.
+CAPTURE_MAX_PENDING = 64 * 1024 * 1024
+
+# Files with these extensions are captured and replayed as one JSON object per statement
+STRUCTURED_CAPTURE_EXTENSIONS = ('.ndjson', '.jsonl')
+
 
 class Capture(metaclass=ABCMeta):
+    # Whether statements are recorded as structured entries instead of free text
+    structured = False
+
     def stop(self):
         pass
 
+    def record(self, entry: dict):
+        pass
+
     def status(self):
         pass
 
@@ -30,3 +57,150 @@ class FileCapture(Capture):
 
     def file(self):
         return self.outs
+
+
+class _QueueWriter(io.TextIOBase):
+    def __init__(self, put):
+        self._put = put
+
+    def write(self, s):
+        self._put(s)
+        return len(s)
+
+
+class BufferedFileCapture(Capture):
+    """
+    Hand captured text over to a background thread that writes it with a large buffer, so that capturing large
+    output does not hold up the session. The file can be rotated by size or age. Rotated files are optionally
+    gzipped and only the latest few are kept if so configured.
+    """
+
+    def __init__(self, f, max_bytes=0, interval=0.0, compress=False, backup_count=0):
+        self.f = f
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = compress
+        self.backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+        self._writer = _QueueWriter(self._put)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._dropped = 0
+        self._failed = 0
+        self._last_error = None
+        self._rotated = []
+        self._index = 0
+        # Opened here so that errors such as a bad path are reported when the capture starts
+        self._outs = self._open()
+        self._thread = threading.Thread(target=self._run, name='peek-capture', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def status(self):
+        status = f'Capture with file: {self.f}'
+        if self.max_bytes or self.interval:
+            status += f' (rotated {self._index} times)'
+        if self._failed:
+            status += f' ({self._failed} writes failed, last error: {self._last_error})'
+        if self._dropped:
+            status += f' ({self._dropped} writes dropped as writing fell behind)'
+        return status
+
+    def file(self):
+        return self._writer
+
+    def _put(self, text):
+        with self._pending_lock:
+            # A single large text is still taken when nothing else is waiting
+            if self._pending and self._pending + len(text) > CAPTURE_MAX_PENDING:
+                if not self._dropped:
+                    _logger.warning(f'Capture file {self.f!r} is not written fast enough, dropping captured text')
+                self._dropped += 1
+                return
+            self._pending += len(text)
+        self._queue.put(text)
+
+    def _run(self):
+        while True:
+            text = self._queue.get()
+            if text is None:
+                break
+            with self._pending_lock:
+                self._pending -= len(text)
+            try:
+                self._write(text)
+            except Exception as e:
+                # Keep going so that a failure, e.g. a full disk, does not leave captured text piling up
+                self._on_error(e)
+        try:
+            self._outs.close()
+        except Exception as e:
+            _logger.error(f'Error on closing capture file: {e}')
+
+    def _on_error(self, e: Exception):
+        self._failed += 1
+        self._last_error = e
+        _logger.error(f'Error on writing capture file: {e}')
+
+    def _write(self, text):
+        # Only rotate between lines so that each file can be read on its own
+        if self._at_line_start and (
+            (self.max_bytes and self._size >= self.max_bytes)
+            or (self.interval and time.monotonic() - self._opened_at >= self.interval)
+        ):
+            try:
+                self._rotate()
+            except Exception as e:
+                # Rotation is tried again at the next line
+                self._on_error(e)
+        if self._outs.closed:
+            # Left closed by a failed rotation. Carry on with the current file.
+            self._outs = self._open(append=True)
+        self._outs.write(text)
+        self._size += len(text.encode('utf-8'))
+        self._at_line_start = text.endswith('\n')
+
+    def _rotate(self):
+        self._outs.close()
+        closed = self._segment_path(self._index)
+        if self.compress:
+            with open(closed, 'rb') as ins, gzip.open(f'{closed}.gz', 'wb') as outs:
+                shutil.copyfileobj(ins, outs)
+            os.remove(closed)
+            closed = f'{closed}.gz'
+        self._rotated.append(closed)
+        while self.backup_count and len(self._rotated) > self.backup_count:
+            os.remove(self._rotated.pop(0))
+        self._index += 1
+        self._outs = self._open()
+
+    def _open(self, append=False):
+        path = self._segment_path(self._index)
+        outs = open(path, 'a' if append else 'w', buffering=CAPTURE_BUFFER_SIZE, encoding='utf-8')
+        self._size = outs.tell() if append else 0
+        self._at_line_start = True
+        self._opened_at = time.monotonic()
+        return outs
+
+    def _segment_path(self, index):
+        return self.f if index == 0 else f'{self.f}.{index}'
+
+
+class StructuredCapture(BufferedFileCapture):
+    """
+    Record one JSON object per statement, with its input, timing and outcome, instead of the session text
+    """
+
+    structured = True
+
+    def status(self):
+        return super().status().replace('Capture with file', 'Structured capture with file', 1)
+
+    def file(self):
+        return None
+
+    def record(self, entry: dict):
+        self._writer.write(json.dumps(entry, separators=(',', ':')) + '\n')
@@ -1,10 +1,18 @@
 """Console script for peek."""
 import argparse
+import contextlib
+import copy
+import getpass
+import io
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 from peek import __version__
-from peek.config import config_location
-from peek.peekapp import PeekApp
+from peek.profiling import PROFILE_STARTUP_ENV, STARTUP_IMPORTS, StartupProfiler
+
+# Seconds to wait for the background schema load before printing the startup report
+SCHEMA_LOAD_PROFILE_TIMEOUT = 60
 
 
 def main():
@@ -13,7 +21,8 @@ def main():
 
     parser.add_argument('input', nargs='*', help='script files')
 
-    parser.add_argument('--config', default=config_location() + 'peekrc', help='Configuration file to load')
+    # No default here so that importing peek.config, and configobj with it, is timed with the other imports
+    parser.add_argument('--config', help='Configuration file to load (default peekrc in config folder)')
 
     parser.add_argument('-e', '--extra-config-option', action='append', help='Extra configuration option to override')
 
@@ -42,33 +51,134 @@ def main():
         '--no_prompt', action='store_true', default=argparse.SUPPRESS, help='Do not prompt for password'
     )
     parser.add_argument('-z', '--zero_connection', action='store_true', help='Start the session with no connection')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help='Number of script files to run concurrently in separate processes'
+    )
+    parser.add_argument(
+        '--serve', action='store_true', help='Keep the session running to execute statements sent with --client'
+    )
+    parser.add_argument(
+        '--client', action='store_true', help='Send statements to a running --serve session and print the output'
+    )
+    parser.add_argument('--socket', help='UNIX socket of the --serve session (default peek.sock in config folder)')
+
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help=f'Report time spent on imports and each startup phase to stderr (or set {PROFILE_STARTUP_ENV})',
+    )
+    parser.add_argument(
+        '--profile-startup-format', choices=('table', 'json'), default='table', help='Format of the startup report'
+    )
 
     parser.add_argument('-V', '--version', action='version', version=__version__)
 
     ns = parser.parse_args()
 
+    if ns.client:
+        from peek.daemon import default_socket_path, run_client
+
+        return run_client(ns.socket or default_socket_path(), _open_inputs(ns.input) if ns.input else [sys.stdin])
+
     isatty = sys.stdin.isatty()
-    batch_mode = (not isatty) or bool(ns.input)
+    batch_mode = (not isatty) or bool(ns.input) or ns.serve
+
+    if ns.jobs > 1 and len(ns.input) > 1:
+        return _run_scripts_concurrently(ns)
+
+    # The environment variable can be set to either "json" or any other non-empty value for the table format
+    profile_env = os.environ.get(PROFILE_STARTUP_ENV, '')
+    profiler = StartupProfiler(enabled=ns.profile_startup or bool(profile_env))
+    profiler.time_imports(STARTUP_IMPORTS)
+    from peek.peekapp import PeekApp
 
     peek = PeekApp(
         batch_mode=batch_mode,
         config_file=ns.config,
         extra_config_options=ns.extra_config_option,
         cli_ns=ns,
+        startup_profiler=profiler,
     )
-    if not batch_mode:
+    if profiler.enabled:
+        if not batch_mode:
+            # The schema is loaded in the background. Wait for it so that its time is part of the report.
+            peek.completer.wait_for_api_completer(SCHEMA_LOAD_PROFILE_TIMEOUT)
+        fmt = 'json' if profile_env.lower() == 'json' else ns.profile_startup_format
+        print(profiler.report(fmt), file=sys.stderr)
+        profiler.enabled = False
+    if ns.serve:
+        from peek.daemon import default_socket_path
+
+        try:
+            peek.serve(ns.socket or default_socket_path())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            peek.on_exit()
+    elif not batch_mode:
         peek.run()
     else:
-        if ns.input:
-            for f in ns.input:
-                with open(f) as ins:
-                    peek.process_input(ins.read())
-        else:
-            stdin_read = sys.stdin.read()
-            peek.process_input(stdin_read)
+        try:
+            if ns.input:
+                for f in ns.input:
+                    with open(f) as ins:
+                        peek.process_stream(ins)
+            else:
+                peek.process_stream(sys.stdin)
+        finally:
+            peek.on_exit()
+        # Same exit status as running the scripts with --jobs
+        return 1 if peek.error_count else 0
 
     return 0
 
 
+def _open_inputs(paths):
+    for f in paths:
+        with open(f) as ins:
+            yield ins
+
+
+def _run_scripts_concurrently(ns):
+    """
+    Run each script file in its own worker process with a separate PeekApp. Output of each script is collected
+    and printed under a header of its file name in the order the files are given. Return non-zero if any
+    statement failed in any of the scripts.
+    """
+    ns = copy.copy(ns)
+    # Workers cannot prompt since they do not own the terminal. Ask only once here if required.
+    if getattr(ns, 'force_prompt', False):
+        ns.password = getpass.getpass('Please enter password: ')
+        del ns.force_prompt
+    ns.no_prompt = True
+
+    failed = False
+    with ProcessPoolExecutor(max_workers=min(ns.jobs, len(ns.input))) as executor:
+        futures = [executor.submit(_run_script, f, ns) for f in ns.input]
+        for f, future in zip(ns.input, futures):
+            print(f'=== {f}')
+            try:
+                output, error_count = future.result()
+            except Exception as e:
+                output, error_count = f'{e}\n', 1
+            print(output, end='' if output.endswith('\n') or not output else '\n', flush=True)
+            failed = failed or error_count > 0
+    return 1 if failed else 0
+
+
+def _run_script(f, ns):
+    from peek.peekapp import PeekApp
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        peek = PeekApp(batch_mode=True, config_file=ns.config, extra_config_options=ns.extra_config_option, cli_ns=ns)
+        try:
+            with open(f) as ins:
+                peek.process_stream(ins)
+        finally:
+            peek.on_exit()
+    return out.getvalue(), peek.error_count
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
@@ -6,6 +6,10 @@ HTTP_METHODS = ['get', 'post', 'put', 'delete', 'head']
 AUTO_SAVE_NAME = '__auto__'
 DEFAULT_SAVE_NAME = '__default__'
 
+# Headers whose values are credentials. They are redacted in recorded requests.
+CREDENTIAL_HEADERS = ('authorization', 'x-api-key', 'es-security-runas-user', 'cookie', 'proxy-authorization')
+REDACTED = '<redacted>'
+
 
 class AlwaysNoneNameSpace:
     def __getattr__(self, name):
@@ -1,7 +1,9 @@
 import itertools
+import json
 import logging
 import os
-from typing import Iterable, List, Optional
+import threading
+from typing import Dict, Iterable, List, Optional
 
 from prompt_toolkit.completion import CompleteEvent, Completer, Completion, FuzzyCompleter, PathCompleter, WordCompleter
 from prompt_toolkit.contrib.completers import SystemCompleter
@@ -14,6 +16,9 @@ from peek.config import config_location
 from peek.lexers import (
     EOF,
     Ampersand,
+    BracketLeft,
+    Colon,
+    Comma,
     DictKey,
     FuncName,
     HttpMethod,
@@ -25,6 +30,7 @@ from peek.lexers import (
     Slash,
     UrlPathLexer,
 )
+from peek.metadata import MetadataCompleter
 from peek.parser import ParserEvent, ParserEventType, PeekParser
 
 _logger = logging.getLogger(__name__)
@@ -140,27 +146,87 @@ class ParserStateTracker:
 
 class PeekCompleter(Completer):
     def __init__(self, app):
+        from peek.es_api_spec.api_completer import NoopESApiCompleter
+
         self.app = app
         self.lexer = PeekLexer()
         self.url_path_lexer = UrlPathLexer()
-        self.api_completer = self.init_api_completer()
+        # No API completion until the schema is loaded in the background
+        self.api_completer = NoopESApiCompleter()
+        self._api_completer_ready = threading.Event()
+        self.init_api_completer()
+        self.metadata_completer = self._init_metadata_completer()
 
     def init_api_completer(self):
+        """
+        Start loading the API completer on a background thread so that the prompt is not blocked by
+        schema parsing. The current API completer keeps serving until the new one replaces it.
+        """
+        ready = threading.Event()
+        self._api_completer_ready = ready
+        threading.Thread(target=self._load_api_completer, args=(ready,), name='peek-api-completer', daemon=True).start()
+        return ready
+
+    def _init_metadata_completer(self) -> Optional[MetadataCompleter]:
+        config = self.app.config
+        if 'metadata_completion' not in config or not config.as_bool('metadata_completion'):
+            return None
+        return MetadataCompleter(
+            self.app,
+            ttl=config.as_float('metadata_completion_ttl'),
+            max_entries=config.as_int('metadata_completion_max_entries'),
+        )
+
+    def wait_for_api_completer(self, timeout=None) -> bool:
+        return self._api_completer_ready.wait(timeout)
+
+    def _load_api_completer(self, ready: threading.Event):
+        try:
+            with self.app.startup_profiler.background_phase('schema load'):
+                api_completer = self._build_api_completer()
+        except Exception:
+            _logger.exception('Error on loading API completer')
+            from peek.es_api_spec.api_completer import NoopESApiCompleter
+
+            api_completer = NoopESApiCompleter()
+        # Discard the result if a newer load has been started in the meantime
+        if ready is self._api_completer_ready:
+            self.api_completer = api_completer
+            _logger.info(f'API completer ready: {type(api_completer).__name__}')
+        ready.set()
+
+    def _build_api_completer(self):
         from peek import __file__ as package_root
 
         package_root = os.path.dirname(package_root)
         _logger.info('Use elasticsearch-specification schema for autocompletion')
-        from peek.es_api_spec.api_completer import SchemaESApiCompleter
-
-        schema_filepath = os.path.join(config_location(), 'schema.json')
-        if not os.path.exists(schema_filepath):
-            schema_filepath = os.path.join(package_root, 'specs', 'schema.json')
-        if os.path.exists(schema_filepath):
-            return SchemaESApiCompleter(schema_filepath)
+        from peek.es_api_spec.api_completer import NoopESApiCompleter, SchemaESApiCompleter, VersionedESApiCompleter
+
+        default_version = self.app.config.get('autocompletion_version', '9.2')
+        versioned_schema_filepaths = versioned_schema_files()
+        default_version_filepath = versioned_schema_filepaths.get(default_version)
+        default_branch = None
+        for schema_filepath in [
+            os.path.join(config_location(), 'schema.json'),
+            default_version_filepath,
+            os.path.join(package_root, 'specs', 'schema.json'),
+        ]:
+            if schema_filepath is not None and os.path.exists(schema_filepath):
+                default_completer = SchemaESApiCompleter(schema_filepath)
+                if schema_filepath == default_version_filepath:
+                    default_branch = default_version
+                break
         else:
-            from peek.es_api_spec.api_completer import NoopESApiCompleter
-
-            return NoopESApiCompleter()
+            default_completer = NoopESApiCompleter()
+
+        if not versioned_schema_filepaths:
+            return default_completer
+        return VersionedESApiCompleter(
+            default_completer,
+            versioned_schema_filepaths,
+            lambda: self.app.es_client_manager.current,
+            default_branch=default_branch,
+        )
 
     def get_completions(self, document: Document, complete_event: CompleteEvent) -> Iterable[Completion]:
         _logger.debug(f'Document: {document}, Event: {complete_event}')
@@ -327,14 +393,30 @@ class PeekCompleter(Completer):
         if cursor_token.ttype is Error:
             return []
         else:
+            target_completions = []
             if cursor_token.ttype in (PathPart, Slash):
                 complete_func = self.api_completer.complete_url_path
+                target_completions = self._maybe_complete_url_targets(method, path_tokens)
             elif cursor_token.ttype in (ParamName, QuestionMark, Ampersand):
                 complete_func = self.api_completer.complete_query_param_name
             else:
                 complete_func = self.api_completer.complete_query_param_value
             candidates = complete_func(document, complete_event, method, path_tokens)
-            return FuzzyCompleter(ConstantCompleter(candidates)).get_completions(document, complete_event)
+            # Target names are already filtered by prefix and can be too many for fuzzy matching
+            return itertools.chain(
+                target_completions,
+                FuzzyCompleter(ConstantCompleter(candidates)).get_completions(document, complete_event),
+            )
+
+    def _maybe_complete_url_targets(self, method: str, path_tokens: List[PeekToken]) -> List[Completion]:
+        if self.metadata_completer is None:
+            return []
+        cursor_token = path_tokens[-1]
+        prefix = cursor_token.value if cursor_token.ttype is PathPart else ''
+        if prefix.startswith('_'):  # APIs, not targets
+            return []
+        placeholders = self.api_completer.url_path_placeholders(method, path_tokens)
+        return self.metadata_completer.complete_targets(placeholders, prefix)
 
     def _maybe_complete_payload(
         self, document: Document, complete_event: CompleteEvent, state_tracker: ParserStateTracker
@@ -356,14 +438,27 @@ class PeekCompleter(Completer):
             payload_tokens,
             state_tracker.payload_events,
         )
+        yield from self._maybe_complete_payload_field_keys(method_token.value.upper(), path_tokens, payload_tokens)
         if not candidates:
-            return []
+            return
         constant_completer = ConstantCompleter(candidates)
         for c in FuzzyCompleter(constant_completer).get_completions(document, complete_event):
             yield PayloadKeyCompletion(
                 c.text, rules[c.text], c.start_position, c.display, c.display_meta, c.style, c.selected_style
             )
 
+    def _maybe_complete_payload_field_keys(
+        self, method: str, path_tokens: List[PeekToken], payload_tokens: List[PeekToken]
+    ) -> Iterable[Completion]:
+        if self.metadata_completer is None or payload_tokens[-1].ttype is not DictKey:
+            return
+        is_field, value = self.api_completer.payload_key_field(method, path_tokens, payload_tokens)
+        if not is_field:
+            return
+        prefix = payload_tokens[-1].value.lstrip('\'"')
+        for name in self.metadata_completer.field_names(_url_target(path_tokens), prefix):
+            yield PayloadKeyCompletion(name, value, start_position=-len(prefix), display_meta='field')
+
     def _maybe_complete_payload_value(
         self, document: Document, complete_event: CompleteEvent, state_tracker: ParserStateTracker
     ) -> Iterable[Completion]:
@@ -375,18 +470,79 @@ class PeekCompleter(Completer):
         method_token, path_token = tokens[0], tokens[1]
         path_tokens = list(self.url_path_lexer.get_tokens_unprocessed(path_token.value))
         last_event = state_tracker.last_event
+        payload_tokens = tokens[tokens.index(last_event.token) :]
         candidates, rules = self.api_completer.complete_payload_value(
             document,
             complete_event,
             method_token.value.upper(),
             path_tokens,
-            tokens[tokens.index(last_event.token) :],
+            payload_tokens,
             state_tracker.payload_events,
         )
+        field_completions = self._maybe_complete_payload_field_values(
+            method_token.value.upper(), path_tokens, payload_tokens, state_tracker.payload_events
+        )
         if not candidates:
-            return []
+            return field_completions
         constant_completer = ConstantCompleter(candidates)
-        return FuzzyCompleter(constant_completer).get_completions(document, complete_event)
+        return itertools.chain(
+            field_completions, FuzzyCompleter(constant_completer).get_completions(document, complete_event)
+        )
+
+    def _maybe_complete_payload_field_values(
+        self,
+        method: str,
+        path_tokens: List[PeekToken],
+        payload_tokens: List[PeekToken],
+        payload_events: List[ParserEvent],
+    ) -> List[Completion]:
+        if self.metadata_completer is None:
+            return []
+        last_token = payload_tokens[-1]
+        if last_token.ttype in (Colon, BracketLeft, Comma):
+            quoted, prefix = True, ''
+        elif last_token.ttype in (String.Single, String.Double) and _is_open_string(last_token.value):
+            quoted, prefix = False, last_token.value[1:]
+        else:
+            return []
+        if not self.api_completer.payload_value_field(method, path_tokens, payload_tokens, payload_events):
+            return []
+        return [
+            Completion(json.dumps(name) if quoted else name, start_position=-len(prefix), display_meta='field')
+            for name in self.metadata_completer.field_names(_url_target(path_tokens), prefix)
+        ]
+
+
+def _is_open_string(value: str) -> bool:
+    """
+    Whether the string token is still being typed, e.g. "user.na
+    """
+    return len(value) == 1 or value[-1] != value[0]
+
+
+def _url_target(path_tokens: List[PeekToken]) -> Optional[str]:
+    """
+    The index expression at the beginning of the URL path if there is one
+    """
+    for t in path_tokens:
+        if t.ttype is PathPart:
+            return None if t.value.startswith('_') else t.value
+    return None
+
+
+def versioned_schema_files() -> Dict[str, str]:
+    """
+    Schema files downloaded side by side for different specification branches, keyed by branch
+    """
+    specs_dir = os.path.join(config_location(), 'specs')
+    if not os.path.isdir(specs_dir):
+        return {}
+    schema_filepaths = {}
+    for branch in os.listdir(specs_dir):
+        schema_filepath = os.path.join(specs_dir, branch, 'schema.json')
+        if os.path.isfile(schema_filepath):
+            schema_filepaths[branch] = schema_filepath
+    return schema_filepaths
 
 
 class ConstantCompleter(Completer):
@@ -30,10 +30,20 @@ class NoopDeserializer:
 
 
 class BaseClient(metaclass=ABCMeta):
+    _server_version = None
+
     @abstractmethod
     def perform_request(self, method, path, payload=None, deserialize_it=False, **kwargs) -> TransportApiResponse:
         pass
 
+    def server_version(self) -> str:
+        """
+        Version number of the connected cluster. It is fetched with the first call and cached afterwards.
+        """
+        if self._server_version is None:
+            self._server_version = self.perform_request('GET', '/', deserialize_it=True).body['version']['number']
+        return self._server_version
+
 
 class EsClient(BaseClient):
     def __init__(
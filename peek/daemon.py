@@ -0,0 +1,135 @@
+"""Serve a long running PeekApp on a local UNIX socket and the thin client to talk to it"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import IO, Iterable
+
+from peek.config import config_location
+from peek.errors import PeekError
+
+_logger = logging.getLogger(__name__)
+
+SOCKET_NAME = 'peek.sock'
+
+
+def default_socket_path():
+    return config_location() + SOCKET_NAME
+
+
+class _MessageWriter(io.TextIOBase):
+    """
+    Stand-in for stdout that forwards each piece of output to the client as it is written
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, s):
+        if s:
+            _send(self.wfile, {'output': s})
+        return len(s)
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        app = self.server.app
+        error_count = app.error_count
+        lines = (line.decode('utf-8') for line in self.rfile)
+        with contextlib.redirect_stdout(_MessageWriter(self.wfile)):
+            app.process_stream(lines)
+        _send(self.wfile, {'error_count': app.error_count - error_count})
+
+
+class PeekServer(socketserver.UnixStreamServer):
+    """
+    Execute statements sent by clients one connection at a time with the same PeekApp, so that connections,
+    variables and loaded extensions stay warm between calls.
+    """
+
+    def __init__(self, app, socket_path):
+        self.app = app
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            if _is_listening(socket_path):
+                raise PeekError(f'Another peek server is listening on {socket_path!r}')
+            os.unlink(socket_path)
+        # The socket can run anything with the credentials of the server, so keep it private to the user
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+    def handle_error(self, request, client_address):
+        _logger.exception('Error on serving client request')
+
+
+def run_client(socket_path, inputs: Iterable[IO], out=None) -> int:
+    """
+    Send the inputs to a running server and write the output as it comes back. Return non-zero if any statement
+    failed or the server cannot be reached.
+    """
+    out = out or sys.stdout
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        sock.close()
+        print(f'Cannot connect to peek server at {socket_path!r}, start one with --serve: {e}', file=sys.stderr)
+        return 1
+
+    error_count = None
+    with sock:
+        # Send from a separate thread so that output can be read while a long input is still being sent
+        sender = threading.Thread(target=_send_inputs, args=(sock, inputs), daemon=True)
+        sender.start()
+        with sock.makefile('rb') as rfile:
+            for line in rfile:
+                message = json.loads(line)
+                if 'output' in message:
+                    out.write(message['output'])
+                    out.flush()
+                else:
+                    error_count = message['error_count']
+        sender.join()
+    return 0 if error_count == 0 else 1
+
+
+def _send_inputs(sock, inputs: Iterable[IO]):
+    try:
+        for ins in inputs:
+            for line in ins:
+                sock.sendall(line.encode('utf-8'))
+            # Make sure statements from different inputs are never joined together
+            sock.sendall(b'\n')
+        sock.shutdown(socket.SHUT_WR)
+    except OSError as e:
+        _logger.warning(f'Error on sending input to peek server: {e}')
+
+
+def _send(wfile, message):
+    wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+    wfile.flush()
+
+
+def _is_listening(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
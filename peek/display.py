@@ -18,6 +18,12 @@ from peek.lexers import Heading, PeekLexer, PeekStyle, TipsMinor
 
 _logger = logging.getLogger(__name__)
 
+# Output longer than this number of characters is shown as a preview of its head and tail on terminals
+RENDER_LIMIT = 1_000_000
+
+# Number of characters of the head and the tail shown in the preview
+RENDER_PREVIEW_SIZE = 2000
+
 
 class Display:
     def __init__(self, app):
@@ -32,7 +38,29 @@ class Display:
     def pretty_print(self):
         return self.app.config.as_bool('pretty_print')
 
-    def info(self, source, header_text=''):
+    @property
+    def raw_output(self):
+        config = self.app.config
+        value = str(config['raw_output']).lower() if 'raw_output' in config else 'auto'
+        if value == 'auto':
+            return self._is_plain_output()
+        return config.as_bool('raw_output')
+
+    @property
+    def render_limit(self):
+        config = self.app.config
+        return config.as_int('render_limit') if 'render_limit' in config else RENDER_LIMIT
+
+    @property
+    def render_preview_size(self):
+        config = self.app.config
+        return config.as_int('render_preview_size') if 'render_preview_size' in config else RENDER_PREVIEW_SIZE
+
+    def info(self, source, header_text='', verbatim=False):
+        """
+        Show the source with a header. Verbatim text, e.g. formatted rows, is shown as it is instead of being
+        decoded and highlighted as JSON, though still cut down to a preview when too large.
+        """
         if source is None:
             return
         if not self.app.batch_mode:
@@ -42,6 +70,11 @@ class Display:
             )
         if isinstance(source, FormattedText):
             self._tee_print(source)
+        elif verbatim:
+            source, plain_source = self._preview(source) if self._should_preview(source) else (source, source)
+            self._tee_print(source, plain_source=plain_source)
+        elif self.raw_output:
+            self._write_raw(source)
         else:
             source, plain_source = self._try_jsonify(source)  # TODO: try more types
             self._tee_print(source, plain_source=plain_source)
@@ -80,6 +113,10 @@ class Display:
             )
 
     def _try_jsonify(self, source):
+        # Neither decode nor highlight output that is too large to be shown in full anyway
+        if isinstance(source, str) and self._should_preview(source):
+            return self._preview(source)
+
         # If it is a string, first check whether it can be decoded as JSON
         if isinstance(source, str):
             try:
@@ -90,6 +127,8 @@ class Display:
         try:
             if not isinstance(source, str):
                 source = json.dumps(source, cls=PeekEncoder, app=self.app, indent=2 if self.pretty_print else None)
+            if self._should_preview(source):
+                return self._preview(source)
             tokens = []
             for t in pygments.lex(source, lexer=self.payload_lexer):
                 tokens.append(t)
@@ -101,13 +140,60 @@ class Display:
             _logger.debug(f'Cannot render object as json: {source!r}, {e}')
             return source, source
 
+    def _write_raw(self, source):
+        """
+        Write strings, e.g. response bodies, as they are and other values as compact JSON, one per line
+        """
+        if isinstance(source, str):
+            text = source
+            # A lone JSON string, e.g. from echo, is shown as plain text like in other modes
+            if text.startswith('"'):
+                try:
+                    decoded = json.loads(text)
+                    text = decoded if isinstance(decoded, str) else text
+                except JSONDecodeError:
+                    pass
+        else:
+            try:
+                text = json.dumps(source, cls=PeekEncoder, app=self.app)
+            except Exception as e:
+                _logger.debug(f'Cannot render object as json: {source!r}, {e}')
+                text = str(source)
+        if not text.endswith('\n'):
+            text += '\n'
+        sys.stdout.write(text)
+        if self.app.capture.file() is not None:
+            print(text, file=self.app.capture.file(), end='')
+
+    def _should_preview(self, text: str):
+        # Piped output of batch runs is never cut
+        return len(text) > self.render_limit and not self._is_plain_output()
+
+    def _preview(self, text: str):
+        size = self.render_preview_size
+        head, tail = text[:size], text[-size:]
+        n_bytes, n_lines = len(text.encode('utf-8')), text.count('\n') + 1
+        note = (
+            f'\n... {n_bytes} bytes in {n_lines} lines, '
+            f'showing the first and last {size} characters. '
+            f'Browse it with "page _" or use out="<file>" or pipe="<command>" on the request ...\n'
+        )
+        return FormattedText([('', head), (PeekStyle.styles[TipsMinor], note), ('', tail)]), head + note + tail
+
+    def _is_plain_output(self):
+        return self.app.batch_mode and not sys.stdout.isatty()
+
     def _tee_print(self, source, plain_source=None):
         content = None
-        if self.app.batch_mode and not sys.stdout.isatty():
+        if self._is_plain_output():
             content = all_to_text(source) if plain_source is None else plain_source
             print(content, file=sys.stdout, end='')
         else:
-            print_formatted_text(source, style=self.style, style_transformation=self.style_transformation)
+            try:
+                print_formatted_text(source, style=self.style, style_transformation=self.style_transformation)
+            except KeyboardInterrupt:
+                # Stop rendering only and carry on with the next statement
+                print('\nOutput interrupted', file=sys.stdout)
 
         if self.app.capture.file() is not None:
             content = content or (all_to_text(source) if plain_source is None else plain_source)
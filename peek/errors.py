@@ -11,6 +11,8 @@ class PeekSyntaxError(PeekError):
         self.error_token = error_token
         self.title = title or 'Syntax error'
         self.message = message
+        # Number of lines preceding the text in its source, e.g. when the text is a part of a streamed script
+        self.line_offset = 0
 
     def __str__(self):
         text_before_error = self.text[: self.error_token.index]
@@ -31,7 +33,7 @@ class PeekSyntaxError(PeekError):
             line += text_since_error[:next_linesep]
 
         return (
-            f'{self.title} at Line {line_index + 1}, Column {col_index + 1}:\n'
+            f'{self.title} at Line {self.line_offset + line_index + 1}, Column {col_index + 1}:\n'
             f'{line}\n'
             f'{" " * col_index}'
             f'{"^" * len(self.error_token.value)}'
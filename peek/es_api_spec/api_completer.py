@@ -1,20 +1,26 @@
 import ast
 import json
 import logging
+import threading
+import time
+import weakref
 from abc import ABCMeta
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from prompt_toolkit.completion import CompleteEvent, Completion
 from prompt_toolkit.document import Document
 from pygments.token import Name, String
 
 from peek.common import PeekToken
-from peek.es_api_spec.schema import Schema
+from peek.es_api_spec.schema_cache import load_schema
 from peek.lexers import EOF, Assign, BracketLeft, Colon, Comma, CurlyLeft, CurlyRight, DictKey, PathPart, Slash
 from peek.parser import ParserEvent, ParserEventType
 
 _logger = logging.getLogger(__name__)
 
+# Seconds to wait before asking a client for its version again after a failure, e.g. cluster unreachable
+VERSION_RETRY_INTERVAL = 30.0
+
 
 class ESApiCompleter(metaclass=ABCMeta):
     def complete_url_path(
@@ -54,6 +60,32 @@ class ESApiCompleter(metaclass=ABCMeta):
     ) -> Tuple[List[Completion], dict]:
         return [], {}
 
+    def url_path_placeholders(self, method: str, path_tokens: List[PeekToken]) -> List[str]:
+        """
+        Names of URL placeholders, e.g. index, that the path segment under cursor can be
+        """
+        return []
+
+    def payload_key_field(
+        self, method: str, path_tokens: List[PeekToken], payload_tokens: List[PeekToken]
+    ) -> Tuple[bool, Any]:
+        """
+        Whether the payload key under cursor is a field name and if so, the value to fill for it
+        """
+        return False, None
+
+    def payload_value_field(
+        self,
+        method: str,
+        path_tokens: List[PeekToken],
+        payload_tokens: List[PeekToken],
+        payload_events: List[ParserEvent],
+    ) -> bool:
+        """
+        Whether the payload value under cursor is a field name
+        """
+        return False
+
 
 class NoopESApiCompleter(ESApiCompleter):
     pass
@@ -61,8 +93,7 @@ class NoopESApiCompleter(ESApiCompleter):
 
 class SchemaESApiCompleter(ESApiCompleter):
     def __init__(self, schema_filepath):
-        with open(schema_filepath) as ins:
-            self._schema = Schema(json.load(ins))
+        self._schema = load_schema(schema_filepath)
 
     def complete_url_path(self, document, complete_event, method, path_tokens):
         cursor_token = path_tokens[-1]
@@ -85,6 +116,37 @@ class SchemaESApiCompleter(ESApiCompleter):
 
     def complete_payload(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
         _logger.debug(f'Completing for API payload: {method!r} {path_tokens!r} {payload_tokens!r}')
+        payload_keys = self._payload_keys_for_key(payload_tokens)
+        if payload_keys is None:
+            return [], {}
+        ts = [t.value for t in path_tokens if t.ttype is PathPart]
+        key_to_values = self._schema.candidate_sub_key_values(method, ts, payload_keys)
+        return [Completion(c) for c in sorted(key_to_values.keys())], key_to_values
+
+    def url_path_placeholders(self, method, path_tokens):
+        token_stream = [t.value for t in path_tokens if t.ttype is not Slash]
+        if path_tokens and path_tokens[-1].ttype is PathPart:
+            token_stream.pop()
+        return self._schema.candidate_placeholders(method, token_stream)
+
+    def payload_key_field(self, method, path_tokens, payload_tokens):
+        payload_keys = self._payload_keys_for_key(payload_tokens)
+        if payload_keys is None:
+            return False, None
+        ts = [t.value for t in path_tokens if t.ttype is PathPart]
+        return self._schema.field_key_value(method, ts, payload_keys)
+
+    def payload_value_field(self, method, path_tokens, payload_tokens, payload_events):
+        payload_keys = self._payload_keys_for_value(payload_events)
+        if not payload_keys:
+            return False
+        ts = [t.value for t in path_tokens if t.ttype is PathPart]
+        return self._schema.is_field_value(method, ts, payload_keys)
+
+    def _payload_keys_for_key(self, payload_tokens) -> Optional[List[str]]:
+        """
+        Keys leading to the dict that the payload key under cursor belongs to, or None if not inside a dict
+        """
         # TODO: refactor with parser state tracker
         payload_keys = []
         curly_level = 0
@@ -104,29 +166,22 @@ class SchemaESApiCompleter(ESApiCompleter):
 
         _logger.debug(f'Payload status: level: {curly_level}, keys: {payload_keys}')
         if curly_level == 0:  # not even in the first curly bracket, no completion
-            return [], {}
+            return None
 
         # Remove the payload key that is at the same level
         if curly_level == len(payload_keys):
             payload_keys.pop()
+        return payload_keys
 
-        ts = [t.value for t in path_tokens if t.ttype is PathPart]
-        key_to_values = self._schema.candidate_sub_key_values(method, ts, payload_keys)
-        return [Completion(c) for c in sorted(key_to_values.keys())], key_to_values
-
-    def complete_payload_value(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
-        _logger.debug(f'Completing for API payload value: {method!r} {path_tokens!r} {payload_tokens!r}')
-        completions = self._do_complete_payload_value(
-            document, complete_event, method, path_tokens, payload_tokens, payload_events
-        )
-        return [Completion(c) for c in sorted(set(completions))], {}
-
-    def _do_complete_payload_value(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
+    def _payload_keys_for_value(self, payload_events) -> Optional[List[str]]:
+        """
+        Keys leading to the payload value under cursor, or None if no completion is possible
+        """
         unpaired_dict_key_tokens = []
         for payload_event in payload_events:
             if payload_event.type is ParserEventType.BEFORE_DICT_KEY_EXPR:
                 _logger.debug(f'No completion is possible for payload with dict key expr: {payload_event.token}')
-                return []
+                return None
             elif payload_event.type is ParserEventType.DICT_KEY:
                 unpaired_dict_key_tokens.append(payload_event.token)
             elif payload_event.type is ParserEventType.AFTER_DICT_VALUE and payload_event.token.ttype is not EOF:
@@ -134,9 +189,21 @@ class SchemaESApiCompleter(ESApiCompleter):
 
         if not unpaired_dict_key_tokens:  # should not happen
             _logger.warning('No unpaired dict key tokens are found')
-            return []
+            return None
+
+        return [ast.literal_eval(t.value) for t in unpaired_dict_key_tokens]
+
+    def complete_payload_value(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
+        _logger.debug(f'Completing for API payload value: {method!r} {path_tokens!r} {payload_tokens!r}')
+        completions = self._do_complete_payload_value(
+            document, complete_event, method, path_tokens, payload_tokens, payload_events
+        )
+        return [Completion(c) for c in sorted(set(completions))], {}
 
-        payload_keys = [ast.literal_eval(t.value) for t in unpaired_dict_key_tokens]
+    def _do_complete_payload_value(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
+        payload_keys = self._payload_keys_for_value(payload_events)
+        if payload_keys is None:
+            return []
         _logger.debug(f'Payload keys are: {payload_keys}')
 
         # Find last Colon position
@@ -179,3 +246,142 @@ class SchemaESApiCompleter(ESApiCompleter):
                 ]
 
         return []  # catch all
+
+
+class VersionedESApiCompleter(ESApiCompleter):
+    """
+    Delegate to the schema of the specification branch that best matches the version of the current
+    connection's cluster. The version is resolved once per client and each branch's schema is loaded
+    once, both on a background thread. The default completer serves until they are ready. If the version
+    cannot be fetched, it is tried again after VERSION_RETRY_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        default_completer: ESApiCompleter,
+        schema_filepaths: Dict[str, str],
+        current_client: Callable[[], object],
+        default_branch: Optional[str] = None,
+    ):
+        self._default_completer = default_completer
+        self._schema_filepaths = schema_filepaths
+        self._current_client = current_client
+        self._lock = threading.Lock()
+        self._completers: Dict[str, ESApiCompleter] = {}
+        if default_branch is not None:
+            # The default completer is built from this branch's schema, so do not load it again
+            self._completers[default_branch] = default_completer
+        self._client_branches = weakref.WeakKeyDictionary()
+        self._pending_clients = weakref.WeakSet()
+        self._client_failures = weakref.WeakKeyDictionary()
+
+    def complete_url_path(self, document, complete_event, method, path_tokens):
+        return self._delegate().complete_url_path(document, complete_event, method, path_tokens)
+
+    def complete_query_param_name(self, document, complete_event, method, path_tokens):
+        return self._delegate().complete_query_param_name(document, complete_event, method, path_tokens)
+
+    def complete_query_param_value(self, document, complete_event, method, path_tokens):
+        return self._delegate().complete_query_param_value(document, complete_event, method, path_tokens)
+
+    def complete_payload(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
+        return self._delegate().complete_payload(
+            document, complete_event, method, path_tokens, payload_tokens, payload_events
+        )
+
+    def complete_payload_value(self, document, complete_event, method, path_tokens, payload_tokens, payload_events):
+        return self._delegate().complete_payload_value(
+            document, complete_event, method, path_tokens, payload_tokens, payload_events
+        )
+
+    def url_path_placeholders(self, method, path_tokens):
+        return self._delegate().url_path_placeholders(method, path_tokens)
+
+    def payload_key_field(self, method, path_tokens, payload_tokens):
+        return self._delegate().payload_key_field(method, path_tokens, payload_tokens)
+
+    def payload_value_field(self, method, path_tokens, payload_tokens, payload_events):
+        return self._delegate().payload_value_field(method, path_tokens, payload_tokens, payload_events)
+
+    def _delegate(self) -> ESApiCompleter:
+        try:
+            client = self._current_client()
+        except Exception as e:
+            _logger.debug(f'No current client for versioned completion: {e}')
+            return self._default_completer
+
+        with self._lock:
+            if client in self._client_branches:
+                branch = self._client_branches[client]
+                return self._completers.get(branch, self._default_completer)
+            failed_at = self._client_failures.get(client)
+            if failed_at is not None and time.monotonic() - failed_at < VERSION_RETRY_INTERVAL:
+                return self._default_completer
+            if client not in self._pending_clients:
+                self._pending_clients.add(client)
+                threading.Thread(
+                    target=self._resolve_client, args=(client,), name='peek-api-completer-version', daemon=True
+                ).start()
+        return self._default_completer
+
+    def _resolve_client(self, client):
+        try:
+            version = client.server_version()
+        except Exception as e:
+            _logger.warning(f'Cannot get version of client [{client}], retry in {VERSION_RETRY_INTERVAL}s: {e}')
+            with self._lock:
+                self._client_failures[client] = time.monotonic()
+                self._pending_clients.discard(client)
+            return
+
+        branch = select_branch(version, self._schema_filepaths.keys())
+        _logger.info(f'Client [{client}] has version [{version}], use specification branch [{branch}]')
+        try:
+            if branch is not None:
+                self._ensure_completer(branch)
+        except Exception as e:
+            _logger.warning(f'Cannot load specification branch [{branch}] for client [{client}]: {e}')
+            branch = None
+        finally:
+            with self._lock:
+                self._client_branches[client] = branch
+                self._client_failures.pop(client, None)
+                self._pending_clients.discard(client)
+
+    def _ensure_completer(self, branch: str):
+        with self._lock:
+            if branch in self._completers:
+                return
+        # Parse outside the lock so that completion for other clients is not blocked
+        completer = SchemaESApiCompleter(self._schema_filepaths[branch])
+        with self._lock:
+            self._completers.setdefault(branch, completer)
+
+
+def select_branch(version: str, branches) -> Optional[str]:
+    """
+    Pick the specification branch for the given cluster version, e.g. 8.15.1 -> 8.15. Without an exact
+    match, the closest lower minor of the same major wins, then the lowest higher minor of the same major.
+    """
+    major, minor = _major_minor(version)
+    if major is None:
+        return None
+    same_major = []
+    for branch in branches:
+        branch_major, branch_minor = _major_minor(branch)
+        if branch_major == major:
+            same_major.append((branch_minor, branch))
+    if not same_major:
+        return None
+    lower = [b for b in same_major if b[0] <= minor]
+    if lower:
+        return max(lower)[1]
+    return min(same_major)[1]
+
+
+def _major_minor(version: str):
+    parts = str(version).split('-', 1)[0].split('.')
+    try:
+        return int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+    except ValueError:
+        return None, None
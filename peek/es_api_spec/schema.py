@@ -1,73 +1,97 @@
 import logging
 import numbers
-from dataclasses import dataclass
-from typing import Any, Dict, List, Union
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 _logger = logging.getLogger(__name__)
 
+# Maximum number of (endpoint, payload keys) lookups memoized per schema
+COMPLETION_CACHE_SIZE = 1024
+
+# Maximum number of type names, and references to them, shared between values. A schema has a few thousand
+# named types. Bounded so that names only used by schemas loaded before, e.g. of other versions, are released.
+TYPE_NAME_CACHE_SIZE = 8192
+
 Types = "Dict[TypeName, Union[Builtin, Alias, Interface, Enum, Request]]"
 
+# Maximum depth of alias, union and array nesting to look through for field name types
+_MAX_FIELD_TYPE_DEPTH = 8
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TypeName:
     name: str
     namespace: str
 
     @staticmethod
     def from_dict(data: Dict):
-        return TypeName(data['name'], data['namespace'])
+        return _type_name(data['name'], data['namespace'])
+
+
+@lru_cache(maxsize=TYPE_NAME_CACHE_SIZE)
+def _type_name(name: str, namespace: str) -> TypeName:
+    # Type names are referenced from every instance_of value. Share a single instance per name.
+    return TypeName(sys.intern(name), sys.intern(namespace))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Endpoint:
-    urls: List[Dict]
+    url_parts: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...]], ...]
     request: TypeName
-    description: str
-    doc_url: str
 
     @staticmethod
     def from_dict(data: Dict):
         return Endpoint(
-            urls=data['urls'],
+            # The methods and non-empty path segments of each URL, split once for repeated matching
+            url_parts=tuple(
+                (
+                    tuple(sys.intern(m) for m in url['methods']),
+                    tuple(sys.intern(p) for p in url['path'].split('/') if p),
+                )
+                for url in data['urls']
+            ),
             request=TypeName.from_dict(data['request']) if data['request'] else None,
-            description=data['description'],
-            doc_url=data['docUrl'],
         )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TypeDefinition:
     name: TypeName
-    data: Dict
 
     def candidate_values(self, types: Types):
         yield from []
 
     def candidate_properties(self, types: Types):
-        return []
-
-    def __getattr__(self, item):
-        return self.data.get(item, None)
+        return ()
 
     @staticmethod
     def from_dict(data: Dict):
-        name = TypeName.from_dict(data.pop('name'))
-        kind = data.pop('kind')
+        name = TypeName.from_dict(data['name'])
+        kind = data['kind']
         if kind == 'type_alias':
-            return Alias(name=name, data=data)
+            return Alias(name=name, type=Value.from_dict(data['type']))
         elif kind == 'interface':
-            return Interface(name=name, data=data)
+            return Interface(name=name, properties=_variables(data.get('properties')))
         elif kind == 'enum':
-            return Enum(name=name, data=data)
+            return Enum(name=name, members=tuple(sys.intern(m['name']) for m in data.get('members', [])))
         elif kind == 'request':
-            return Request(name=name, data=data)
+            query = data.get('query')
+            attached_behaviours = data.get('attachedBehaviors')
+            return Request(
+                name=name,
+                query=None if query is None else {v.name: v for v in _variables(query)},
+                attached_behaviours=None if attached_behaviours is None else tuple(attached_behaviours),
+                body=Body.from_dict(data['body']),
+            )
         elif kind == 'response':
-            return Response(name=name, data=data)
+            return Response(name=name)
         else:
             raise ValueError(f'unrecognized type definition kind [{kind}]')
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Builtin(TypeDefinition):
     def candidate_values(self, types: Types):
         if self.name.name == 'boolean':
@@ -82,91 +106,103 @@ class Builtin(TypeDefinition):
             yield from []
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Alias(TypeDefinition):
+    type: 'Value'
+
     def candidate_values(self, types: Types):
         yield from self.get_type().candidate_values(types)
 
     def candidate_properties(self, types: Types):
         return self.get_type().candidate_properties(types)
 
-    def get_type(self):
-        return Value.from_dict(self.type)
+    def get_type(self) -> 'Value':
+        return self.type
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Interface(TypeDefinition):
+    properties: Tuple['Variable', ...]
+
     def candidate_values(self, types: Types):
         yield from [{}]
 
     def candidate_properties(self, types: Types):
-        return [Variable.from_dict(prop) for prop in self.properties]
+        return self.properties
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Enum(TypeDefinition):
+    members: Tuple[str, ...]
+
     def candidate_values(self, types: Types):
         yield from self.get_members()
 
-    def get_members(self) -> List[str]:
-        return [member['name'] for member in self.members]
+    def get_members(self) -> Tuple[str, ...]:
+        return self.members
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Request(TypeDefinition):
-    def get_query(self) -> Dict:
-        query = self.query
-        if query is not None:
-            if not isinstance(query, dict):
-                query = {q['name']: q for q in self.query}
-                self.data['query'] = query
-        return query
+    query: Optional[Dict[str, 'Variable']]
+    attached_behaviours: Optional[Tuple[str, ...]]
+    body: 'Body'
+
+    def get_query(self) -> Optional[Dict[str, 'Variable']]:
+        return self.query
+
+    def get_query_parameter(self, param_name: str) -> Union['Variable', None]:
+        return self.query.get(param_name, None) if self.query is not None else None
 
-    def get_attached_behaviours(self) -> List[str]:
-        return self.attachedBehaviors
+    def get_attached_behaviours(self) -> Optional[Tuple[str, ...]]:
+        return self.attached_behaviours
 
+    def get_body(self) -> 'Body':
+        return self.body
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Response(TypeDefinition):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Value:
-    data: Dict
-
     def candidate_values(self, types: Types):
         yield from []
 
     def candidate_properties(self, types: Types):
-        return []
-
-    def __getattr__(self, item):
-        return self.data.get(item, None)
+        return ()
 
     @staticmethod
     def from_dict(data):
         kind = data['kind']
         if kind == 'instance_of':
-            return InstanceOf(data=data)
+            return _instance_of(TypeName.from_dict(data['type']))
         elif kind == 'array_of':
-            return ArrayOf(data=data)
+            return ArrayOf(member=Value.from_dict(data['value']))
         elif kind == 'dictionary_of':
-            return DictionaryOf(data=data)
+            return DictionaryOf(
+                key=Value.from_dict(data['key']),
+                value=Value.from_dict(data['value']),
+                single_key=data.get('singleKey', False),
+            )
         elif kind == 'union_of':
-            return UnionOf(data=data)
+            return UnionOf(members=tuple(Value.from_dict(item) for item in data['items']))
         elif kind == 'literal_value':
-            return Literal(data=data)
+            return Literal(value=data.get('value'))
         elif kind == 'user_defined_value':
-            return UserDefined(data=data)
+            return _USER_DEFINED
         elif kind == 'void_value':
-            return Void(data=data)
+            return _VOID
         else:
             raise ValueError(f'unrecognized value kind [{kind}]')
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class InstanceOf(Value):
+    type_name: TypeName
+
     def candidate_values(self, types: Types):
         type_name = self.get_type_name()
         if type_name in types:
@@ -181,14 +217,22 @@ class InstanceOf(Value):
             return types[type_name].candidate_properties(types)
         else:
             _logger.debug(f'type [{type_name}] does not exist')
-            return []
+            return ()
 
     def get_type_name(self) -> TypeName:
-        return TypeName.from_dict(self.type)
+        return self.type_name
+
+
+@lru_cache(maxsize=TYPE_NAME_CACHE_SIZE)
+def _instance_of(type_name: TypeName) -> InstanceOf:
+    # Most values are references to named types. Being immutable, they can be shared.
+    return InstanceOf(type_name=type_name)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ArrayOf(Value):
+    member: Value
+
     def candidate_values(self, types: Types):
         member_value = next(self.get_member().candidate_values(types))
         if member_value == {}:
@@ -197,30 +241,40 @@ class ArrayOf(Value):
             yield from [[]]
 
     def get_member(self) -> Value:
-        return Value.from_dict(self.value)
+        return self.member
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DictionaryOf(Value):
+    key: Value
+    value: Value
+    single_key: bool
+    properties: Tuple['Variable', ...] = field(init=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'properties', (Wildcard(self.value, key=self.key),))
+
     def candidate_values(self, types: Types):
         yield from [{}]
 
     def candidate_properties(self, types: Types):
         # TODO: check key type is string?
-        return [Wildcard(self.get_value())]
+        return self.properties
 
     def get_key(self) -> Value:
-        return Value.from_dict(self.key)
+        return self.key
 
     def get_value(self) -> Value:
-        return Value.from_dict(self.value)
+        return self.value
 
     def is_single_key(self) -> bool:
-        return self.singleKey
+        return self.single_key
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UnionOf(Value):
+    members: Tuple[Value, ...]
+
     def candidate_values(self, types: Types):
         for member in self.get_members():
             yield from member.candidate_values(types)
@@ -231,12 +285,14 @@ class UnionOf(Value):
             all_results.extend(member.candidate_properties(types))
         return all_results
 
-    def get_members(self):
-        return [Value.from_dict(item) for item in self.items]
+    def get_members(self) -> Tuple[Value, ...]:
+        return self.members
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Literal(Value):
+    value: Any
+
     def candidate_values(self, types: Types):
         yield from [self.get_value()]
 
@@ -244,20 +300,24 @@ class Literal(Value):
         return self.value
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class UserDefined(Value):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Void(Value):
     pass
 
 
-@dataclass(frozen=True)
+_USER_DEFINED = UserDefined()
+_VOID = Void()
+
+
+@dataclass(frozen=True, slots=True)
 class Variable:
     name: str
-    aliases: List[str]
+    aliases: Tuple[str, ...]
     value: Value
 
     def candidate_values(self, types: Types):
@@ -271,56 +331,68 @@ class Variable:
 
     @staticmethod
     def from_dict(data):
-        return Variable(name=data['name'], aliases=data.get('aliases', []), value=Value.from_dict(data['type']))
+        return Variable(
+            name=sys.intern(data['name']),
+            aliases=tuple(sys.intern(a) for a in data.get('aliases', ())),
+            value=Value.from_dict(data['type']),
+        )
+
+
+def _variables(data: Optional[List[Dict]]) -> Tuple[Variable, ...]:
+    return tuple(Variable.from_dict(d) for d in data) if data else ()
 
 
-@dataclass(frozen=True, init=False)
+@dataclass(frozen=True, slots=True, init=False)
 class Wildcard(Variable):
-    def __init__(self, value: Value):
-        super(Wildcard, self).__init__(name='*', aliases=[], value=value)
+    key: Value = None
+
+    def __init__(self, value: Value, key: Value = None):
+        object.__setattr__(self, 'name', '*')
+        object.__setattr__(self, 'aliases', ())
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'key', key)
 
     def match_key(self, key: str):
         return True
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Body:
-    data: Dict
-
-    def candidate_properties(self) -> List[Variable]:
-        return []
-
-    def __getattr__(self, item):
-        return self.data.get(item, None)
+    def candidate_properties(self) -> Tuple[Variable, ...]:
+        return ()
 
     @staticmethod
     def from_dict(data):
         kind = data['kind']
         if kind == 'no_body':
-            return NoBody(data)
+            return NoBody()
         elif kind == 'value':
-            return ValueBody(data)
+            return ValueBody(value=Value.from_dict(data['value']))
         elif kind == 'properties':
-            return PropertiesBody(data)
+            return PropertiesBody(properties=_variables(data['properties']))
         else:
             raise ValueError(f'unrecognized body kind [{kind}]')
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class NoBody(Body):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ValueBody(Body):
-    def get_value(self):
-        return Value.of(self.value)
+    value: Value
 
+    def get_value(self) -> Value:
+        return self.value
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class PropertiesBody(Body):
-    def candidate_properties(self) -> List[Variable]:
-        return [Variable.from_dict(prop) for prop in self.properties]
+    properties: Tuple[Variable, ...]
+
+    def candidate_properties(self) -> Tuple[Variable, ...]:
+        return self.properties
 
 
 class Schema:
@@ -329,28 +401,34 @@ class Schema:
         self.types: Types = {
             b.name: b
             for b in [
-                Builtin(name=TypeName("binary", "_builtins"), data={}),
-                Builtin(name=TypeName("boolean", "_builtins"), data={}),
-                Builtin(name=TypeName("null", "_builtins"), data={}),
-                Builtin(name=TypeName("number", "_builtins"), data={}),
-                Builtin(name=TypeName("string", "_builtins"), data={}),
-                Builtin(name=TypeName("void", "_builtins"), data={}),
+                Builtin(name=_type_name("binary", "_builtins")),
+                Builtin(name=_type_name("boolean", "_builtins")),
+                Builtin(name=_type_name("null", "_builtins")),
+                Builtin(name=_type_name("number", "_builtins")),
+                Builtin(name=_type_name("string", "_builtins")),
+                Builtin(name=_type_name("void", "_builtins")),
             ]
         }
         for d in data['types']:
-            type_definition = TypeDefinition.from_dict(d)
-            if isinstance(type_definition, Response):
+            if d['kind'] == 'response':
                 continue
+            type_definition = TypeDefinition.from_dict(d)
             self.types[type_definition.name] = type_definition
         self._common_parameters = self._build_common_params()
+        # Completion repeatedly asks for the same endpoints and payload key paths while a request is being typed.
+        # The caches are per instance so that they are dropped together with the schema.
+        self._cached_matchable_endpoint = lru_cache(maxsize=COMPLETION_CACHE_SIZE)(self._do_matchable_endpoint)
+        self._cached_properties_for_keys = lru_cache(maxsize=COMPLETION_CACHE_SIZE)(self._do_properties_for_keys)
+        self._cached_sub_properties_for_keys = lru_cache(maxsize=COMPLETION_CACHE_SIZE)(
+            self._do_sub_properties_for_keys
+        )
 
     def candidate_urls(self, method: str, ts: List[str]) -> List[str]:
         candidates = []
         for endpoint in self.endpoints:
-            for url in endpoint.urls:
-                if method not in url['methods']:
+            for methods, ps in endpoint.url_parts:
+                if method not in methods:
                     continue
-                ps = [p for p in url['path'].split('/') if p]
                 # Nothing to complete if the candidate is shorter than current input
                 if len(ts) >= len(ps):
                     continue
@@ -383,7 +461,7 @@ class Schema:
             if self._request_has_common_query_params(request) and param_name in self._common_parameters.keys():
                 candidates.update(self._common_parameters[param_name])
             else:
-                query_param = self._get_query_parameter(param_name, request)
+                query_param = request.get_query_parameter(param_name)
                 if query_param is not None:
                     candidates.update(self._filter_for_param_values(query_param.candidate_values(self.types)))
 
@@ -393,7 +471,7 @@ class Schema:
         endpoint: Endpoint = self._matchable_endpoint(method, ts)
         if endpoint is None or endpoint.request is None:
             return {}
-        sub_properties = self._sub_properties_for_keys(Body.from_dict(self.types[endpoint.request].body), payload_keys)
+        sub_properties = self._sub_properties_for_keys(endpoint.request, payload_keys)
         key_to_values = {}
         for sub_prop in sub_properties:
             # Filter out wildcard to avoid showing '*' as a suggestion for dict keys
@@ -416,7 +494,7 @@ class Schema:
         endpoint: Endpoint = self._matchable_endpoint(method, ts)
         if endpoint is None or endpoint.request is None:
             return []
-        properties = self._properties_for_keys(Body.from_dict(self.types[endpoint.request].body), payload_keys)
+        properties = self._properties_for_keys(endpoint.request, payload_keys)
         values = []
         for prop in properties:
             if inside_array and isinstance(prop.value, ArrayOf):
@@ -426,13 +504,67 @@ class Schema:
                 values.extend(prop.candidate_values(self.types))
         return values
 
+    def candidate_placeholders(self, method: str, ts: List[str]) -> List[str]:
+        """
+        Names of the URL template placeholders, e.g. index, that can appear right after the given path segments.
+        """
+        placeholders = set()
+        for endpoint in self.endpoints:
+            for methods, ps in endpoint.url_parts:
+                if method not in methods or len(ts) >= len(ps):
+                    continue
+                p = ps[len(ts)]
+                if p.startswith('{') and p.endswith('}') and self._can_match(ts, ps):
+                    placeholders.add(p[1:-1])
+        return sorted(placeholders)
+
+    def field_key_value(self, method, ts: List[str], payload_keys: List[str]) -> Tuple[bool, Any]:
+        """
+        Whether keys under the given payload keys are field names, e.g. inside a term query.
+        If so, also returns the value to be filled for such a key.
+        """
+        endpoint: Endpoint = self._matchable_endpoint(method, ts)
+        if endpoint is None or endpoint.request is None:
+            return False, None
+        for sub_prop in self._sub_properties_for_keys(endpoint.request, payload_keys):
+            if isinstance(sub_prop, Wildcard) and sub_prop.key is not None and self._is_field_type(sub_prop.key):
+                try:
+                    return True, next(sub_prop.candidate_values(self.types))
+                except StopIteration:
+                    return True, ''
+        return False, None
+
+    def is_field_value(self, method, ts: List[str], payload_keys: List[str]) -> bool:
+        """
+        Whether the value of the given payload keys is a field name, e.g. field of a terms aggregation.
+        """
+        endpoint: Endpoint = self._matchable_endpoint(method, ts)
+        if endpoint is None or endpoint.request is None:
+            return False
+        return any(self._is_field_type(prop.value) for prop in self._properties_for_keys(endpoint.request, payload_keys))
+
+    def _is_field_type(self, value: Value, depth=0) -> bool:
+        if depth > _MAX_FIELD_TYPE_DEPTH:
+            return False
+        if isinstance(value, InstanceOf):
+            type_name = value.get_type_name()
+            if type_name.namespace == '_types' and type_name.name in ('Field', 'Fields'):
+                return True
+            type_definition = self.types.get(type_name)
+            return isinstance(type_definition, Alias) and self._is_field_type(type_definition.get_type(), depth + 1)
+        elif isinstance(value, ArrayOf):
+            return self._is_field_type(value.get_member(), depth + 1)
+        elif isinstance(value, UnionOf):
+            return any(self._is_field_type(member, depth + 1) for member in value.get_members())
+        else:
+            return False
+
     def _matchable_endpoints(self, method: str, ts: List[str]):
         for endpoint in self.endpoints:
             matched = False
-            for url in endpoint.urls:
-                if method not in url['methods']:
+            for methods, ps in endpoint.url_parts:
+                if method not in methods:
                     continue
-                ps = [p for p in url['path'].split('/') if p]
                 if len(ts) != len(ps):
                     continue
                 if not self._can_match(ts, ps):
@@ -443,6 +575,9 @@ class Schema:
                 yield endpoint
 
     def _matchable_endpoint(self, method, ts: List[str]) -> Union[Endpoint, None]:
+        return self._cached_matchable_endpoint(method, tuple(ts))
+
+    def _do_matchable_endpoint(self, method, ts: Tuple[str, ...]) -> Union[Endpoint, None]:
         try:
             endpoint = next(self._matchable_endpoints(method, ts))
             _logger.debug(f'Found endpoint for {method!r} {ts}')
@@ -451,30 +586,32 @@ class Schema:
             _logger.debug(f'No matching endpoint found for {method!r} {ts}')
             return None
 
-    def _properties_for_keys(self, body: Body, payload_keys: List[str]) -> List[Variable]:
+    def _properties_for_keys(self, request_name: TypeName, payload_keys: List[str]) -> List[Variable]:
         """
         For the given payload_keys, find properties that match the sequence. The result is a list of property
         because there could be more than one path that matches the key sequence.
+        The returned list is shared by the cache and must not be mutated.
         """
         if len(payload_keys) == 0:
             raise ValueError('no payload keys to find for properties')
+        return self._cached_properties_for_keys(request_name, tuple(payload_keys))
 
-        candidate_properties = body.candidate_properties()
-        while len(payload_keys) > 0:
+    def _do_properties_for_keys(self, request_name: TypeName, payload_keys: Tuple[str, ...]) -> List[Variable]:
+        candidate_properties = self.types[request_name].get_body().candidate_properties()
+        for i, payload_key in enumerate(payload_keys):
             matched_properties = []
             for candidate_property in candidate_properties:
                 if not isinstance(candidate_property, Variable):
                     continue
-                if candidate_property.match_key(payload_keys[0]):
+                if candidate_property.match_key(payload_key):
                     matched_properties.append(candidate_property)
 
             if len(matched_properties) == 0:  # No match is found
                 return []
 
             # match is found
-            payload_keys.pop(0)
-            if len(payload_keys) == 0:
-                return [p for p in matched_properties if isinstance(p, Variable)]
+            if i == len(payload_keys) - 1:
+                return matched_properties
 
             # Prepare for the next round of key matching
             candidate_properties = []
@@ -483,14 +620,18 @@ class Schema:
 
         return []  # should not reach here, but for safe
 
-    def _sub_properties_for_keys(self, body: Body, payload_keys: List[str]) -> List[Variable]:
+    def _sub_properties_for_keys(self, request_name: TypeName, payload_keys: List[str]) -> List[Variable]:
         """
         For the given payload_keys, find properties that match the sequence, then return their sub-properties.
+        The returned list is shared by the cache and must not be mutated.
         """
+        return self._cached_sub_properties_for_keys(request_name, tuple(payload_keys))
+
+    def _do_sub_properties_for_keys(self, request_name: TypeName, payload_keys: Tuple[str, ...]) -> List[Variable]:
         if len(payload_keys) == 0:
-            return body.candidate_properties()
+            return self.types[request_name].get_body().candidate_properties()
         else:
-            matched_properties = self._properties_for_keys(body, payload_keys)
+            matched_properties = self._properties_for_keys(request_name, list(payload_keys))
             sub_properties = []
             for matched_property in matched_properties:
                 sub_properties.extend(self._sub_properties_for_property(self.types, matched_property))
@@ -499,11 +640,10 @@ class Schema:
     def _build_common_params(self) -> Dict[str, List[str]]:
         type_definition = self.types[TypeName('CommonQueryParameters', '_spec_utils')]
         if not isinstance(type_definition, Interface):
-            _logger.warning(f'CommonQueryParameters type kind [{type_definition.kind}] unprocessable')
+            _logger.warning(f'CommonQueryParameters type [{type(type_definition).__name__}] unprocessable')
             return {}
         common_parameters = {}
-        for prop in type_definition.properties:
-            query_parameter = Variable.from_dict(prop)
+        for query_parameter in type_definition.properties:
             common_parameters[query_parameter.name] = self._filter_for_param_values(
                 query_parameter.candidate_values(self.types)
             )
@@ -558,13 +698,3 @@ class Schema:
     def _request_has_common_query_params(request: Request) -> bool:
         attached_behaviours = request.get_attached_behaviours()
         return attached_behaviours is not None and 'CommonQueryParameters' in attached_behaviours
-
-    @staticmethod
-    def _get_query_parameter(param_name: str, request: Request) -> Union[Variable, None]:
-        query: Dict = request.get_query()
-        if query is None:
-            return None
-        d = query.get(param_name, None)
-        if d is None:
-            return None
-        return Variable.from_dict(d)
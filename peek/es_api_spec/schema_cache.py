@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+from peek import __version__
+from peek.config import config_location
+from peek.es_api_spec.schema import Schema
+
+_logger = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the compiled data changes
+CACHE_FORMAT = 2
+
+_VALUE_KEYS = ('kind', 'type', 'value', 'key', 'items', 'singleKey')
+
+
+def load_schema(schema_filepath: str, cache_dir: Optional[str] = None) -> Schema:
+    """
+    Load the schema from its precompiled cache if it is up-to-date, otherwise parse the JSON source
+    and refresh the cache. The cache is keyed by peek version and Python version. It is up-to-date when
+    the modification time and size of the source are unchanged. Only when they differ, the source is
+    read and its hash compared, so that a touched but unchanged source does not need compiling.
+    """
+    cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+    cache_key = _cache_key()
+    cache_filepath = _cache_filepath(cache_dir, schema_filepath)
+    st = os.stat(schema_filepath)
+    source_stat = (st.st_mtime_ns, st.st_size)
+
+    entry = _read_cache(cache_filepath, cache_key)
+    if entry is not None and entry[0] == source_stat:
+        _logger.debug(f'Loaded precompiled schema from cache [{cache_filepath}]')
+        return Schema(entry[2])
+
+    with open(schema_filepath, 'rb') as ins:
+        source = ins.read()
+    source_hash = hashlib.sha256(source).hexdigest()
+    if entry is not None and entry[1] == source_hash:
+        _logger.debug(f'Source of schema cache [{cache_filepath}] is touched but unchanged')
+        data = entry[2]
+    else:
+        _logger.info(f'Compiling schema [{schema_filepath}] into cache [{cache_filepath}]')
+        data = compile_schema_data(json.loads(source))
+    _write_cache(cache_filepath, cache_key, (source_stat, source_hash, data))
+    return Schema(data)
+
+
+def default_cache_dir() -> str:
+    return os.path.join(config_location(), 'cache')
+
+
+def compile_schema_data(data: Dict) -> Dict:
+    """
+    Strip the raw elasticsearch-specification data down to the fields read by completion.
+    Descriptions, docs, codegen names, availability info and response types are all dropped.
+    Strings are interned so that repeated names are stored and loaded only once.
+    """
+    endpoints = []
+    for endpoint in data['endpoints']:
+        endpoints.append(
+            {
+                'urls': [
+                    {'methods': [_s(m) for m in url['methods']], 'path': _s(url['path'])} for url in endpoint['urls']
+                ],
+                'request': _compile_type_name(endpoint['request']) if endpoint['request'] else None,
+            }
+        )
+
+    types = []
+    for type_definition in data['types']:
+        compiled = _compile_type_definition(type_definition)
+        if compiled is not None:
+            types.append(compiled)
+
+    return {'endpoints': endpoints, 'types': types}
+
+
+def _compile_type_definition(data: Dict) -> Optional[Dict]:
+    kind = data['kind']
+    compiled = {'kind': _s(kind), 'name': _compile_type_name(data['name'])}
+    if kind == 'type_alias':
+        compiled['type'] = _compile_value(data['type'])
+    elif kind == 'interface':
+        compiled['properties'] = [_compile_property(p) for p in data.get('properties', [])]
+    elif kind == 'enum':
+        compiled['members'] = [{'name': _s(m['name'])} for m in data.get('members', [])]
+    elif kind == 'request':
+        if 'query' in data:
+            compiled['query'] = [_compile_property(p) for p in data['query']]
+        if 'attachedBehaviors' in data:
+            compiled['attachedBehaviors'] = [_s(b) for b in data['attachedBehaviors']]
+        compiled['body'] = _compile_body(data['body'])
+    else:
+        # Responses and unknown kinds are never used for completion
+        return None
+    return compiled
+
+
+def _compile_body(data: Dict) -> Dict:
+    kind = data['kind']
+    compiled = {'kind': _s(kind)}
+    if kind == 'properties':
+        compiled['properties'] = [_compile_property(p) for p in data['properties']]
+    elif kind == 'value':
+        compiled['value'] = _compile_value(data['value'])
+    return compiled
+
+
+def _compile_property(data: Dict) -> Dict:
+    compiled = {'name': _s(data['name']), 'type': _compile_value(data['type'])}
+    if data.get('aliases'):
+        compiled['aliases'] = [_s(a) for a in data['aliases']]
+    return compiled
+
+
+def _compile_value(data: Dict) -> Dict:
+    compiled = {}
+    for k in _VALUE_KEYS:
+        if k not in data:
+            continue
+        v = data[k]
+        if k == 'type':
+            v = _compile_type_name(v)
+        elif k in ('value', 'key') and isinstance(v, dict):
+            v = _compile_value(v)
+        elif k == 'items':
+            v = [_compile_value(item) for item in v]
+        elif isinstance(v, str):
+            v = _s(v)
+        compiled[_s(k)] = v
+    return compiled
+
+
+def _compile_type_name(data: Dict) -> Dict:
+    return {'name': _s(data['name']), 'namespace': _s(data['namespace'])}
+
+
+def _s(value: str) -> str:
+    return sys.intern(value)
+
+
+def _cache_key() -> str:
+    return '|'.join(
+        [
+            str(CACHE_FORMAT),
+            __version__,
+            f'{sys.version_info[0]}.{sys.version_info[1]}',
+            str(marshal.version),
+        ]
+    )
+
+
+def _cache_filepath(cache_dir: str, schema_filepath: str) -> str:
+    # One cache file per source file so that stale caches are overwritten instead of piling up
+    path_digest = hashlib.sha1(os.path.abspath(schema_filepath).encode('utf-8')).hexdigest()[:12]
+    basename = os.path.splitext(os.path.basename(schema_filepath))[0]
+    return os.path.join(cache_dir, f'{basename}-{path_digest}.bin')
+
+
+def _read_cache(cache_filepath: str, cache_key: str) -> Optional[Tuple]:
+    """
+    Return the (source stat, source hash, compiled data) entry of the cache if it is written by the same
+    peek and Python versions
+    """
+    if not os.path.exists(cache_filepath):
+        return None
+    try:
+        with open(cache_filepath, 'rb') as ins:
+            cached = marshal.load(ins)
+    except Exception as e:
+        _logger.warning(f'Ignore unreadable schema cache [{cache_filepath}]: {e}')
+        return None
+    # Caches of older formats have a different layout
+    if not isinstance(cached, tuple) or len(cached) != 2 or cached[0] != cache_key:
+        _logger.info(f'Schema cache [{cache_filepath}] is stale')
+        return None
+    return cached[1]
+
+
+def _write_cache(cache_filepath: str, cache_key: str, entry: Tuple):
+    tmp_filepath = f'{cache_filepath}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_filepath), exist_ok=True)
+        with open(tmp_filepath, 'wb') as outs:
+            marshal.dump((cache_key, entry), outs)
+        # Atomic so that concurrent peek processes never see a partially written cache
+        os.replace(tmp_filepath, cache_filepath)
+    except Exception as e:
+        _logger.warning(f'Cannot write schema cache [{cache_filepath}]: {e}')
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
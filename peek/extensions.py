@@ -0,0 +1,128 @@
+"""Index of extension exports so that extension modules are only imported when first used"""
+import ast
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from peek.config import config_location, ensure_dir_exists
+
+_logger = logging.getLogger(__name__)
+
+EXTENSION_INDEX_FILE = 'extension_index.json'
+
+
+class LazyExport:
+    """
+    Stand-in of a name exported by an extension that is not imported yet. Using it in any way imports the
+    extension, after which the VM holds the real value instead.
+    """
+
+    def __init__(self, resolver, path, name):
+        self._resolver = resolver
+        self.path = path
+        self.name = name
+
+    def resolve(self):
+        return self._resolver(self)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return getattr(self.resolve(), item)
+
+    def __repr__(self):
+        return f'<LazyExport {self.name!r} of {self.path!r}>'
+
+
+class ExtensionIndex:
+    """
+    Names exported by extension files as read statically from their source. Results are kept in a JSON file
+    under the config folder and only recomputed when the modification time or size of a file changes.
+    """
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file or (config_location() + EXTENSION_INDEX_FILE)
+        self._entries = self._read()
+        self._dirty = False
+
+    def exports(self, path) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Return the exported names mapped to the source of their values when these are literals, or None when the
+        module must be imported for the value. Return None altogether if the exports cannot be read statically.
+        """
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry['exports']
+
+        with open(path, 'rb') as ins:
+            exports = static_exports(ins.read())
+        self._entries[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'exports': exports}
+        self._dirty = True
+        return exports
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            ensure_dir_exists(self.index_file)
+            with open(self.index_file, 'w') as outs:
+                json.dump(self._entries, outs)
+            self._dirty = False
+        except OSError as e:
+            _logger.warning(f'Cannot save extension index to {self.index_file!r}: {e}')
+
+    def _read(self):
+        try:
+            with open(self.index_file) as ins:
+                entries = json.load(ins)
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            _logger.warning(f'Ignore unreadable extension index {self.index_file!r}: {e}')
+            return {}
+
+
+def static_exports(source) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Read the EXPORTS of an extension without running it. This works when EXPORTS is assigned once at module
+    level with a dict display of string keys and not referred to anywhere else.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    if sum(1 for n in ast.walk(tree) if isinstance(n, ast.Name) and n.id == 'EXPORTS') != 1:
+        return None
+
+    for stmt in tree.body:
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)
+            and stmt.targets[0].id == 'EXPORTS'
+        ):
+            break
+    else:
+        return None
+
+    if not isinstance(stmt.value, ast.Dict):
+        return None
+
+    exports = {}
+    for k, v in zip(stmt.value.keys, stmt.value.values):
+        if not (isinstance(k, ast.Constant) and isinstance(k.value, str)):
+            return None
+        try:
+            ast.literal_eval(v)
+            exports[k.value] = ast.unparse(v)
+        except (ValueError, TypeError, SyntaxError):
+            exports[k.value] = None
+    return exports
@@ -0,0 +1,112 @@
+"""Write search hits and cat rows as table, CSV, TSV or NDJSON"""
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+from peek.errors import PeekError
+
+OUTPUT_FORMATS = ('table', 'csv', 'tsv', 'ndjson')
+
+# Values of a table column are cut to this many characters
+TABLE_MAX_WIDTH = 60
+
+
+def response_rows(data: Any) -> Iterable[Dict[str, Any]]:
+    """
+    Rows of a search response, i.e. the id and flattened source of each hit, or of a JSON cat response
+    """
+    if isinstance(data, dict) and isinstance(data.get('hits'), dict) and isinstance(data['hits'].get('hits'), list):
+        return (_hit_row(hit) for hit in data['hits']['hits'])
+    if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+        return (flatten(row) for row in data)
+    raise PeekError(
+        'Output format requires a search response with hits or a cat response in JSON, '
+        'which can be requested with accept_json_for_cat in peekrc'
+    )
+
+
+def check_output_format(fmt: str):
+    if fmt not in OUTPUT_FORMATS:
+        raise PeekError(f'Unknown output format: {fmt!r}, must be one of {", ".join(OUTPUT_FORMATS)}')
+
+
+def write_rows(data: Any, fmt: str, outs: TextIO):
+    check_output_format(fmt)
+    if fmt == 'ndjson':
+        for row in response_rows(data):
+            outs.write(json.dumps(row, separators=(',', ':')))
+            outs.write('\n')
+        return
+
+    # Rows are flattened again on the second pass instead of being kept, so that memory is bounded by the response
+    columns = _columns(response_rows(data))
+    if fmt == 'table':
+        _write_table(columns, data, outs)
+    else:
+        writer = csv.writer(outs, delimiter='\t' if fmt == 'tsv' else ',', lineterminator='\n')
+        writer.writerow(columns)
+        for row in response_rows(data):
+            writer.writerow(_cell(row.get(c)) for c in columns)
+
+
+def flatten(d: Dict[str, Any], prefix='') -> Dict[str, Any]:
+    """
+    Join keys of nested objects with dots. Lists are kept as values.
+    """
+    flat = {}
+    for k, v in d.items():
+        key = f'{prefix}{k}'
+        if isinstance(v, dict) and v:
+            flat.update(flatten(v, prefix=f'{key}.'))
+        else:
+            flat[key] = v
+    return flat
+
+
+def _hit_row(hit: Dict[str, Any]) -> Dict[str, Any]:
+    row = {'_id': hit.get('_id')}
+    row.update(flatten(hit.get('_source') or {}))
+    return row
+
+
+def _columns(rows: Iterator[Dict[str, Any]]) -> List[str]:
+    # A dict keeps the order in which columns first appear
+    columns = {}
+    for row in rows:
+        for k in row:
+            columns[k] = None
+    return list(columns)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _write_table(columns: List[str], data: Any, outs: TextIO):
+    widths = {c: len(c) for c in columns}
+    for row in response_rows(data):
+        for c in columns:
+            widths[c] = min(max(widths[c], len(_cell(row.get(c)))), TABLE_MAX_WIDTH)
+
+    def line(cells):
+        return '  '.join(_fit(cell, widths[c]) for c, cell in zip(columns, cells)).rstrip() + '\n'
+
+    outs.write(line(columns))
+    outs.write(line('-' * widths[c] for c in columns))
+    for row in response_rows(data):
+        outs.write(line(_cell(row.get(c)) for c in columns))
+
+
+def _fit(text: str, width: int) -> str:
+    text = text.replace('\n', ' ')
+    if len(text) > width:
+        return text[: width - 3] + '...'
+    return text.ljust(width)
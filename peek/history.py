@@ -1,22 +1,203 @@
+import asyncio
 import datetime
+import logging
+import re
 import sqlite3
+import threading
+import time
 from os.path import expanduser
-from typing import Iterable, List
+from typing import AsyncGenerator, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
+from prompt_toolkit.auto_suggest import AutoSuggest, AutoSuggestFromHistory, Suggestion
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.document import Document
 from prompt_toolkit.history import History
 
 from peek.config import config_location, ensure_dir_exists
 
+_logger = logging.getLogger(__name__)
+
 HIST_MAX = 10_000
 
+# Number of history entries fetched per query when loading history
+HIST_PAGE_SIZE = 500
+
+# Number of pages loaded into memory for navigation upfront. Older pages are loaded when navigation reaches them.
+HIST_LOAD_PAGES = 2
+
+# Seconds to wait for the write lock held by other peek processes sharing the database
+HIST_BUSY_TIMEOUT = 10.0
+
+# Writes within this many seconds of the last commit are grouped into the next commit, which is made
+# at the latest this many seconds after the first write of the group
+HIST_COMMIT_INTERVAL = 1.0
+
+# Maximum number of writes grouped into a single commit
+HIST_COMMIT_BATCH = 100
+
+# Maximum number of API call performance records to keep
+PERF_MAX = 100_000
+
+_PERF_ORDERS = {
+    'slowest': 'avg_elapsed',
+    'frequent': 'count',
+}
+
+
+class _TrieNode:
+    __slots__ = ('label', 'children', 'line', 'recency')
+
+    def __init__(self, label: str, line: Optional[str], recency: int):
+        # Text of the edge from the parent. Chains of single children are merged into one edge.
+        self.label = label
+        # Children keyed by the first character of their label
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Most recent line of the subtree
+        self.line = line
+        self.recency = recency
+
+    def offer(self, line: str, recency: int):
+        if self.line is None or self.recency < recency:
+            self.line, self.recency = line, recency
+
+
+class SuggestionIndex:
+    """
+    History lines in a path-compressed trie for finding the most recent line starting with a prefix.
+    Every node keeps the most recent line below it, updated as lines are added, so a lookup only walks
+    down the prefix and takes time proportional to its length regardless of how many lines share it.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode('', None, 0)
+        self._recency: Dict[str, int] = {}
+
+    def add(self, line: str, recency: int):
+        """
+        Add the line, or update its recency if it is already indexed. Higher recency is more recent.
+        """
+        existing = self._recency.get(line)
+        if existing is not None and existing >= recency:
+            return
+        self._recency[line] = recency
+        node, i = self._root, 0
+        while i < len(line):
+            child = node.children.get(line[i])
+            if child is None:
+                node.children[line[i]] = _TrieNode(line[i:], line, recency)
+                return
+            k = _common_prefix_len(child.label, line, i)
+            if k < len(child.label):
+                # Split the edge where the line branches off
+                middle = _TrieNode(child.label[:k], child.line, child.recency)
+                child.label = child.label[k:]
+                middle.children[child.label[0]] = child
+                node.children[line[i]] = middle
+                child = middle
+            child.offer(line, recency)
+            node, i = child, i + k
+
+    def extend(self, lines: Iterable[Tuple[str, int]]):
+        for line, recency in lines:
+            self.add(line, recency)
+
+    def most_recent(self, prefix: str) -> Optional[str]:
+        if not prefix:
+            return None
+        node, i = self._root, 0
+        while i < len(prefix):
+            node = node.children.get(prefix[i])
+            if node is None:
+                return None
+            k = _common_prefix_len(node.label, prefix, i)
+            if k < len(node.label):
+                # The prefix either ends within this edge or branches off where there is no line
+                return node.line if i + k == len(prefix) else None
+            i += k
+        return node.line
+
+    def __len__(self):
+        return len(self._recency)
+
+
+def _common_prefix_len(label: str, text: str, start: int) -> int:
+    """
+    Length of the common prefix of the label and the text from start
+    """
+    n = min(len(label), len(text) - start)
+    k = 0
+    while k < n and label[k] == text[start + k]:
+        k += 1
+    return k
+
+
+class HistoryAutoSuggest(AutoSuggest):
+    """
+    Same suggestions as AutoSuggestFromHistory, looked up from the indexed history lines instead of
+    scanning every history entry on each keystroke.
+    """
+
+    def __init__(self):
+        self._fallback = AutoSuggestFromHistory()
+
+    def get_suggestion(self, buffer: Buffer, document: Document) -> Optional[Suggestion]:
+        history = buffer.history
+        if not isinstance(history, SqLiteHistory):
+            return self._fallback.get_suggestion(buffer, document)
+        # Consider only the last line for the suggestion
+        text = document.text.rsplit('\n', 1)[-1]
+        if not text.strip():
+            return None
+        line = history.most_recent_line(text)
+        return Suggestion(line[len(text) :]) if line is not None else None
+
+
+class RequestRecord(NamedTuple):
+    timestamp: float
+    conn: Optional[str]
+    method: str
+    path: str
+    status: Optional[int]
+    took: Optional[int]
+    elapsed: float
+    request_bytes: int
+    response_bytes: int
+    opaque_id: Optional[str]
+
 
 class SqLiteHistory(History):
-    def __init__(self, history_max=HIST_MAX):
+    def __init__(self, history_max=HIST_MAX, search_index=True):
         super().__init__()
         self.history_max = history_max
-        db_file = expanduser(config_location() + 'history')
+        self.db_file = db_file = expanduser(config_location() + 'history')
         ensure_dir_exists(db_file)
-        self.conn = sqlite3.connect(db_file)
+        self.conn = sqlite3.connect(db_file, timeout=HIST_BUSY_TIMEOUT)
+        self._pending_writes: List[Tuple[str, tuple]] = []
+        self._last_commit = float('-inf')
+        # Pending writes are committed by whichever comes first of the next write, an explicit flush or
+        # the timer. The timer thread commits with its own connection. The lock keeps commits in order.
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._timer_conn: Optional[sqlite3.Connection] = None
+        # Loading pages off the event loop uses a separate connection, one page at a time
+        self._page_conn: Optional[sqlite3.Connection] = None
+        self._page_lock = threading.Lock()
+        # Smallest id loaded so far. Older entries are loaded page by page.
+        self._oldest_loaded_id: int = 0
+        # Loading pauses once this many pages are loaded until load_older asks for more
+        self._pages_loaded = 0
+        self._pages_wanted = HIST_LOAD_PAGES
+        self._more_wanted: Optional[asyncio.Event] = None
+        # Built on first use from loaded entries and kept up-to-date as entries are added or loaded
+        self._suggestion_index: Optional[SuggestionIndex] = None
+        self._newest_recency = 0
+        self._oldest_recency = 0
+        # WAL lets concurrent peek processes read while one of them writes.
+        # Commits are durable at checkpoints, which is enough for history.
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # Take the write lock upfront so that concurrently starting processes create the schema one at a time
+        self.conn.execute('BEGIN IMMEDIATE')
         self.conn.execute(
             'CREATE TABLE IF NOT EXISTS history '
             '(id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL, timestamp INTEGER NOT NULL)'
@@ -25,46 +206,306 @@ class SqLiteHistory(History):
             'CREATE TABLE IF NOT EXISTS connection '
             '(name TEXT PRIMARY KEY, data TEXT NOT NULL, timestamp INTEGER NOT NULL)'
         )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS request_perf '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, conn TEXT, method TEXT NOT NULL, '
+            'path TEXT NOT NULL, status INTEGER, took INTEGER, elapsed REAL NOT NULL, '
+            'request_bytes INTEGER NOT NULL, response_bytes INTEGER NOT NULL, opaque_id TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS request_perf_timestamp ON request_perf(timestamp)')
+        self.fts_enabled = self._init_fts(create=search_index)
         self._maintain_size()
         self.conn.commit()
+        # Entries added after this point are put into loaded strings directly by append_string,
+        # so loading from the database starts below them to avoid duplicates
+        max_id = self.conn.execute('SELECT MAX(id) FROM history').fetchone()[0]
+        self._oldest_loaded_id = (max_id or 0) + 1
 
     def __del__(self):
-        self.conn.close()
+        try:
+            self.close()
+        except sqlite3.ProgrammingError:
+            # Garbage collected on a thread other than the owner, which cannot use the connection
+            pass
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            _logger.warning(f'Cannot save pending history: {e}')
+        with self._write_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._timer_conn is not None:
+                self._timer_conn.close()
+                self._timer_conn = None
+            self.conn.close()
+            self.conn = None
+        if self._page_conn is not None:
+            self._page_conn.close()
+            self._page_conn = None
 
-    def _maintain_size(self):
-        c = self.conn.cursor()
-        res = c.execute('SELECT COUNT(*) from history').fetchone()
-        if res is None or res[0] < self.history_max:
+    def flush(self):
+        """
+        Commit pending writes in a single transaction
+        """
+        with self._write_lock:
+            self._commit_pending(self.conn)
+
+    def _commit_pending(self, conn: sqlite3.Connection):
+        if not self._pending_writes:
             return
-        c.execute(
-            'DELETE FROM history where id in (SELECT id FROM history ORDER BY id limit ?)', (res[0] - self.history_max,)
+        writes, self._pending_writes = self._pending_writes, []
+        with conn:
+            for sql, params in writes:
+                conn.execute(sql, params)
+            self._maintain_size(conn)
+        self._last_commit = time.monotonic()
+
+    def _write(self, sql: str, params: tuple):
+        """
+        Writes are committed in groups to keep the write lock short and infrequent when many writes
+        come in quickly, e.g. from batch scripts. A write after a quiet period is committed right away.
+        Otherwise the group is committed by a timer if no other write or flush comes in time.
+        """
+        with self._write_lock:
+            self._pending_writes.append((sql, params))
+            if (
+                len(self._pending_writes) >= HIST_COMMIT_BATCH
+                or time.monotonic() - self._last_commit >= HIST_COMMIT_INTERVAL
+            ):
+                self._commit_pending(self.conn)
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(HIST_COMMIT_INTERVAL, self._flush_on_deadline)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_on_deadline(self):
+        with self._write_lock:
+            self._flush_timer = None
+            if self.conn is None or not self._pending_writes:
+                return
+            try:
+                if self._timer_conn is None:
+                    # The connection of the history is bound to the thread that created it
+                    self._timer_conn = sqlite3.connect(self.db_file, timeout=HIST_BUSY_TIMEOUT, check_same_thread=False)
+                    self._timer_conn.execute('PRAGMA synchronous=NORMAL')
+                self._commit_pending(self._timer_conn)
+            except sqlite3.Error as e:
+                _logger.warning(f'Cannot save pending history: {e}')
+
+    def _init_fts(self, create=True) -> bool:
+        """
+        Mirror history content into an FTS5 index kept in sync by triggers. Returns False if
+        the SQLite library is built without FTS5, in which case search falls back to LIKE.
+        The index is not created if not asked for, e.g. by batch runs that do not search.
+        """
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'").fetchone()
+        if exists or not create:
+            return bool(exists)
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE history_fts USING fts5(content, content='history', content_rowid='id')"
+            )
+        except sqlite3.OperationalError as e:
+            _logger.info(f'Full-text search for history is not available: {e}')
+            return False
+        # Not executescript since it commits the ongoing transaction
+        self.conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN '
+            'INSERT INTO history_fts(rowid, content) VALUES (new.id, new.content); END'
+        )
+        self.conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN '
+            "INSERT INTO history_fts(history_fts, rowid, content) VALUES('delete', old.id, old.content); END"
+        )
+        self.conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE ON history BEGIN '
+            "INSERT INTO history_fts(history_fts, rowid, content) VALUES('delete', old.id, old.content); "
+            'INSERT INTO history_fts(rowid, content) VALUES (new.id, new.content); END'
         )
+        # Index entries stored before the index existed
+        self.conn.execute("INSERT INTO history_fts(history_fts) VALUES('rebuild')")
+        return True
+
+    def search(self, text: str, size=100) -> List[Tuple[int, str]]:
+        """
+        Most recent history entries matching all words of the given text. Each word matches
+        by token prefix, e.g. "reind slic" matches "POST _reindex?slices=5".
+        """
+        words = _search_words(text)
+        if not words:
+            return []
+        self.flush()
+        if self.fts_enabled:
+            query = ' '.join(f'"{w}"*' for w in words)
+            rows = self.conn.execute(
+                'SELECT rowid, content FROM history_fts WHERE history_fts MATCH ? ORDER BY rowid DESC LIMIT ?',
+                (query, size),
+            )
+        else:
+            # Words have no LIKE wildcards to escape
+            conditions = ' AND '.join('content LIKE ?' for _ in words)
+            patterns = [f'%{w}%' for w in words]
+            rows = self.conn.execute(
+                f'SELECT id, content FROM history WHERE {conditions} ORDER BY id DESC LIMIT ?', (*patterns, size)
+            )
+        return rows.fetchall()
+
+    def _maintain_size(self, conn: Optional[sqlite3.Connection] = None):
+        conn = conn or self.conn
+        # Ids only grow and are removed from the oldest, so a range delete on the primary key
+        # trims to history_max without counting rows
+        conn.execute('DELETE FROM history WHERE id <= (SELECT MAX(id) FROM history) - ?', (self.history_max,))
+        conn.execute('DELETE FROM request_perf WHERE id <= (SELECT MAX(id) FROM request_perf) - ?', (PERF_MAX,))
+
+    def record_request(self, record: RequestRecord):
+        self._write(
+            'INSERT INTO request_perf(timestamp, conn, method, path, status, took, elapsed, '
+            'request_bytes, response_bytes, opaque_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            tuple(record),
+        )
+
+    def perf_summary(self, since: float, until: float, order='slowest', size=20) -> List[Tuple]:
+        """
+        Per normalized endpoint statistics of API calls made within the time window, as tuples of
+        method, path, count, average and maximum elapsed seconds, average took millis and total response bytes.
+        """
+        if order not in _PERF_ORDERS:
+            raise ValueError(f'Unknown order [{order}], must be one of {list(_PERF_ORDERS)}')
+        self.flush()
+        return self.conn.execute(
+            'SELECT method, path, COUNT(*) AS count, AVG(elapsed) AS avg_elapsed, MAX(elapsed), AVG(took), '
+            'SUM(response_bytes) FROM request_perf WHERE timestamp >= ? AND timestamp < ? '
+            f'GROUP BY method, path ORDER BY {_PERF_ORDERS[order]} DESC LIMIT ?',
+            (since, until, size),
+        ).fetchall()
+
+    async def load(self) -> AsyncGenerator[str, None]:
+        """
+        Yield the entries loaded so far, then load older entries page by page without blocking the event
+        loop. Only HIST_LOAD_PAGES pages are loaded before loading pauses, so memory does not grow with
+        history_max. It resumes one page at a time with load_older. Buffer cancels and restarts loading for
+        every prompt, so each call resumes from the oldest entry loaded by previous calls.
+        """
+        for item in list(self._loaded_strings):
+            yield item
+        if not self._loaded:
+            # Pages are read from another connection which sees only committed entries
+            self.flush()
+        loop = asyncio.get_running_loop()
+        while not self._loaded:
+            if self._pages_loaded >= self._pages_wanted:
+                self._more_wanted = asyncio.Event()
+                await self._more_wanted.wait()
+                continue
+            rows = await loop.run_in_executor(None, self._load_page, self._oldest_loaded_id)
+            if not rows or rows[0][0] >= self._oldest_loaded_id:
+                # Either everything is loaded or the page was already loaded by a concurrent call
+                self._loaded = not rows
+                continue
+            self._oldest_loaded_id = rows[-1][0]
+            self._loaded = len(rows) < HIST_PAGE_SIZE
+            self._pages_loaded += 1
+            for _, content in rows:
+                self._loaded_strings.append(content)
+                if self._suggestion_index is not None:
+                    self._index_lines(content, newest=False)
+                yield content
+
+    def load_older(self):
+        """
+        Load another page of older entries, e.g. when navigation gets close to the oldest loaded entry
+        """
+        if self._loaded or self._pages_wanted > self._pages_loaded:
+            return
+        self._pages_wanted = self._pages_loaded + 1
+        if self._more_wanted is not None:
+            self._more_wanted.set()
+
+    def append_string(self, string: str) -> None:
+        super().append_string(string)
+        if self._suggestion_index is not None:
+            self._index_lines(string, newest=True)
+
+    def most_recent_line(self, prefix: str) -> Optional[str]:
+        """
+        The most recent line of loaded history entries that starts with the given prefix
+        """
+        if self._suggestion_index is None:
+            self._suggestion_index = SuggestionIndex()
+            self._suggestion_index.extend(self._recent_to_old_lines(self._loaded_strings))
+        return self._suggestion_index.most_recent(prefix)
+
+    def _index_lines(self, string: str, newest: bool):
+        if newest:
+            # Later lines of an entry are more recent than earlier ones
+            for line in string.splitlines():
+                self._newest_recency += 1
+                self._suggestion_index.add(line, self._newest_recency)
+        else:
+            for line, recency in self._recent_to_old_lines([string]):
+                self._suggestion_index.add(line, recency)
+
+    def _recent_to_old_lines(self, strings: Iterable[str]) -> Iterable[Tuple[str, int]]:
+        """
+        Lines of entries older than all indexed ones, from the most recent, with their recency
+        """
+        for string in strings:
+            for line in reversed(string.splitlines()):
+                self._oldest_recency -= 1
+                yield line, self._oldest_recency
 
     def load_history_strings(self) -> Iterable[str]:
-        strings: List[str] = []
-        for row in self.conn.execute('SELECT * FROM history ORDER BY id DESC'):
-            strings.append(row[1])
-        return strings
+        self.flush()
+        before_id = None
+        while True:
+            rows = self._query_page(self.conn, before_id)
+            for _, content in rows:
+                yield content
+            if len(rows) < HIST_PAGE_SIZE:
+                return
+            before_id = rows[-1][0]
+
+    def _load_page(self, before_id: Optional[int]) -> List[Tuple[int, str]]:
+        with self._page_lock:
+            if self._page_conn is None:
+                self._page_conn = sqlite3.connect(self.db_file, timeout=HIST_BUSY_TIMEOUT, check_same_thread=False)
+            return self._query_page(self._page_conn, before_id)
+
+    @staticmethod
+    def _query_page(conn: sqlite3.Connection, before_id: Optional[int]) -> List[Tuple[int, str]]:
+        if before_id is None:
+            return conn.execute('SELECT id, content FROM history ORDER BY id DESC LIMIT ?', (HIST_PAGE_SIZE,)).fetchall()
+        return conn.execute(
+            'SELECT id, content FROM history WHERE id < ? ORDER BY id DESC LIMIT ?', (before_id, HIST_PAGE_SIZE)
+        ).fetchall()
 
     def store_string(self, string: str) -> None:
-        self.conn.execute("INSERT INTO history(content, timestamp) VALUES (?, ?)", (string, datetime.datetime.now()))
-        self.conn.commit()
+        self._write("INSERT INTO history(content, timestamp) VALUES (?, ?)", (string, datetime.datetime.now()))
 
     def load_recent(self, size=100):
+        self.flush()
         lines = []
-        for row in self.conn.execute("select * from history where id > (select max(id) from history) - ?", (size,)):
+        for row in self.conn.execute(
+            "select id, content from history where id > (select max(id) from history) - ?", (size,)
+        ):
             lines.append((row[0], row[1]))
         return lines
 
     def get_entry(self, index):
+        self.flush()
         if index > 0:
-            for row in self.conn.execute('select * from history where id = ?', (index,)):
+            for row in self.conn.execute('select id, content from history where id = ?', (index,)):
                 return row[0], row[1]
             else:
                 return None
         elif index < 0:
             for row in self.conn.execute(
-                'select * from history where id = (select max(id) from history) + ?', (index,)
+                'select id, content from history where id = (select max(id) from history) + ?', (index,)
             ):
                 return row[0], row[1]
             else:
@@ -90,7 +531,40 @@ class SqLiteHistory(History):
         return list(self.conn.execute("SELECT name, timestamp FROM connection"))
 
     def clear_sessions(self):
-        self.conn.execute("DELETE FROM connection")
+        with self.conn:
+            self.conn.execute("DELETE FROM connection")
 
     def delete_session(self, name):
-        return self.conn.execute("DELETE FROM connection where name = ?", (name,)).rowcount == 1
+        with self.conn:
+            return self.conn.execute("DELETE FROM connection where name = ?", (name,)).rowcount == 1
+
+
+def _search_words(text: str) -> List[str]:
+    # Same word boundaries as the FTS5 unicode61 tokenizer, i.e. underscore and punctuation separate words
+    return re.findall(r'[^\W_]+', text)
+
+
+def normalize_path(path: str) -> str:
+    """
+    Reduce an API path to its endpoint by dropping the query string and replacing index names, ids and
+    other variable path segments with a star, e.g. /logs-2024.01/_doc/42?refresh becomes /*/_doc/*
+    """
+    normalized = []
+    for p in path.split('?', 1)[0].split('/'):
+        if not p:
+            continue
+        if (
+            (not normalized and not p.startswith('_'))
+            or (normalized and normalized[-1] in _ID_PARENT_SEGMENTS)
+            or _API_WORD.fullmatch(p) is None
+        ):
+            normalized.append('*')
+        else:
+            normalized.append(p)
+    return '/' + '/'.join(normalized)
+
+
+# Segments followed by a document or resource id
+_ID_PARENT_SEGMENTS = {'_doc', '_create', '_update', '_source', '_explain', '_termvectors', '_tasks', '_async_search'}
+
+_API_WORD = re.compile(r'[a-z_]+')
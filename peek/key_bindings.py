@@ -1,15 +1,17 @@
 import logging
 
 from prompt_toolkit.application import get_app
-from prompt_toolkit.buffer import Buffer, ValidationState
+from prompt_toolkit.buffer import Buffer, CompletionState, ValidationState
+from prompt_toolkit.completion import Completion
 from prompt_toolkit.document import Document
 from prompt_toolkit.enums import DEFAULT_BUFFER
-from prompt_toolkit.filters import Condition, completion_is_selected, has_completions, is_searching
+from prompt_toolkit.filters import Condition, completion_is_selected, emacs_mode, has_completions, is_searching
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.key_binding.key_processor import KeyPressEvent
 
 from peek.common import HTTP_METHODS
 from peek.errors import PeekError, PeekSyntaxError
+from peek.history import HIST_PAGE_SIZE, SqLiteHistory
 from peek.lexers import (
     BracketLeft,
     BracketRight,
@@ -26,6 +28,9 @@ from peek.visitors import FormattingVisitor
 
 _logger = logging.getLogger(__name__)
 
+# Number of matching history entries offered by reverse search
+HISTORY_SEARCH_SIZE = 50
+
 
 def key_bindings(app):
     kb = KeyBindings()
@@ -99,6 +104,23 @@ def key_bindings(app):
         else:
             b.start_completion(select_first=False)
 
+    @kb.add('up')
+    @kb.add('c-p', filter=emacs_mode)
+    def _(event):
+        b = event.current_buffer
+        b.auto_up(count=event.arg)
+        # History is loaded partially, so ask for older entries ahead of reaching the oldest loaded one
+        if isinstance(b.history, SqLiteHistory) and b.working_index < HIST_PAGE_SIZE // 2:
+            b.history.load_older()
+
+    @kb.add('c-r', filter=~is_searching & history_search_available())
+    def _(event):
+        b = event.current_buffer
+        if b.complete_state is not None:
+            b.complete_next()
+        elif not show_history_matches(b):
+            event.app.output.bell()
+
     @kb.add('f3')
     def _(event):
         _logger.debug('Reformatting payload json')
@@ -231,6 +253,39 @@ def key_bindings(app):
     return kb
 
 
+def history_search_available():
+    """
+    Full-text search of history takes over reverse search once some text is typed. An empty buffer
+    keeps the incremental search of prompt_toolkit.
+    """
+
+    @Condition
+    def cond():
+        b = get_app().current_buffer
+        return isinstance(b.history, SqLiteHistory) and b.text.strip() != ''
+
+    return cond
+
+
+def show_history_matches(b: Buffer) -> bool:
+    """
+    Offer the most recent history entries matching all words of the buffer text in the completion menu.
+    Choosing one replaces the buffer text. Return False if nothing matches.
+    """
+    rows = b.history.search(b.text, size=HISTORY_SEARCH_SIZE)
+    if not rows:
+        return False
+    b.cursor_position = len(b.text)
+    completions = []
+    for index, content in rows:
+        lines = content.splitlines() or ['']
+        display = lines[0] + (' ...' if len(lines) > 1 else '')
+        completions.append(Completion(content, start_position=-len(b.text), display=display, display_meta=f'[{index}]'))
+    b.complete_state = CompletionState(original_document=b.document, completions=completions)
+    b.go_to_completion(0)
+    return True
+
+
 def buffer_should_be_handled(app):
     peek_lexer = PeekLexer()
 
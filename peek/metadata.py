@@ -0,0 +1,169 @@
+import bisect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from prompt_toolkit.completion import Completion
+
+_logger = logging.getLogger(__name__)
+
+# Placeholders in API URL templates and the kinds of target names they accept
+TARGET_PLACEHOLDERS = {
+    'index': ('index', 'alias', 'data_stream'),
+    'target': ('index', 'alias', 'data_stream'),
+    'alias': ('alias',),
+}
+
+_TARGET_DISPLAY_META = {
+    'index': 'index',
+    'alias': 'alias',
+    'data_stream': 'data stream',
+}
+
+MAX_COMPLETIONS = 200
+
+
+class PrefixIndex:
+    """
+    Sorted names supporting prefix lookup with binary search, so that the cost of completion does not
+    grow linearly with the number of names, e.g. tens of thousands of indices.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self._names = sorted(set(names))
+
+    def with_prefix(self, prefix: str, limit: int = MAX_COMPLETIONS) -> List[str]:
+        start = bisect.bisect_left(self._names, prefix)
+        results = []
+        for name in self._names[start : start + limit]:
+            if not name.startswith(prefix):
+                break
+            results.append(name)
+        return results
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        i = bisect.bisect_left(self._names, name)
+        return i < len(self._names) and self._names[i] == name
+
+
+class ClusterTargets(NamedTuple):
+    index: PrefixIndex
+    alias: PrefixIndex
+    data_stream: PrefixIndex
+
+
+class TtlCache:
+    """
+    A bounded LRU cache whose entries expire after ttl seconds. Missing or expired entries are loaded on
+    a background thread. Expired entries keep being served until their replacements are ready.
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._loading = set()
+
+    def get(self, key, loader: Callable[[], object]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._schedule_load(key, loader)
+            return entry[1] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _schedule_load(self, key, loader):
+        if key in self._loading:
+            return
+        self._loading.add(key)
+        threading.Thread(target=self._load, args=(key, loader), name='peek-metadata-loader', daemon=True).start()
+
+    def _load(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:
+            _logger.warning(f'Cannot load metadata for completion [{key[1:]}]: {e}')
+            value = None
+        with self._lock:
+            self._loading.discard(key)
+            if value is None:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class MetadataCompleter:
+    """
+    Complete index names, aliases, data streams and field names of the cluster behind the current connection.
+    """
+
+    def __init__(self, app, ttl: float = 60, max_entries: int = 128):
+        self.app = app
+        self.cache = TtlCache(ttl=ttl, max_entries=max_entries)
+
+    def complete_targets(self, placeholders: Iterable[str], prefix: str) -> List[Completion]:
+        kinds = []
+        for placeholder in placeholders:
+            for kind in TARGET_PLACEHOLDERS.get(placeholder, ()):
+                if kind not in kinds:
+                    kinds.append(kind)
+        if not kinds:
+            return []
+        targets: Optional[ClusterTargets] = self._get(('targets',), _load_targets)
+        if targets is None:
+            return []
+        # Comma separated multi-target syntax, complete the last one
+        prefix = prefix.rsplit(',', 1)[-1]
+        completions = []
+        for kind in kinds:
+            for name in getattr(targets, kind).with_prefix(prefix):
+                completions.append(
+                    Completion(name, start_position=-len(prefix), display_meta=_TARGET_DISPLAY_META[kind])
+                )
+        return completions[:MAX_COMPLETIONS]
+
+    def field_names(self, index: Optional[str], prefix: str) -> List[str]:
+        index = index or '*'
+        fields: Optional[PrefixIndex] = self._get(('fields', index), lambda client: _load_fields(client, index))
+        if fields is None:
+            return []
+        return fields.with_prefix(prefix)
+
+    def _get(self, key, loader):
+        try:
+            client = self.app.es_client_manager.current
+        except Exception as e:
+            _logger.debug(f'No current client for metadata completion: {e}')
+            return None
+        return self.cache.get((client,) + key, lambda: loader(client))
+
+
+def _load_targets(client) -> ClusterTargets:
+    body = client.perform_request('GET', '/_resolve/index/*', deserialize_it=True).body
+    return ClusterTargets(
+        index=PrefixIndex(i['name'] for i in body.get('indices', [])),
+        alias=PrefixIndex(a['name'] for a in body.get('aliases', [])),
+        data_stream=PrefixIndex(d['name'] for d in body.get('data_streams', [])),
+    )
+
+
+def _load_fields(client, index: str) -> PrefixIndex:
+    # Field capabilities are merged across indices so the response does not grow with the number of indices
+    body = client.perform_request(
+        'GET', f'/{index}/_field_caps?fields=*&filter_path=fields', deserialize_it=True
+    ).body
+    fields: Dict[str, Dict] = body.get('fields', {})
+    return PrefixIndex(name for name, caps in fields.items() if 'object' not in caps)
@@ -1,16 +1,22 @@
+import itertools
 import json
 import logging
 import os
 import random
+import re
+import time
+from typing import Optional
 
 from configobj import ConfigObj
 
 from peek import __version__
+from peek.capture import STRUCTURED_CAPTURE_EXTENSIONS
 from peek.common import DEFAULT_SAVE_NAME
 from peek.config import config_location, get_global_config
 from peek.connection import ConnectFunc, EsClientManager
 from peek.display import PeekEncoder
 from peek.errors import PeekError
+from peek.extensions import LazyExport
 from peek.krb import KrbAuthenticateFunc
 from peek.oidc import OidcAuthenticateFunc
 from peek.saml import SamlAuthenticateFunc
@@ -176,14 +182,25 @@ class RunFunc:
     def __call__(self, app, file, **options):
         should_echo = options.get('echo', True)
         is_capture = options.get('is_capture')
-        if is_capture:
-            # preprocess to remove non-executable sections of captured output
-            with open(file) as ins:
-                filtered = self._filter_captured_output(ins.readlines())
-            app.process_input('\n'.join(filtered), echo=should_echo)
-        else:
-            with open(file) as ins:
-                app.process_input(ins.read(), echo=should_echo)
+        with open(file) as ins:
+            lines = iter(ins)
+            first_line = next(lines, '')
+            lines = itertools.chain([first_line], lines)
+            # A structured capture is told apart from plain NDJSON and scripts by the input of its entries
+            structured = is_capture or os.path.splitext(file)[1] in STRUCTURED_CAPTURE_EXTENSIONS
+            if structured and _capture_entry(first_line) is not None:
+                for i, line in enumerate(lines, start=1):
+                    if not line.strip():
+                        continue
+                    entry = _capture_entry(line)
+                    if entry is None:
+                        raise PeekError(f'Line {i} of {file!r} is not a structured capture entry: {line.strip()!r}')
+                    app.process_input(entry['input'], echo=should_echo)
+            elif is_capture:
+                # preprocess to remove non-executable sections of captured output
+                app.process_stream(self._filter_captured_output(lines), echo=should_echo)
+            else:
+                app.process_stream(lines, echo=should_echo)
 
     @property
     def options(self):
@@ -194,10 +211,9 @@ class RunFunc:
         return 'Load and execute external script'
 
     def _filter_captured_output(self, lines):
-        filtered = []
         state = 0
-        while len(lines) > 0:
-            line = lines.pop(0).strip()
+        for line in lines:
+            line = line.strip()
             if state == 0:
                 if line == '===' or line.startswith('==='):
                     state = 1
@@ -206,21 +222,29 @@ class RunFunc:
                 elif line == '>>>' or line.startswith('>>> '):
                     continue
                 else:
-                    filtered.append(line)
+                    yield line
             elif state == 1:
                 if line == '>>>' or line.startswith('>>> '):
                     state = 0
                 else:
                     continue
 
-        return filtered
-
 
 class HistoryFunc:
     def __call__(self, app, index=None, **options):
+        options = consolidate_options(options, {'perf': 'slowest'})
+        if 'perf' in options:
+            return self._perf(app, options)
         if index is None:
+            size = options.get('size', 100)
+            search = options.get('search')
+            if search is not None:
+                # Most recent match shown last to read the same as the listing of recent history
+                entries = reversed(app.history.search(str(search), size=size))
+            else:
+                entries = app.history.load_recent(size=size)
             history = []
-            for entry in app.history.load_recent(size=options.get('size', 100)):
+            for entry in entries:
                 history.append(f'{entry[0]:>6} {entry[1]!r}')
             return '\n'.join(history)
         else:
@@ -229,13 +253,28 @@ class HistoryFunc:
                 raise PeekError(f'History not found for index: {index}')
             app.process_input(entry[1])
 
+    @staticmethod
+    def _perf(app, options):
+        now = time.time()
+        since = now - _parse_duration(options.get('since', '1d'))
+        until = now - _parse_duration(options.get('until', '0s'))
+        rows = app.history.perf_summary(since, until, order=options['perf'], size=options.get('size', 20))
+        lines = [f'{"count":>7} {"avg ms":>9} {"max ms":>9} {"took ms":>9} {"resp KiB":>10}  endpoint']
+        for method, path, count, avg_elapsed, max_elapsed, avg_took, response_bytes in rows:
+            took = f'{avg_took:.1f}' if avg_took is not None else '-'
+            lines.append(
+                f'{count:>7} {avg_elapsed * 1000:>9.1f} {max_elapsed * 1000:>9.1f} {took:>9} '
+                f'{response_bytes / 1024:>10.1f}  {method} {path}'
+            )
+        return '\n'.join(lines)
+
     @property
     def options(self):
-        return {'size': 100}
+        return {'size': 100, 'search': None, 'since': '1d', 'until': '0s', '@perf': 'slowest'}
 
     @property
     def description(self):
-        return 'View history and execute by history index'
+        return 'View, search and execute history by history index, or summarize API call performance'
 
 
 class RangeFunc:
@@ -305,7 +344,8 @@ class CaptureFunc:
         # Only honor first directive
         directive = directives[0]
         if directive == 'start':
-            return app.start_capture(f)
+            structured = options.get('structured', f is not None and f.endswith(STRUCTURED_CAPTURE_EXTENSIONS))
+            return app.start_capture(f, structured=structured)
 
         elif directive == 'stop':
             return app.stop_capture()
@@ -314,13 +354,34 @@ class CaptureFunc:
 
     @property
     def options(self):
-        return {'@start': None, '@stop': None}
+        return {'@start': None, '@stop': None, 'structured': False}
 
     @property
     def description(self):
         return 'Capture session IO into a file'
 
 
+class ReplayFunc:
+    def __call__(self, app, file, **options):
+        from peek.replay import load_requests, parse_speed, replay
+
+        speed = parse_speed(options.get('speed', 1))
+        users = int(options.get('users', 1))
+        requests = load_requests(file)
+        if not requests:
+            raise PeekError(f'No API call to replay in {file!r}, is it a structured capture?')
+        es_client = app.es_client_manager.get_client(options.get('conn'))
+        return replay(requests, es_client, speed=speed, users=users)
+
+    @property
+    def options(self):
+        return {'conn': None, 'speed': 1, 'users': 1}
+
+    @property
+    def description(self):
+        return 'Re-issue API calls of a structured capture and compare latency and errors with the original'
+
+
 class GetEnvFunc:
     def __call__(self, app, name):
         return os.getenv(name, '')
@@ -342,20 +403,49 @@ class ResetFunc:
         return 'Reset current session back to its initial start state'
 
 
+class PageFunc:
+    def __call__(self, app, value=None):
+        if app.batch_mode:
+            raise PeekError('Pager is only available in interactive mode')
+        if value is None:
+            value = app.vm.context.get('_')
+        if value is None:
+            raise PeekError('Nothing to page, run a request first or provide a value')
+        from peek.pager import Pager
+
+        Pager(_pager_text(app, value), swap_colour=app.config.as_bool('swap_colour')).run()
+
+    @property
+    def description(self):
+        return 'Browse the given value or the last response in a pager with search'
+
+
+class ReloadFunc:
+    def __call__(self, app):
+        reloaded = app.vm.reload_extensions()
+        if not reloaded:
+            return 'No extension changed'
+        return 'Reloaded extensions:\n' + '\n'.join(reloaded)
+
+    @property
+    def description(self):
+        return 'Reload extension files changed since they were loaded without resetting the session'
+
+
 class ExitFunc:
     def __call__(self, app):
-        if not app.batch_mode:
+        if not app.batch_mode or app.serving:
             app.signal_exit()
 
     @property
     def description(self):
-        return 'Exit the current interactive session'
+        return 'Exit the current interactive session or stop serving'
 
 
 class HelpFunc:
     def __call__(self, app, func=None, **options):
         if func is None:
-            return '\n'.join(f'{k} - {getattr(v, "description", "")}' for k, v in app.vm.functions.items())
+            return '\n'.join(f'{k} - {_description(v)}' for k, v in app.vm.functions.items())
 
         for k, v in app.vm.functions.items():
             if v == func:
@@ -390,10 +480,14 @@ class DownloadApiSpecsFunc:
                 f'Please create it before downloading API spec files'
             )
 
-        schema_filepath = os.path.join(config_dir, 'schema.json')
+        git_branch = str(options.get('version', self.options['version']))
+        # The version becomes part of the file path and must not step out of the config directory
+        if not re.fullmatch(r'[\w\-]+(\.[\w\-]+)*', git_branch):
+            raise PeekError(f'Invalid version: {git_branch!r}, expect a branch name like "9.2" or "main"')
+        # Each branch is kept side by side so that completion can follow the version of the connected cluster
+        schema_filepath = os.path.join(config_dir, 'specs', git_branch, 'schema.json')
         if os.path.exists(schema_filepath):
             raise RuntimeError(f'schema file already exists [{schema_filepath}]. Please remove it before download.')
-        git_branch = options.get('version', self.options['version'])
         import urllib.request
 
         url = (
@@ -401,10 +495,11 @@ class DownloadApiSpecsFunc:
             f'{git_branch}/output/schema/schema.json'
         )
         data = urllib.request.urlopen(url).read()
+        os.makedirs(os.path.dirname(schema_filepath), exist_ok=True)
         with open(schema_filepath, 'wb') as outs:
             outs.write(data)
-        app.completer.init_api_completer()
-        return f'Elasticsearch specification [{git_branch}] downloaded and initialized'
+        app.reload_api_completer()
+        return f'Elasticsearch specification [{git_branch}] downloaded and is being loaded'
 
     @property
     def options(self):
@@ -441,7 +536,7 @@ class DownloadExtensionFileFunc:
         with open(filename, 'wb') as outs:
             outs.write(data)
 
-        app.vm._load_one_extension_path(default_extension_path)
+        app.vm.reload_extensions()
         return f'Extension file [{filename}] downloaded and initialized'
 
     @property
@@ -459,6 +554,50 @@ class ContextFunc:
         return '\n'.join(lines)
 
 
+def _capture_entry(line: str) -> Optional[dict]:
+    if not line.startswith('{'):
+        return None
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) and 'input' in entry else None
+
+
+def _description(func) -> str:
+    if isinstance(func, LazyExport):
+        # Reading the description would import the extension
+        return f'(not imported yet, from {func.path})'
+    return getattr(func, 'description', '')
+
+
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def _parse_duration(duration) -> float:
+    """
+    Seconds of a duration like 90s, 15m, 6h, 7d, 2w. Plain numbers are seconds.
+    """
+    if isinstance(duration, (int, float)):
+        return duration
+    duration = str(duration).strip()
+    try:
+        if duration[-1:] in _DURATION_UNITS:
+            return float(duration[:-1]) * _DURATION_UNITS[duration[-1]]
+        return float(duration)
+    except ValueError:
+        raise PeekError(f'Invalid duration: {duration!r}')
+
+
+def _pager_text(app, value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return value
+    return json.dumps(value, cls=PeekEncoder, app=app, indent=2)
+
+
 def consolidate_options(options, defaults):
     """
     Merge shorthanded @symbol into normal options kv pair with provided defaults
@@ -482,8 +621,11 @@ EXPORTS = {
     'range': RangeFunc(),
     'randint': RandIntFunc(),
     'capture': CaptureFunc(),
+    'replay': ReplayFunc(),
     'getenv': GetEnvFunc(),
     'reset': ResetFunc(),
+    'reload': ReloadFunc(),
+    'page': PageFunc(),
     'exit': ExitFunc(),
     'help': HelpFunc(),
     'version': VersionFunc(),
@@ -0,0 +1,232 @@
+"""Full screen pager that highlights only the lines on screen"""
+import logging
+import re
+from typing import List, Optional
+
+import pygments
+from prompt_toolkit.application import Application
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.data_structures import Point
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.formatted_text import PygmentsTokens, StyleAndTextTuples, to_formatted_text
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import ConditionalContainer, HSplit, Layout, Window
+from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl, UIContent, UIControl
+from prompt_toolkit.layout.processors import BeforeInput
+from prompt_toolkit.styles import (
+    ConditionalStyleTransformation,
+    SwapLightAndDarkStyleTransformation,
+    style_from_pygments_cls,
+)
+from pygments.lexers.data import JsonLexer
+from pygments.token import Keyword, Name, Whitespace
+
+from peek.lexers import DictKey, PeekStyle
+
+_logger = logging.getLogger(__name__)
+
+# Number of highlighted lines kept around, enough for scrolling back and forth a few screens
+LINE_CACHE_SIZE = 2000
+
+# Map JSON tokens to the ones coloured by PeekStyle
+_TOKEN_MAP = {
+    Name.Tag: DictKey,
+    Keyword.Constant: Name.Builtin,
+}
+
+
+class LazyHighlightControl(UIControl):
+    """
+    Show the lines starting at top. Each line is lexed on its own and only when it is drawn, which works because
+    pretty printed JSON never has a token spanning lines.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.top = 0
+        self.match_line: Optional[int] = None
+        self._lexer = JsonLexer()
+        self._cache = {}
+
+    def is_focusable(self) -> bool:
+        return True
+
+    def create_content(self, width: int, height: int) -> UIContent:
+        return UIContent(
+            get_line=self._get_line, line_count=len(self.lines), cursor_position=Point(0, self.top), show_cursor=False
+        )
+
+    def _get_line(self, i: int) -> StyleAndTextTuples:
+        fragments = self._cache.get(i)
+        if fragments is None:
+            if len(self._cache) >= LINE_CACHE_SIZE:
+                self._cache.clear()
+            fragments = self._cache[i] = self._highlight(self.lines[i])
+        if i == self.match_line:
+            return [(f'{style} reverse', text) for style, text in fragments]
+        return fragments
+
+    def _highlight(self, line: str) -> StyleAndTextTuples:
+        tokens = []
+        for ttype, value in pygments.lex(line, self._lexer):
+            if ttype is Whitespace and value.endswith('\n'):
+                value = value[:-1]
+            tokens.append((_TOKEN_MAP.get(ttype, ttype), value))
+        return to_formatted_text(PygmentsTokens(tokens))
+
+
+class Pager:
+    """
+    Scroll through text with less-like keys. "/" searches for a text and ":" jumps to the next occurrence
+    of a JSON key. Lines are only highlighted when they are shown.
+    """
+
+    def __init__(self, text: str, swap_colour=False, **app_options):
+        self.lines = text.splitlines() or ['']
+        self.control = LazyHighlightControl(self.lines)
+        self.window = Window(self.control, get_vertical_scroll=lambda w: self.control.top, wrap_lines=False)
+        self.prompt_kind: Optional[str] = None
+        self.pattern: Optional[re.Pattern] = None
+        self.message = ''
+        self.prompt_buffer = Buffer(multiline=False, accept_handler=self._accept_prompt)
+        prompt_shown = Condition(lambda: self.prompt_kind is not None)
+        self.app = Application(
+            layout=Layout(
+                HSplit(
+                    [
+                        self.window,
+                        ConditionalContainer(
+                            Window(FormattedTextControl(self._status_text), height=1, style='reverse'),
+                            filter=~prompt_shown,
+                        ),
+                        ConditionalContainer(
+                            Window(
+                                BufferControl(
+                                    self.prompt_buffer, input_processors=[BeforeInput(lambda: self.prompt_kind)]
+                                ),
+                                height=1,
+                            ),
+                            filter=prompt_shown,
+                        ),
+                    ]
+                ),
+                focused_element=self.window,
+            ),
+            key_bindings=self._key_bindings(prompt_shown),
+            style=style_from_pygments_cls(PeekStyle),
+            style_transformation=ConditionalStyleTransformation(SwapLightAndDarkStyleTransformation(), swap_colour),
+            full_screen=True,
+            **app_options,
+        )
+
+    def run(self):
+        self.app.run()
+
+    @property
+    def page_size(self):
+        info = self.window.render_info
+        return max(info.window_height - 1, 1) if info is not None else 20
+
+    def scroll_to(self, line: int):
+        self.control.top = max(0, min(line, len(self.lines) - 1))
+
+    def search(self, pattern: re.Pattern, forward=True) -> bool:
+        """
+        Move to the next line matching the pattern after or before the current match or the top line
+        """
+        self.pattern = pattern
+        current = self.control.match_line if self.control.match_line is not None else self.control.top - 1
+        indices = range(current + 1, len(self.lines)) if forward else range(current - 1, -1, -1)
+        for i in indices:
+            if pattern.search(self.lines[i]):
+                self.control.match_line = i
+                if not self.control.top <= i < self.control.top + self.page_size:
+                    self.scroll_to(i)
+                self.message = ''
+                return True
+        self.message = f'Pattern not found: {pattern.pattern}'
+        return False
+
+    def _accept_prompt(self, buffer: Buffer):
+        text, kind = buffer.text, self.prompt_kind
+        self.prompt_kind = None
+        self.app.layout.focus(self.window)
+        if text:
+            self.control.match_line = None
+            if kind == '/':
+                self.search(re.compile(re.escape(text), re.IGNORECASE))
+            else:
+                self.search(re.compile(rf'^\s*"{re.escape(text)}"\s*:'))
+        return False
+
+    def _status_text(self):
+        last = min(self.control.top + self.page_size, len(self.lines))
+        status = f' lines {self.control.top + 1}-{last}/{len(self.lines)}'
+        if self.message:
+            status += f'  {self.message}'
+        return status + '  (q:quit /:search n/N:next/prev ::jump to key)'
+
+    def _key_bindings(self, prompt_shown):
+        kb = KeyBindings()
+        browsing = ~prompt_shown
+
+        @kb.add('q', filter=browsing)
+        @kb.add('c-c')
+        def _(event):
+            event.app.exit()
+
+        @kb.add('escape', filter=prompt_shown)
+        def _(event):
+            self.prompt_kind = None
+            event.app.layout.focus(self.window)
+
+        @kb.add('down', filter=browsing)
+        @kb.add('j', filter=browsing)
+        @kb.add('enter', filter=browsing)
+        def _(event):
+            self.scroll_to(self.control.top + 1)
+
+        @kb.add('up', filter=browsing)
+        @kb.add('k', filter=browsing)
+        def _(event):
+            self.scroll_to(self.control.top - 1)
+
+        @kb.add('pagedown', filter=browsing)
+        @kb.add('space', filter=browsing)
+        @kb.add('f', filter=browsing)
+        def _(event):
+            self.scroll_to(self.control.top + self.page_size)
+
+        @kb.add('pageup', filter=browsing)
+        @kb.add('b', filter=browsing)
+        def _(event):
+            self.scroll_to(self.control.top - self.page_size)
+
+        @kb.add('g', filter=browsing)
+        @kb.add('home', filter=browsing)
+        def _(event):
+            self.scroll_to(0)
+
+        @kb.add('G', filter=browsing)
+        @kb.add('end', filter=browsing)
+        def _(event):
+            self.scroll_to(len(self.lines) - self.page_size)
+
+        @kb.add('/', filter=browsing)
+        @kb.add(':', filter=browsing)
+        def _(event):
+            self.prompt_kind = event.data
+            self.prompt_buffer.reset()
+            event.app.layout.focus(self.prompt_buffer)
+
+        @kb.add('n', filter=browsing)
+        def _(event):
+            if self.pattern is not None:
+                self.search(self.pattern)
+
+        @kb.add('N', filter=browsing)
+        def _(event):
+            if self.pattern is not None:
+                self.search(self.pattern, forward=False)
+
+        return kb
@@ -2,7 +2,8 @@ import ast
 import json
 import logging
 from enum import Enum
-from typing import Callable, Iterable, NamedTuple
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from pygments.token import Comment, Error, Literal, Name, Number, String, Token, Whitespace
 
@@ -59,6 +60,9 @@ _logger = logging.getLogger(__name__)
 
 HTTP_METHODS = [m.upper() for m in HTTP_METHODS]
 
+# Beginning of a line that may start a new statement, i.e. HTTP method, function name, let, for or shell out
+_STMT_START = re.compile(r'[A-Za-z_!]')
+
 _BIN_OP_ORDERS = {
     None: -1,
     '+': 100,
@@ -150,6 +154,56 @@ class PeekParser:
             if log_level is not None:
                 _logger.setLevel(saved_log_level)
 
+    def parse_stream(
+        self, lines: Iterable[str], on_error: Optional[Callable[[PeekSyntaxError], None]] = None
+    ) -> Iterator[List]:
+        """
+        Parse the given lines incrementally and yield nodes of statements as soon as they are complete.
+        This keeps memory constant and lets the first statement run before the whole input is read.
+        Accumulated text is tried for parsing at a blank line or at a line starting a new statement,
+        e.g. a HTTP method or function name at column 0. If it fails at its end, it is still incomplete
+        and more lines are accumulated. If it fails before its last line, more lines cannot fix it.
+        Such errors and errors of whatever is left at the end of input are raised, or passed to on_error
+        if given, in which case parsing resumes at the next line starting a statement.
+        """
+        chunk = []
+        # Number of lines before the chunk so that errors are reported with line numbers of the whole input
+        chunk_start = 0
+        # Lines after an error are skipped until one starts a statement
+        skipping = False
+        for line_index, line in enumerate(lines):
+            if chunk and (not line.strip() or _STMT_START.match(line)):
+                while chunk:
+                    try:
+                        nodes = self.parse(''.join(chunk), log_level=logging.WARNING)
+                    except PeekSyntaxError as e:
+                        if _error_line(e) >= len(chunk) - 1:
+                            break
+                        chunk, chunk_start = _resync(e, chunk, chunk_start, on_error)
+                        skipping = not chunk
+                    else:
+                        # Triple-quoted strings are allowed to be open at the end of text
+                        if not _has_open_triple_quote(self.tokens):
+                            chunk = []
+                            yield nodes
+                        break
+            if skipping:
+                if not _STMT_START.match(line):
+                    continue
+                skipping = False
+            if chunk or line.strip():
+                if not chunk:
+                    chunk_start = line_index
+                chunk.append(line if line.endswith('\n') else line + '\n')
+        while chunk:
+            try:
+                nodes = self.parse(''.join(chunk))
+            except PeekSyntaxError as e:
+                chunk, chunk_start = _resync(e, chunk, chunk_start, on_error)
+            else:
+                yield nodes
+                break
+
     def _do_parse(self):
         nodes = []
         while self._peek_token().ttype is not EOF:
@@ -157,7 +211,10 @@ class PeekParser:
             if token.ttype is BlankLine:
                 self._consume_token(BlankLine)
             else:
-                nodes.append(self._parse_stmt())
+                node = self._parse_stmt()
+                last_token = self.tokens[self.position - 1]
+                node.source = self.text[token.index : last_token.index + len(last_token.value)].rstrip()
+                nodes.append(node)
         return nodes
 
     def _do_parse_payload(self):
@@ -474,6 +531,39 @@ def process_tokens(tokens: Iterable[PeekToken]):
     return processed_tokens
 
 
+def _error_line(e: PeekSyntaxError) -> int:
+    return e.text.count('\n', 0, e.error_token.index)
+
+
+def _resync(
+    e: PeekSyntaxError, chunk: List[str], chunk_start: int, on_error: Optional[Callable[[PeekSyntaxError], None]]
+) -> Tuple[List[str], int]:
+    """
+    Report the error of the chunk and return what is left of the chunk from the first line after the error
+    that starts a statement, along with its line number
+    """
+    e.line_offset += chunk_start
+    if on_error is None:
+        raise e
+    on_error(e)
+    error_line = _error_line(e)
+    # An error at the start of a later line is caused by an unfinished statement before it
+    if error_line > 0 and e.text[e.error_token.index - 1] == '\n':
+        error_line -= 1
+    for i in range(error_line + 1, len(chunk)):
+        if _STMT_START.match(chunk[i]):
+            return chunk[i:], chunk_start + i
+    return [], chunk_start + len(chunk)
+
+
+def _has_open_triple_quote(tokens) -> bool:
+    for token in reversed(tokens):
+        if token.ttype in (TripleD, TripleS):
+            value = token.value
+            return len(value) < 6 or not value.endswith(value[:3])
+    return False
+
+
 def find_last_stmt_token(tokens) -> int:
     """
     Find the last token that can start a statement
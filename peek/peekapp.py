@@ -3,29 +3,27 @@ import json
 import logging
 import logging.handlers
 import sys
+import time
 from datetime import datetime
-from typing import Iterable
+from typing import Iterable, Optional
 
 from prompt_toolkit import PromptSession, prompt
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.filters import Condition
 from prompt_toolkit.formatted_text import FormattedText
 from prompt_toolkit.layout.processors import HighlightMatchingBracketProcessor
 from prompt_toolkit.lexers import PygmentsLexer
 from prompt_toolkit.styles import style_from_pygments_cls
 
-from peek.capture import FileCapture, NoOpCapture
+from peek.capture import BufferedFileCapture, NoOpCapture, StructuredCapture
 from peek.common import AUTO_SAVE_NAME, NONE_NS
-from peek.completer import PeekCompleter
-from peek.completions import monkey_patch_completion_state
 from peek.config import config_location, get_config
 from peek.connection import DelegatingListener, EsClientManager, connect
 from peek.display import Display
 from peek.errors import PeekError, PeekSyntaxError
-from peek.history import SqLiteHistory
-from peek.key_bindings import key_bindings
+from peek.history import HistoryAutoSuggest, SqLiteHistory
 from peek.lexers import Heading, PeekLexer, PeekStyle, TipsMinor
 from peek.parser import PeekParser
+from peek.profiling import StartupProfiler
 from peek.vm import PeekVM
 
 _logger = logging.getLogger(__name__)
@@ -33,27 +31,48 @@ _logger = logging.getLogger(__name__)
 
 class PeekApp:
     def __init__(
-        self, batch_mode=False, config_file: str = None, extra_config_options: Iterable[str] = None, cli_ns=NONE_NS
+        self,
+        batch_mode=False,
+        config_file: str = None,
+        extra_config_options: Iterable[str] = None,
+        cli_ns=NONE_NS,
+        startup_profiler: StartupProfiler = None,
     ):
         self._should_exit = False
         self._preserved_text = ''
         self.capture = NoOpCapture()
         self.batch_mode = batch_mode
-        self.config = get_config(config_file, extra_config_options)
+        # Whether statements are sent by clients of a long running server
+        self.serving = False
+        # Number of statements that failed in this session, used for the exit status of batch runs
+        self.error_count = 0
+        # Greater than zero while statements run nested in another one, e.g. with the run builtin
+        self._execute_depth = 0
+        self.startup_profiler = startup_profiler or StartupProfiler()
+        profiler = self.startup_profiler
+        with profiler.phase('config'):
+            self.config = get_config(config_file, extra_config_options)
         self.cli_ns = cli_ns
-        self._init_logging()
-        self.history = SqLiteHistory(self.config.as_int('history_max'))
-        self.completer = PeekCompleter(self)
+        with profiler.phase('logging'):
+            self._init_logging()
+        self._history: Optional[SqLiteHistory] = None
+        if not batch_mode:
+            with profiler.phase('history'):
+                self._history = SqLiteHistory(self.config.as_int('history_max'))
+        self._completer = None
         self.display = Display(self)
         self.parser = PeekParser()
-        self.vm = self._init_vm()
-        self.prompt = self._init_prompt()
-        monkey_patch_completion_state()
+        with profiler.phase('vm'):
+            self.vm = self._init_vm()
+        with profiler.phase('prompt'):
+            self.prompt = self._init_prompt()
         # TODO: better name for signal payload json reformat
         self.is_pretty = True
-        self._init_es_client_manager()
+        with profiler.phase('connection'):
+            self._init_es_client_manager()
         self.ecm_backup_data = self.es_client_manager.to_dict()
-        self._on_startup()
+        with profiler.phase('on_startup'):
+            self._on_startup()
 
     def run(self):
         try:
@@ -79,23 +98,85 @@ class PeekApp:
         finally:
             self.on_exit()
 
+    def serve(self, socket_path):
+        """
+        Execute statements sent by clients on the UNIX socket until the exit builtin is called
+        """
+        from peek.daemon import PeekServer
+
+        with PeekServer(self, socket_path) as server:
+            _logger.info(f'Serving on {socket_path!r}')
+            self.serving = True
+            try:
+                while not self._should_exit:
+                    server.handle_request()
+            finally:
+                self.serving = False
+
     def process_input(self, text, echo=False):
         try:
             nodes = self.parser.parse(text)
         except PeekSyntaxError as e:
+            self.error_count += 1
             self.display.error(e)
             return
+        self._execute_nodes(nodes, echo)
+
+    def process_stream(self, lines: Iterable[str], echo=False):
+        """
+        Execute statements from the lines as soon as each of them is complete, without reading all input first
+        """
+        for nodes in self.parser.parse_stream(lines, on_error=self._on_syntax_error):
+            self._execute_nodes(nodes, echo)
+
+    def _on_syntax_error(self, e: PeekSyntaxError):
+        # Statements following a syntax error still run
+        self.error_count += 1
+        self.display.error(e)
 
+    def _execute_nodes(self, nodes, echo):
         for node in nodes:
+            capture = self.capture
+            # Only top level statements are captured. API calls of nested ones go to the log of the top level one.
+            top_level = self._execute_depth == 0
+            started = time.time()
+            if top_level:
+                requests = self.vm.request_log = [] if capture.structured else None
+            error = None
+            self._execute_depth += 1
             try:
                 if echo:
                     self.display.info(str(node))
                 self.execute_node(node)
             except PeekError as e:
+                error = e
+                self.error_count += 1
                 self.display.error(e)
             except Exception as e:
+                error = e
+                self.error_count += 1
                 self.display.error(e)
                 _logger.exception('Error on node execution')
+            finally:
+                self._execute_depth -= 1
+                if top_level:
+                    self.vm.request_log = None
+            # Statements starting or stopping the capture are left out so that the capture can be run as is
+            if top_level and capture.structured and capture is self.capture:
+                capture.record(self._capture_entry(node, started, requests, error))
+
+    def _capture_entry(self, node, started, requests, error):
+        last = requests[-1] if requests else {}
+        return {
+            'input': node.source if node.source is not None else str(node),
+            'timestamp': started,
+            'duration': time.time() - started,
+            'conn': last.get('conn'),
+            'status': last.get('status'),
+            'response_bytes': last.get('response_bytes'),
+            'error': str(error) if error is not None else None,
+            'requests': requests,
+        }
 
     def execute_node(self, node):
         self.vm.execute_node(node)
@@ -103,13 +184,23 @@ class PeekApp:
     def signal_exit(self):
         self._should_exit = True
 
-    def start_capture(self, f=None):
+    def start_capture(self, f=None, structured=False):
         if not isinstance(self.capture, NoOpCapture):
             raise PeekError(f'Cannot capture when one is currently running: {self.capture.status()}')
 
         if f is None:
             f = f'{datetime.now().strftime("%Y%m%d%H%M%S")}.es'
-        self.capture = FileCapture(f)
+        config = self.config
+        if 'capture_max_bytes' in config:
+            options = dict(
+                max_bytes=config.as_int('capture_max_bytes'),
+                interval=config.as_float('capture_rotate_interval'),
+                compress=config.as_bool('capture_compress'),
+                backup_count=config.as_int('capture_backup_count'),
+            )
+        else:
+            options = {}
+        self.capture = (StructuredCapture if structured else BufferedFileCapture)(f, **options)
         return self.capture.status()
 
     def stop_capture(self):
@@ -120,6 +211,32 @@ class PeekApp:
         else:
             return 'No capture is running'
 
+    @property
+    def completer(self):
+        """
+        The completer is only built when first needed, which never happens for most batch runs. This avoids
+        importing completion modules and loading the API schema when there is no prompt.
+        """
+        if self._completer is None:
+            from peek.completer import PeekCompleter
+
+            self._completer = PeekCompleter(self)
+        return self._completer
+
+    @property
+    def history(self) -> SqLiteHistory:
+        """
+        Batch runs do not read history. It is only opened if they record API calls or use sessions.
+        """
+        if self._history is None:
+            self._history = SqLiteHistory(self.config.as_int('history_max'), search_index=not self.batch_mode)
+        return self._history
+
+    def reload_api_completer(self):
+        # A completer not built yet loads the current API specs once it is built
+        if self._completer is not None:
+            self._completer.init_api_completer()
+
     @property
     def preserved_text(self):
         return self._preserved_text
@@ -132,7 +249,7 @@ class PeekApp:
         return prompt(message=message, is_password=is_secret)
 
     def reset(self):
-        self.completer.init_api_completer()
+        self.reload_api_completer()
         self.vm = self._init_vm()
         self._repopulate_clients(EsClientManager.from_dict(self, self.ecm_backup_data))
         self._on_startup()
@@ -192,6 +309,13 @@ class PeekApp:
         if self.batch_mode:
             return None
         else:
+            # Imported here so that batch runs do not pay for modules only used by the interactive prompt
+            from peek.completions import monkey_patch_completion_state
+            from peek.key_bindings import key_bindings
+
+            monkey_patch_completion_state()
+            with self.startup_profiler.phase('completer'):
+                completer = self.completer
             try:
                 from prompt_toolkit.clipboard.pyperclip import PyperclipClipboard
 
@@ -203,8 +327,8 @@ class PeekApp:
             return PromptSession(
                 style=style_from_pygments_cls(PeekStyle),
                 lexer=PygmentsLexer(PeekLexer),
-                auto_suggest=AutoSuggestFromHistory(),
-                completer=self.completer,
+                auto_suggest=HistoryAutoSuggest(),
+                completer=completer,
                 history=self.history,
                 multiline=True,
                 key_bindings=key_bindings(self),
@@ -275,10 +399,14 @@ class PeekApp:
         return PeekVM(self)
 
     def on_exit(self):
+        # Make sure everything captured is written out
+        self.stop_capture()
         if not self.batch_mode and self.config.as_bool('auto_save_session'):
             _logger.info('Auto-saving connection state')
             data = self.es_client_manager.to_dict()
             self.history.save_session(AUTO_SAVE_NAME, json.dumps(data))
+        if self._history is not None:
+            self._history.close()
 
     def _should_auto_load_session(self, options):
         """
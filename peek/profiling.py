@@ -0,0 +1,85 @@
+"""Timing of startup phases and imports"""
+import importlib
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, NamedTuple
+
+PROFILE_STARTUP_ENV = 'PEEK_PROFILE_STARTUP'
+
+# Top level dependencies imported at startup, timed in this order before the peek modules
+STARTUP_IMPORTS = ('configobj', 'pygments', 'urllib3', 'elastic_transport', 'prompt_toolkit', 'peek.peekapp')
+
+
+class StartupRecord(NamedTuple):
+    kind: str
+    name: str
+    depth: int
+    seconds: float
+
+
+class StartupProfiler:
+    """
+    Collect the time spent in each named phase. Phases can be nested and are reported in the order they start.
+    Nothing is recorded when the profiler is not enabled.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records: List[StartupRecord] = []
+        self._depth = 0
+
+    @contextmanager
+    def phase(self, name: str, kind: str = 'phase'):
+        if not self.enabled:
+            yield
+            return
+        index = len(self.records)
+        self.records.append(StartupRecord(kind, name, self._depth, 0.0))
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.records[index] = StartupRecord(kind, name, self._depth, time.perf_counter() - start)
+
+    @contextmanager
+    def background_phase(self, name: str):
+        """
+        Time work running on another thread alongside the startup phases. It is reported as an "async" record
+        once finished and not counted in the total since it overlaps with the other phases.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.append(StartupRecord('async', name, 0, time.perf_counter() - start))
+
+    def time_imports(self, module_names: Iterable[str]):
+        """
+        Import the modules one by one and record how long each takes. Modules already imported cost nothing and
+        modules shared between dependencies are attributed to the first one importing them.
+        """
+        for module_name in module_names:
+            if module_name in sys.modules:
+                continue
+            with self.phase(module_name, kind='import'):
+                importlib.import_module(module_name)
+
+    def report(self, fmt='table') -> str:
+        total = sum(r.seconds for r in self.records if r.depth == 0 and r.kind != 'async')
+        if fmt == 'json':
+            return json.dumps({'total': total, 'records': [r._asdict() for r in self.records]}, indent=2)
+
+        names = [f'{"  " * r.depth}{r.kind} {r.name}' for r in self.records]
+        width = max([len(n) for n in names] + [len('Total')])
+        lines = [f'{"Startup":<{width}}  {"Seconds":>8}']
+        for name, r in zip(names, self.records):
+            lines.append(f'{name:<{width}}  {r.seconds:>8.4f}')
+        lines.append(f'{"Total":<{width}}  {total:>8.4f}')
+        return '\n'.join(lines)
@@ -0,0 +1,171 @@
+"""Re-issue API calls of a structured capture against a connection, for load testing"""
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from peek.common import REDACTED
+from peek.errors import PeekError
+
+_logger = logging.getLogger(__name__)
+
+# Latency percentiles included in the report
+REPORT_PERCENTILES = (50, 90, 99)
+
+# Seconds to wait for requests in flight when a replay is interrupted
+REPLAY_STOP_TIMEOUT = 5.0
+
+
+def load_requests(f) -> List[Dict[str, Any]]:
+    """
+    Read the API calls, in the order they were made, from a capture written with `capture @start "f.ndjson"`
+    """
+    requests = []
+    with open(f) as ins:
+        for i, line in enumerate(ins, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise PeekError(f'Line {i} of {f!r} is not a structured capture entry: {e}')
+            requests.extend(entry.get('requests') or [])
+    return requests
+
+
+def parse_speed(speed) -> float:
+    """
+    Speed is a factor applied to the original timing, e.g. 10 or "10x". Zero sends as fast as possible.
+    """
+    try:
+        value = float(speed[:-1] if isinstance(speed, str) and speed.lower().endswith('x') else speed)
+    except (TypeError, ValueError):
+        raise PeekError(f'Invalid replay speed: {speed!r}, expect a factor like 2 or "10x"')
+    if value < 0 or math.isinf(value) or math.isnan(value):
+        raise PeekError(f'Invalid replay speed: {speed!r}, must be zero or positive')
+    return value
+
+
+def replay(requests: List[Dict[str, Any]], es_client, speed=1.0, users=1) -> Dict[str, Any]:
+    """
+    Send the requests with the client from the given number of concurrent users. Each request is sent no earlier
+    than its original offset from the first request divided by speed. A user that falls behind sends its next
+    request right away, so the schedule is kept as closely as the users and the cluster allow.
+    """
+    if users < 1:
+        raise PeekError(f'Number of users must be at least 1, got {users}')
+    results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    if not requests:
+        return report(requests, results, 0.0)
+
+    pending = queue.Queue()
+    for i in range(len(requests)):
+        pending.put(i)
+    stop = threading.Event()
+    first_timestamp = requests[0]['timestamp']
+    started = time.monotonic()
+
+    def run_user():
+        while not stop.is_set():
+            try:
+                i = pending.get_nowait()
+            except queue.Empty:
+                return
+            request = requests[i]
+            if speed > 0:
+                delay = started + (request['timestamp'] - first_timestamp) / speed - time.monotonic()
+                if delay > 0 and stop.wait(delay):
+                    return
+            results[i] = _send(es_client, request)
+
+    threads = [threading.Thread(target=run_user, daemon=True) for _ in range(min(users, len(requests)))]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            # Joined with a timeout so that KeyboardInterrupt is delivered to the main thread
+            while t.is_alive():
+                t.join(0.1)
+    except KeyboardInterrupt:
+        stop.set()
+        _logger.info('Replay interrupted, waiting for requests in flight before reporting')
+        deadline = time.monotonic() + REPLAY_STOP_TIMEOUT
+        for t in threads:
+            if t.ident is not None:
+                t.join(max(deadline - time.monotonic(), 0))
+    # Copied as requests still in flight past the wait must not change the report
+    return report(requests, list(results), time.monotonic() - started)
+
+
+def report(requests: List[Dict[str, Any]], results: List[Optional[Dict[str, Any]]], elapsed: float):
+    """
+    Summarize the original requests next to their replay. Requests never sent, e.g. when interrupted,
+    are left out of both sides.
+    """
+    sent = [(o, r) for o, r in zip(requests, results) if r is not None]
+    original = [o for o, _ in sent]
+    if len(original) > 1:
+        original_elapsed = original[-1]['timestamp'] + original[-1]['elapsed'] - original[0]['timestamp']
+    else:
+        original_elapsed = sum(o['elapsed'] for o in original)
+    return {
+        'requests': len(requests),
+        'sent': len(sent),
+        'original': _summary(original, original_elapsed),
+        'replay': _summary([r for _, r in sent], elapsed),
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of values sorted in ascending order
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _send(es_client, request: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.time()
+    try:
+        response = es_client.perform_request(
+            request['method'], request['path'], request.get('payload'), headers=_replayed_headers(request)
+        )
+        status = response.meta.status
+    except Exception as e:
+        status = getattr(e, 'status_code', None)
+        status = status if isinstance(status, int) else None
+    return {'timestamp': started, 'status': status, 'elapsed': time.time() - started}
+
+
+def _replayed_headers(request: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    # Redacted credentials are left to the connection used for replay
+    headers = {k: v for k, v in (request.get('headers') or {}).items() if v != REDACTED}
+    return headers or None
+
+
+def _summary(results: Iterable[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    results = list(results)
+    latencies = sorted(r['elapsed'] * 1000 for r in results)
+    errors = sum(1 for r in results if not _is_success(r['status']))
+    summary = {
+        'elapsed': round(elapsed, 3),
+        'errors': errors,
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+    }
+    for p in REPORT_PERCENTILES:
+        summary[f'p{p}_ms'] = _round(percentile(latencies, p))
+    summary['max_ms'] = _round(latencies[-1] if latencies else None)
+    return summary
+
+
+def _is_success(status: Optional[int]) -> bool:
+    return status is not None and status < 400
+
+
+def _round(ms: Optional[float]) -> Optional[float]:
+    return round(ms, 1) if ms is not None else None
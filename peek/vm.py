@@ -1,14 +1,18 @@
 import ast
+import io
 import itertools
 import json
 import logging
 import operator
 import os
+import re
 import subprocess
 import sys
+import time
 import urllib
 from numbers import Number
 from subprocess import Popen
+from typing import Any, Dict, List, Optional
 
 from elastic_transport._transport import TransportApiResponse
 from pygments.token import Name
@@ -35,8 +39,12 @@ from peek.ast import (
     UnaryOpNode,
     Visitor,
 )
+from peek.common import CREDENTIAL_HEADERS, REDACTED
 from peek.config import config_location
 from peek.errors import PeekError
+from peek.extensions import ExtensionIndex, LazyExport
+from peek.formats import check_output_format, write_rows
+from peek.history import RequestRecord, normalize_path
 from peek.natives import EXPORTS
 from peek.visitors import Ref
 
@@ -89,10 +97,19 @@ class PeekVM(Visitor):
         self._bin_op_funcs = bin_op_funcs or _BIN_OP_FUNCS
         self._unary_op_funcs = unary_op_funcs or _UNARY_OP_FUNCS
         self.context = {}
-        self._load_context_file()
+        # API calls made by the current statement are appended here when it is set to a list
+        self.request_log: Optional[List[dict]] = None
+        with self.app.startup_profiler.phase('context_file'):
+            self._load_context_file()
         self.builtins = EXPORTS
+        self._extension_index: Optional[ExtensionIndex] = None
+        # Modification time and exported values of each loaded extension file, used for reloading.
+        # Exported values are only removed on reload if their names are not reassigned since.
+        self._extension_mtimes: Dict[str, int] = {}
+        self._extension_exports: Dict[str, Dict[str, Any]] = {}
         if self.app.config.as_bool('load_extension'):
-            self._load_extensions()
+            with self.app.startup_profiler.phase('extensions'):
+                self._load_extensions()
 
     @property
     def functions(self):
@@ -160,11 +177,22 @@ class PeekVM(Visitor):
         # Default to suppress on screen output if output file is provided
         quiet = options.pop('quiet', outfile is not None)
         pipe = options.pop('pipe', None)
+        output_format = options.pop('format', None)
+        if output_format is not None:
+            try:
+                check_output_format(output_format)
+            except PeekError as e:
+                self.app.display.error(e)
+                return
 
         if options:
             self.app.display.error(f'Unknown options: {options}')
             return
 
+        if _is_cat_path(path) and (output_format is not None or self.app.config.as_bool('accept_json_for_cat')):
+            if not any(k.lower() == 'accept' for k in headers):
+                headers = {**headers, 'accept': 'application/json'}
+
         try:
             final_path = _maybe_encode_date_math(path)
             final_headers = headers if headers else None
@@ -174,9 +202,15 @@ class PeekVM(Visitor):
                 'payload': payload,
                 'headers': final_headers,
             }
-            response: TransportApiResponse = es_client.perform_request(
-                node.method, final_path, payload, headers=final_headers
-            )
+            started = time.time()
+            try:
+                response: TransportApiResponse = es_client.perform_request(
+                    node.method, final_path, payload, headers=final_headers
+                )
+            except Exception as e:
+                self._record_request(es_client, node.method, final_path, payload, headers, started, error=e)
+                raise
+            self._record_request(es_client, node.method, final_path, payload, headers, started, response=response)
 
             warning = response.meta.headers.get('warning')
             if warning is not None and self.app.config.as_bool('show_warnings'):
@@ -194,12 +228,29 @@ class PeekVM(Visitor):
                     raise ValueError(f'{response.body}\n{err}')
 
             self.context['_'] = _maybe_decode_json(out)
+            if output_format is not None:
+                if outfile is not None:
+                    # Written straight to the file so that large exports are never held as a whole string
+                    with open(outfile, 'w', newline='') as outs:
+                        write_rows(self.context['_'], output_format, outs)
+                    outfile = None
+                    out = None
+                else:
+                    buffer = io.StringIO()
+                    write_rows(self.context['_'], output_format, buffer)
+                    out = buffer.getvalue()
             if outfile is not None:
                 with open(outfile, 'w') as outs:
                     outs.write(out)
-            if not quiet:
-                self.app.display.info(out, header_text=self._get_header_text(response.meta, conn, runas))
+            if not quiet and out is not None:
+                self.app.display.info(
+                    out,
+                    header_text=self._get_header_text(response.meta, conn, runas),
+                    verbatim=output_format is not None,
+                )
         except Exception as e:
+            # The error is only displayed so that the statement completes, but it still fails a batch run
+            self.app.error_count += 1
             if getattr(e, 'info', None) is not None and isinstance(getattr(e, 'status_code', None), int):
                 self.context['_'] = _maybe_decode_json(e.info) if isinstance(e.info, str) else e.info
                 self.app.display.info(e.info, header_text=self._get_header_text(None, conn, runas))
@@ -207,6 +258,50 @@ class PeekVM(Visitor):
                 self.app.display.error(getattr(e, 'message', str(e)), header_text=self._get_header_text(None, conn, runas))
                 _logger.exception(f'Error on ES API call: {node!r}')
 
+    def _record_request(self, es_client, method, path, payload, headers, started, response=None, error=None):
+        record_perf = self.app.config.as_bool('record_request_perf')
+        if not record_perf and self.request_log is None:
+            return
+        elapsed = time.time() - started
+        if response is not None:
+            status, body = response.meta.status, response.body
+        else:
+            status, body = getattr(error, 'status_code', None), getattr(error, 'info', None)
+            status = status if isinstance(status, int) else None
+            body = body if isinstance(body, str) else None
+        try:
+            if self.request_log is not None:
+                self.request_log.append(
+                    {
+                        'timestamp': started,
+                        'conn': str(es_client),
+                        'method': method.upper(),
+                        'path': path,
+                        'headers': _redact_headers(headers),
+                        'payload': payload,
+                        'status': status,
+                        'elapsed': elapsed,
+                        'response_bytes': _utf8_len(body),
+                    }
+                )
+            if record_perf:
+                self.app.history.record_request(
+                    RequestRecord(
+                        timestamp=started,
+                        conn=str(es_client),
+                        method=method.upper(),
+                        path=normalize_path(path),
+                        status=status,
+                        took=_extract_took(body),
+                        elapsed=elapsed,
+                        request_bytes=_utf8_len(payload),
+                        response_bytes=_utf8_len(body),
+                        opaque_id=_header_value(headers, 'x-opaque-id'),
+                    )
+                )
+        except Exception as e:
+            _logger.warning(f'Cannot record request performance: {e}')
+
     def visit_func_call_node(self, node: FuncCallNode):
         if isinstance(node.name_node, NameNode):
             func = self.get_value(node.name_node.token.value)
@@ -378,6 +473,8 @@ class PeekVM(Visitor):
             value = self.context.get(name)
         if value is None:
             raise NameError(f'Unknown name: {name!r}')
+        if isinstance(value, LazyExport):
+            value = value.resolve()
         return value
 
     def _unwind_lhs(self, node: Node):
@@ -405,56 +502,128 @@ class PeekVM(Visitor):
         """
         Load extra variables from external paths
         """
+        config = self.app.config
+        lazy = 'lazy_extension' in config and config.as_bool('lazy_extension')
+        self._extension_index = ExtensionIndex() if lazy else None
+        try:
+            for p in self._extension_files():
+                self._load_one_extension_file(p)
+        finally:
+            if self._extension_index is not None:
+                self._extension_index.save()
+
+    def reload_extensions(self) -> List[str]:
+        """
+        Load again extension files that are new or changed since they were loaded and drop exports of removed
+        ones. Other variables and connections are left untouched. Return paths of the files that are reloaded.
+        """
+        if not self.app.config.as_bool('load_extension'):
+            return []
+        files = list(self._extension_files())
+        changed = [p for p in files if self._extension_mtimes.get(p) != _mtime_ns(p)]
+        removed = [p for p in self._extension_mtimes if p not in files]
+        for p in itertools.chain(changed, removed):
+            for name, value in self._extension_exports.pop(p, {}).items():
+                if self.context.get(name) is value:
+                    del self.context[name]
+            self._extension_mtimes.pop(p, None)
+        try:
+            for p in changed:
+                self._load_one_extension_file(p)
+        finally:
+            if self._extension_index is not None:
+                self._extension_index.save()
+        return changed + removed
+
+    def _extension_files(self):
         default_extension_path = os.path.join(config_location(), 'extensions')
         if os.path.exists(default_extension_path):
-            self._load_one_extension_path(default_extension_path)
+            yield from self._extension_files_in_path(default_extension_path)
 
         extension_path = self.app.config['extension_path']
         if not extension_path:
             return
 
-        sys_path = sys.path[:]
-        try:
-            for p in extension_path.split(os.pathsep):
-                if os.path.isfile(p):
-                    self._load_one_extension_file(p)
-                elif os.path.isdir(p):
-                    self._load_one_extension_path(p)
-                else:
-                    _logger.warning(f'Cannot load extension path: {p}')
-        finally:
-            sys.path = sys_path
+        for p in extension_path.split(os.pathsep):
+            if os.path.isfile(p):
+                yield p
+            elif os.path.isdir(p):
+                yield from self._extension_files_in_path(p)
+            else:
+                _logger.warning(f'Cannot load extension path: {p}')
 
-    def _load_one_extension_path(self, p):
+    def _extension_files_in_path(self, p):
         for f in os.listdir(p):
             if not f.endswith('.py'):
                 continue
-            self._load_one_extension_file(os.path.join(p, f))
+            yield os.path.join(p, f)
 
     def _load_one_extension_file(self, p):
-        _logger.info(f'Loading extension: {p!r}')
-        import importlib
-
         fields = os.path.splitext(p)
         if len(fields) != 2 or fields[1] != '.py':
             _logger.warning(f'Extension must be python files, got: {p!r}')
             return
+
+        self._extension_mtimes[p] = _mtime_ns(p)
+        exports = self._extension_index.exports(p) if self._extension_index is not None else None
+        if exports is None:
+            exports = self._import_extension(p)
+            if exports is not None:
+                self.context.update(exports)
+                self._extension_exports[p] = dict(exports)
+            return
+
+        # Literal values are known already. Everything else imports the extension when first used.
+        installed = {}
+        for name, literal in exports.items():
+            if literal is None:
+                installed[name] = LazyExport(self._resolve_lazy_export, p, name)
+            else:
+                installed[name] = ast.literal_eval(literal)
+        self.context.update(installed)
+        self._extension_exports[p] = installed
+        _logger.info(f'Extension indexed: {p!r}')
+
+    def _resolve_lazy_export(self, lazy: LazyExport):
+        exports = self._import_extension(lazy.path)
+        if exports is None or lazy.name not in exports:
+            if self.context.get(lazy.name) is lazy:
+                del self.context[lazy.name]
+            raise PeekError(f'Extension {lazy.path!r} cannot provide {lazy.name!r}')
+        # Replace the stand-ins of the extension but not values assigned to the same names since then
+        for k, v in exports.items():
+            current = self.context.get(k)
+            if current is None or (isinstance(current, LazyExport) and current.path == lazy.path):
+                self.context[k] = v
+        self._extension_exports[lazy.path] = dict(exports)
+        return exports[lazy.name]
+
+    def _import_extension(self, p) -> Optional[dict]:
+        _logger.info(f'Loading extension: {p!r}')
+        import importlib
+
+        fields = os.path.splitext(p)
+        sys_path = sys.path[:]
         sys.path.insert(0, os.path.dirname(fields[0]))
         try:
             module_name = os.path.basename(fields[0])
-            if module_name in sys.modules:
-                m = importlib.reload(sys.modules[module_name])
-            else:
-                m = importlib.import_module(module_name)
+            with self.app.startup_profiler.phase(p, kind='extension'):
+                if module_name in sys.modules:
+                    m = importlib.reload(sys.modules[module_name])
+                else:
+                    m = importlib.import_module(module_name)
             exports = getattr(m, 'EXPORTS', None)
             if isinstance(exports, dict):
-                self.context.update(exports)
                 _logger.info(f'Extension loaded: {p!r}')
+                return exports
             else:
                 _logger.warning(f'Ignore extension {p!r} since EXPORTS is not a dict, but: {exports!r}')
         except Exception as e:
             _logger.error(f'Error on loading extension: {p!r}, {e}')
             _logger.exception(f'Error on loading extension: {p!r}')
+        finally:
+            sys.path = sys_path
+        return None
 
     def _get_header_text(self, meta, conn, runas):
         parts = []
@@ -468,6 +637,14 @@ class PeekVM(Visitor):
         return ' '.join(parts)
 
 
+def _is_cat_path(path) -> bool:
+    return path.lstrip('/').startswith('_cat')
+
+
+def _mtime_ns(path) -> int:
+    return os.stat(path).st_mtime_ns
+
+
 def _maybe_decode_json(r):
     try:
         return json.loads(r)
@@ -475,6 +652,37 @@ def _maybe_decode_json(r):
         return r
 
 
+# "took" comes first in search style responses, so only the beginning of the body needs to be looked at
+_TOOK_PATTERN = re.compile(r'"took"\s*:\s*(\d+)')
+
+
+def _extract_took(body: Optional[str]) -> Optional[int]:
+    if not body:
+        return None
+    m = _TOOK_PATTERN.search(body, 0, 256)
+    return int(m.group(1)) if m else None
+
+
+def _utf8_len(s: Optional[str]) -> int:
+    if not s:
+        return 0
+    return len(s) if s.isascii() else len(s.encode('utf-8'))
+
+
+def _header_value(headers: Optional[Dict], name: str) -> Optional[str]:
+    # HTTP header names are case-insensitive
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _redact_headers(headers: Optional[Dict]) -> Optional[Dict]:
+    if not headers:
+        return None
+    return {k: REDACTED if k.lower() in CREDENTIAL_HEADERS else v for k, v in headers.items()}
+
+
 def _maybe_encode_date_math(path):
     parts = []
     current_pos = 0
@@ -0,0 +1,106 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from peek.es_api_spec import api_completer
+from peek.es_api_spec.api_completer import NoopESApiCompleter, VersionedESApiCompleter, select_branch
+
+
+def test_select_branch():
+    branches = ['7.17', '8.15', '8.19', '9.2']
+    assert select_branch('8.15.1', branches) == '8.15'
+    assert select_branch('8.17.0', branches) == '8.15'
+    assert select_branch('8.20.0', branches) == '8.19'
+    assert select_branch('8.1.0', branches) == '8.15'
+    assert select_branch('9.3.0-SNAPSHOT', branches) == '9.2'
+    assert select_branch('7.10.2', branches) == '7.17'
+    assert select_branch('6.8.0', branches) is None
+    assert select_branch('not-a-version', branches) is None
+
+
+def test_versioned_completer_selects_schema_per_client():
+    clients = {
+        'old': MagicMock(name='old', **{'server_version.return_value': '8.19.3'}),
+        'new': MagicMock(name='new', **{'server_version.return_value': '9.2.0'}),
+    }
+    current = ['old']
+    default_completer = NoopESApiCompleter()
+    loaded = {}
+
+    def new_schema_completer(schema_filepath):
+        loaded[schema_filepath] = MagicMock(name=schema_filepath)
+        return loaded[schema_filepath]
+
+    completer = VersionedESApiCompleter(
+        default_completer,
+        {'8.19': '/specs/8.19/schema.json', '9.2': '/specs/9.2/schema.json'},
+        lambda: clients[current[0]],
+    )
+    with patch('peek.es_api_spec.api_completer.SchemaESApiCompleter', new_schema_completer):
+        # Default completer serves while the version and schema are resolved in the background
+        assert completer._delegate() is default_completer
+        _wait_for_background_threads()
+        assert completer._delegate() is loaded['/specs/8.19/schema.json']
+
+        current[0] = 'new'
+        assert completer._delegate() is default_completer
+        _wait_for_background_threads()
+        assert completer._delegate() is loaded['/specs/9.2/schema.json']
+
+        # Switching back does not reload anything
+        current[0] = 'old'
+        assert completer._delegate() is loaded['/specs/8.19/schema.json']
+
+    assert len(loaded) == 2
+    clients['old'].server_version.assert_called_once()
+    clients['new'].server_version.assert_called_once()
+
+
+def test_versioned_completer_falls_back_to_default_without_connection():
+    default_completer = NoopESApiCompleter()
+
+    def no_client():
+        raise ValueError('No ES client is configured')
+
+    completer = VersionedESApiCompleter(default_completer, {'9.2': '/specs/9.2/schema.json'}, no_client)
+    assert completer._delegate() is default_completer
+    assert completer.complete_url_path(None, None, 'GET', []) == []
+
+
+def test_versioned_completer_reuses_default_completer_for_default_branch():
+    client = MagicMock(**{'server_version.return_value': '9.2.1'})
+    default_completer = NoopESApiCompleter()
+    new_schema_completer = MagicMock()
+    completer = VersionedESApiCompleter(
+        default_completer, {'9.2': '/specs/9.2/schema.json'}, lambda: client, default_branch='9.2'
+    )
+    with patch('peek.es_api_spec.api_completer.SchemaESApiCompleter', new_schema_completer):
+        completer._delegate()
+        _wait_for_background_threads()
+        assert completer._delegate() is default_completer
+    new_schema_completer.assert_not_called()
+
+
+def test_versioned_completer_retries_version_after_failure():
+    client = MagicMock(**{'server_version.side_effect': [ConnectionError('Connection refused'), '9.2.0']})
+    default_completer = NoopESApiCompleter()
+    loaded = MagicMock(name='9.2')
+    completer = VersionedESApiCompleter(default_completer, {'9.2': '/specs/9.2/schema.json'}, lambda: client)
+    with patch('peek.es_api_spec.api_completer.SchemaESApiCompleter', return_value=loaded):
+        assert completer._delegate() is default_completer
+        _wait_for_background_threads()
+        # Not retried right away
+        assert completer._delegate() is default_completer
+        _wait_for_background_threads()
+        assert client.server_version.call_count == 1
+
+        with patch.object(api_completer, 'VERSION_RETRY_INTERVAL', 0):
+            assert completer._delegate() is default_completer
+            _wait_for_background_threads()
+        assert completer._delegate() is loaded
+    assert client.server_version.call_count == 2
+
+
+def _wait_for_background_threads():
+    for t in threading.enumerate():
+        if t.name == 'peek-api-completer-version':
+            t.join(5)
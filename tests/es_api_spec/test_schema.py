@@ -0,0 +1,254 @@
+import copy
+
+from peek.es_api_spec import schema as schema_module
+from peek.es_api_spec.schema import Schema, TypeName
+
+
+def _instance_of(name, namespace='_types'):
+    return {'kind': 'instance_of', 'type': {'name': name, 'namespace': namespace}}
+
+
+def _property(name, value, aliases=None):
+    prop = {'name': name, 'type': value, 'description': f'The {name} property', 'required': False}
+    if aliases:
+        prop['aliases'] = aliases
+    return prop
+
+
+SCHEMA_DATA = {
+    'endpoints': [
+        {
+            'name': 'search',
+            'description': 'Run a search',
+            'docUrl': 'https://example.com/search',
+            'request': {'name': 'Request', 'namespace': '_global.search'},
+            'urls': [
+                {'methods': ['GET', 'POST'], 'path': '/_search'},
+                {'methods': ['GET', 'POST'], 'path': '/{index}/_search'},
+            ],
+        },
+        {
+            'name': 'cluster.health',
+            'description': 'Cluster health',
+            'docUrl': 'https://example.com/health',
+            'request': {'name': 'Request', 'namespace': 'cluster.health'},
+            'urls': [{'methods': ['GET'], 'path': '/_cluster/health'}],
+        },
+    ],
+    'types': [
+        {
+            'kind': 'interface',
+            'name': {'name': 'CommonQueryParameters', 'namespace': '_spec_utils'},
+            'properties': [
+                _property('pretty', _instance_of('boolean', '_builtins')),
+            ],
+        },
+        {
+            'kind': 'request',
+            'name': {'name': 'Request', 'namespace': '_global.search'},
+            'attachedBehaviors': ['CommonQueryParameters'],
+            'query': [
+                _property('expand_wildcards', _instance_of('ExpandWildcard')),
+            ],
+            'body': {
+                'kind': 'properties',
+                'properties': [
+                    _property('query', _instance_of('QueryContainer')),
+                    _property('size', _instance_of('integer')),
+                    _property('aggs', _instance_of('Aggregations'), aliases=['aggregations']),
+                ],
+            },
+        },
+        {
+            'kind': 'request',
+            'name': {'name': 'Request', 'namespace': 'cluster.health'},
+            'body': {'kind': 'no_body'},
+        },
+        {
+            'kind': 'type_alias',
+            'name': {'name': 'integer', 'namespace': '_types'},
+            'type': _instance_of('number', '_builtins'),
+        },
+        {
+            'kind': 'type_alias',
+            'name': {'name': 'Aggregations', 'namespace': '_types'},
+            'type': {
+                'kind': 'dictionary_of',
+                'key': _instance_of('string', '_builtins'),
+                'value': _instance_of('AggregationContainer'),
+                'singleKey': False,
+            },
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'AggregationContainer', 'namespace': '_types'},
+            'properties': [_property('terms', _instance_of('TermsAggregation'))],
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'TermsAggregation', 'namespace': '_types'},
+            'properties': [_property('field', _instance_of('Field'))],
+        },
+        {
+            'kind': 'type_alias',
+            'name': {'name': 'Field', 'namespace': '_types'},
+            'type': _instance_of('string', '_builtins'),
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'TermQuery', 'namespace': '_types'},
+            'properties': [_property('value', _instance_of('string', '_builtins'))],
+        },
+        {
+            'kind': 'enum',
+            'name': {'name': 'ExpandWildcard', 'namespace': '_types'},
+            'members': [{'name': 'all'}, {'name': 'open'}],
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'QueryContainer', 'namespace': '_types'},
+            'properties': [
+                _property('bool', _instance_of('BoolQuery')),
+                _property('nested', _instance_of('NestedQuery')),
+                _property('match_all', _instance_of('MatchAllQuery')),
+                _property(
+                    'term',
+                    {
+                        'kind': 'dictionary_of',
+                        'key': _instance_of('Field'),
+                        'value': _instance_of('TermQuery'),
+                        'singleKey': True,
+                    },
+                ),
+            ],
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'BoolQuery', 'namespace': '_types'},
+            'properties': [
+                _property(
+                    'must',
+                    {
+                        'kind': 'union_of',
+                        'items': [
+                            _instance_of('QueryContainer'),
+                            {'kind': 'array_of', 'value': _instance_of('QueryContainer')},
+                        ],
+                    },
+                ),
+            ],
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'NestedQuery', 'namespace': '_types'},
+            'properties': [
+                _property('path', _instance_of('string', '_builtins')),
+                _property('query', _instance_of('QueryContainer')),
+                _property('score_mode', _instance_of('ExpandWildcard')),
+            ],
+        },
+        {
+            'kind': 'interface',
+            'name': {'name': 'MatchAllQuery', 'namespace': '_types'},
+            'properties': [],
+        },
+        {
+            'kind': 'response',
+            'name': {'name': 'Response', 'namespace': '_global.search'},
+            'body': {'kind': 'no_body'},
+        },
+    ],
+}
+
+
+def new_schema():
+    # Schema construction consumes the type dicts, so always work on a copy
+    return Schema(copy.deepcopy(SCHEMA_DATA))
+
+
+def test_candidate_urls_and_query_params():
+    schema = new_schema()
+    assert schema.candidate_urls('GET', []) == ['_cluster/health', '_search', '{index}/_search']
+    assert schema.candidate_urls('POST', ['_cluster']) == []
+    assert schema.candidate_query_param_names('GET', ['_search']) == ['expand_wildcards', 'pretty']
+    assert schema.candidate_query_param_values('GET', ['my-index', '_search'], 'expand_wildcards') == ['all', 'open']
+    assert schema.candidate_query_param_values('GET', ['_search'], 'pretty') == ['false', 'true']
+
+
+def test_candidate_sub_key_values_for_deep_query():
+    schema = new_schema()
+    assert schema.candidate_sub_key_values('GET', ['_search'], []) == {
+        'query': {},
+        'size': 0,
+        'aggs': {},
+        'aggregations': {},
+    }
+    payload_keys = ['query', 'bool', 'must', 'nested', 'query']
+    assert schema.candidate_sub_key_values('GET', ['_search'], payload_keys) == {
+        'bool': {},
+        'nested': {},
+        'match_all': {},
+        'term': {},
+    }
+    # Caller's key path is not consumed
+    assert payload_keys == ['query', 'bool', 'must', 'nested', 'query']
+    assert schema.candidate_sub_key_values('GET', ['_search'], ['aggs', 'my_agg', 'terms']) == {'field': ''}
+    assert schema.candidate_sub_key_values('GET', ['_cluster', 'health'], []) == {}
+
+
+def test_candidate_values():
+    schema = new_schema()
+    assert schema.candidate_values('GET', ['_search'], ['query', 'nested', 'score_mode']) == ['all', 'open']
+    assert schema.candidate_values('GET', ['_search'], ['query', 'bool', 'must']) == [{}, [{}]]
+    # Union members are not penetrated even when inside an array
+    assert schema.candidate_values('GET', ['_search'], ['query', 'bool', 'must'], inside_array=True) == [{}, [{}]]
+    assert schema.candidate_values('GET', ['_search'], ['no_such_key']) == []
+
+
+def test_type_resolution_is_memoized():
+    schema = new_schema()
+    query_container = schema.types[TypeName('QueryContainer', '_types')]
+    assert query_container.candidate_properties(schema.types) is query_container.candidate_properties(schema.types)
+
+    properties = schema._properties_for_keys(TypeName('Request', '_global.search'), ['query', 'bool'])
+    assert properties is schema._properties_for_keys(TypeName('Request', '_global.search'), ['query', 'bool'])
+    assert schema._cached_properties_for_keys.cache_info().hits >= 1
+
+    schema.candidate_sub_key_values('GET', ['_search'], ['query'])
+    schema.candidate_sub_key_values('GET', ['_search'], ['query'])
+    assert schema._cached_matchable_endpoint.cache_info().hits >= 1
+
+
+def test_candidate_placeholders():
+    schema = new_schema()
+    assert schema.candidate_placeholders('GET', []) == ['index']
+    assert schema.candidate_placeholders('GET', ['my-index']) == []
+    assert schema.candidate_placeholders('PUT', []) == []
+
+
+def test_field_keys_and_values():
+    schema = new_schema()
+    assert schema.field_key_value('GET', ['_search'], ['query', 'term']) == (True, {})
+    assert schema.field_key_value('GET', ['_search'], ['query', 'nested']) == (False, None)
+    assert schema.is_field_value('GET', ['_search'], ['aggs', 'my_agg', 'terms', 'field'])
+    assert not schema.is_field_value('GET', ['_search'], ['query', 'nested', 'path'])
+
+
+def test_schema_types_are_compact_and_shared():
+    schema = new_schema()
+    search_request = schema.types[TypeName('Request', '_global.search')]
+    assert not hasattr(search_request, '__dict__')
+    query_property = search_request.get_body().candidate_properties()[0]
+    assert not hasattr(query_property, '__dict__')
+    assert not hasattr(query_property.value, '__dict__')
+    # Values referring to the same type are a single instance across schemas
+    nested_query = new_schema().types[TypeName('NestedQuery', '_types')]
+    assert nested_query.properties[1].value is query_property.value
+    assert nested_query.properties[1].value.get_type_name() is TypeName.from_dict(
+        {'name': 'QueryContainer', 'namespace': '_types'}
+    )
+
+
+def test_shared_type_names_are_bounded():
+    assert schema_module._type_name.cache_info().maxsize == schema_module.TYPE_NAME_CACHE_SIZE
+    assert schema_module._instance_of.cache_info().maxsize == schema_module.TYPE_NAME_CACHE_SIZE
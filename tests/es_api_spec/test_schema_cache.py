@@ -0,0 +1,86 @@
+import copy
+import json
+import os
+from unittest.mock import patch
+
+from peek.es_api_spec.schema import TypeName
+from peek.es_api_spec.schema_cache import compile_schema_data, load_schema
+from tests.es_api_spec.test_schema import SCHEMA_DATA
+
+
+def test_compile_schema_data_keeps_only_completion_fields():
+    data = compile_schema_data(copy.deepcopy(SCHEMA_DATA))
+    assert data['endpoints'][0] == {
+        'urls': [
+            {'methods': ['GET', 'POST'], 'path': '/_search'},
+            {'methods': ['GET', 'POST'], 'path': '/{index}/_search'},
+        ],
+        'request': {'name': 'Request', 'namespace': '_global.search'},
+    }
+    assert 'description' not in json.dumps(data)
+    assert all(t['kind'] != 'response' for t in data['types'])
+
+
+def test_load_schema_uses_cache_until_source_changes(tmpdir):
+    schema_file = os.path.join(str(tmpdir), 'schema.json')
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    with open(schema_file, 'w') as outs:
+        json.dump(SCHEMA_DATA, outs)
+
+    schema = load_schema(schema_file, cache_dir=cache_dir)
+    assert schema.candidate_urls('GET', []) == ['_cluster/health', '_search', '{index}/_search']
+    assert len(os.listdir(cache_dir)) == 1
+
+    with patch('peek.es_api_spec.schema_cache.compile_schema_data') as mock_compile:
+        schema = load_schema(schema_file, cache_dir=cache_dir)
+        mock_compile.assert_not_called()
+    assert schema.candidate_sub_key_values('GET', ['_search'], ['query', 'nested']) == {
+        'path': '',
+        'query': {},
+        'score_mode': 'all',
+    }
+    assert TypeName('Response', '_global.search') not in schema.types
+
+    data = copy.deepcopy(SCHEMA_DATA)
+    data['endpoints'][1]['urls'][0]['path'] = '/_cluster/stats'
+    with open(schema_file, 'w') as outs:
+        json.dump(data, outs)
+    schema = load_schema(schema_file, cache_dir=cache_dir)
+    assert schema.candidate_urls('GET', ['_cluster']) == ['stats']
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_load_schema_hashes_source_only_when_its_stat_changes(tmpdir):
+    schema_file = os.path.join(str(tmpdir), 'schema.json')
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    with open(schema_file, 'w') as outs:
+        json.dump(SCHEMA_DATA, outs)
+    load_schema(schema_file, cache_dir=cache_dir)
+
+    with patch('peek.es_api_spec.schema_cache.hashlib.sha256') as mock_sha256:
+        assert load_schema(schema_file, cache_dir=cache_dir).candidate_urls('GET', ['_cluster']) == ['health']
+        mock_sha256.assert_not_called()
+
+    # Touched but unchanged source is hashed once and not compiled again
+    st = os.stat(schema_file)
+    os.utime(schema_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    with patch('peek.es_api_spec.schema_cache.compile_schema_data') as mock_compile:
+        assert load_schema(schema_file, cache_dir=cache_dir).candidate_urls('GET', ['_cluster']) == ['health']
+        mock_compile.assert_not_called()
+    with patch('peek.es_api_spec.schema_cache.hashlib.sha256') as mock_sha256:
+        load_schema(schema_file, cache_dir=cache_dir)
+        mock_sha256.assert_not_called()
+
+
+def test_load_schema_ignores_corrupted_cache(tmpdir):
+    schema_file = os.path.join(str(tmpdir), 'schema.json')
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    with open(schema_file, 'w') as outs:
+        json.dump(SCHEMA_DATA, outs)
+    load_schema(schema_file, cache_dir=cache_dir)
+    cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    with open(cache_file, 'wb') as outs:
+        outs.write(b'garbage')
+
+    schema = load_schema(schema_file, cache_dir=cache_dir)
+    assert schema.candidate_urls('GET', ['_cluster']) == ['health']
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from peek.capture import BufferedFileCapture, StructuredCapture
+
+
+def test_buffered_capture_writes_on_stop(tmp_path):
+    f = str(tmp_path / 'session.es')
+    capture = BufferedFileCapture(f)
+    print('GET _cluster/health', file=capture.file())
+    print('{"status": "green"}', file=capture.file())
+    capture.stop()
+    with open(f) as ins:
+        assert ins.read() == 'GET _cluster/health\n{"status": "green"}\n'
+
+
+def test_buffered_capture_rotates_compresses_and_keeps_backups(tmp_path):
+    f = str(tmp_path / 'session.es')
+    capture = BufferedFileCapture(f, max_bytes=10, compress=True, backup_count=2)
+    for i in range(5):
+        print(f'line {i} ...', file=capture.file())
+    capture.stop()
+
+    assert sorted(os.listdir(tmp_path)) == ['session.es.2.gz', 'session.es.3.gz', 'session.es.4']
+    with gzip.open(f'{f}.3.gz', 'rt') as ins:
+        assert ins.read() == 'line 3 ...\n'
+    with open(f'{f}.4') as ins:
+        assert ins.read() == 'line 4 ...\n'
+    assert capture.status() == f'Capture with file: {f} (rotated 4 times)'
+
+
+def test_structured_capture_records_one_object_per_line(tmp_path):
+    f = str(tmp_path / 'session.ndjson')
+    capture = StructuredCapture(f)
+    assert capture.file() is None
+    capture.record({'input': 'GET _cluster/health', 'status': 200})
+    capture.record({'input': 'echo "a\\nb"', 'status': None})
+    capture.stop()
+    with open(f) as ins:
+        assert [json.loads(line) for line in ins] == [
+            {'input': 'GET _cluster/health', 'status': 200},
+            {'input': 'echo "a\\nb"', 'status': None},
+        ]
+    assert capture.status() == f'Structured capture with file: {f}'
+
+
+def test_buffered_capture_recovers_from_failed_rotation(tmp_path):
+    f = str(tmp_path / 'session.es')
+    real_gzip_open = gzip.open
+    calls = []
+
+    def failing_gzip_open(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError('No space left on device')
+        return real_gzip_open(*args, **kwargs)
+
+    with patch('peek.capture.gzip.open', failing_gzip_open):
+        capture = BufferedFileCapture(f, max_bytes=10, compress=True)
+        for i in range(3):
+            print(f'line {i} ... é', file=capture.file())
+        capture.stop()
+
+    # The failed rotation is retried with the next line
+    assert sorted(os.listdir(tmp_path)) == ['session.es.1', 'session.es.gz']
+    with gzip.open(f'{f}.gz', 'rt', encoding='utf-8') as ins:
+        assert ins.read() == 'line 0 ... é\nline 1 ... é\n'
+    with open(f'{f}.1', encoding='utf-8') as ins:
+        assert ins.read() == 'line 2 ... é\n'
+    assert capture.status() == (
+        f'Capture with file: {f} (rotated 1 times) (1 writes failed, last error: No space left on device)'
+    )
+
+
+def test_buffered_capture_drops_text_when_writing_falls_behind(tmp_path):
+    f = str(tmp_path / 'session.es')
+    gate = threading.Event()
+    with patch('peek.capture.CAPTURE_MAX_PENDING', 10):
+        capture = BufferedFileCapture(f)
+        write = capture._write
+        capture._write = lambda text: gate.wait(5) and write(text)
+        capture.file().write('a' * 8)
+        while capture._pending:
+            time.sleep(0.01)
+        capture.file().write('b' * 8)
+        capture.file().write('c' * 8)
+        gate.set()
+        capture.stop()
+    with open(f) as ins:
+        assert ins.read() == 'a' * 8 + 'b' * 8
+    assert capture.status() == f'Capture with file: {f} (1 writes dropped as writing fell behind)'
@@ -0,0 +1,17 @@
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from peek import cli
+
+
+@pytest.mark.parametrize('error_count,exit_status', [(0, 0), (2, 1)])
+def test_batch_exit_status_follows_errors(tmpdir, error_count, exit_status):
+    script = tmpdir.join('script.es')
+    script.write('GET /\n')
+    peek = MagicMock(error_count=error_count)
+    with patch.object(sys, 'argv', ['peek', str(script)]), patch('peek.peekapp.PeekApp', return_value=peek):
+        assert cli.main() == exit_status
+    peek.process_stream.assert_called_once()
+    peek.on_exit.assert_called_once()
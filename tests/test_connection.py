@@ -176,6 +176,16 @@ def test_refreshing_es_client_to_and_from_dict():
     assert client.to_dict() == RefreshingEsClient.from_dict(client.to_dict()).to_dict()
 
 
+def test_server_version_is_fetched_once_per_client():
+    mock_app = MagicMock(name='PeekApp')
+    client = connect(mock_app, hosts='example.com:9200')
+    client.perform_request = MagicMock(return_value=MagicMock(body={'version': {'number': '8.15.1'}}))
+
+    assert client.server_version() == '8.15.1'
+    assert client.server_version() == '8.15.1'
+    client.perform_request.assert_called_once_with('GET', '/', deserialize_it=True)
+
+
 @patch.dict(os.environ, {'PEEK_PASSWORD': 'password'})
 def test_es_client_manager():
     mock_app = MagicMock(name='PeekApp')
@@ -0,0 +1,60 @@
+import io
+import os
+import threading
+
+import pytest
+
+from peek.daemon import PeekServer, run_client
+from peek.errors import PeekError
+
+
+class FakeApp:
+    def __init__(self):
+        self.error_count = 0
+        self.received = []
+
+    def process_stream(self, lines):
+        for line in lines:
+            self.received.append(line)
+            if line.startswith('fail'):
+                self.error_count += 1
+            print(f'out: {line}', end='')
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / 'peek.sock')
+
+
+def test_client_receives_output_and_status(socket_path):
+    app = FakeApp()
+    with PeekServer(app, socket_path) as server:
+        assert oct(os.stat(socket_path).st_mode & 0o777) == oct(0o600)
+
+        t = threading.Thread(target=server.handle_request)
+        t.start()
+        out = io.StringIO()
+        assert run_client(socket_path, [io.StringIO('get a\n'), io.StringIO('get b')], out=out) == 0
+        t.join()
+        assert app.received == ['get a\n', '\n', 'get b\n']
+        assert out.getvalue() == 'out: get a\nout: \nout: get b\n'
+
+        t = threading.Thread(target=server.handle_request)
+        t.start()
+        assert run_client(socket_path, [io.StringIO('fail\n')], out=io.StringIO()) == 1
+        t.join()
+        # Errors from earlier clients do not count
+        assert app.error_count == 1
+
+    assert not os.path.exists(socket_path)
+
+
+def test_server_refuses_socket_in_use(socket_path):
+    with PeekServer(FakeApp(), socket_path):
+        with pytest.raises(PeekError):
+            PeekServer(FakeApp(), socket_path)
+
+
+def test_client_without_server(socket_path, capsys):
+    assert run_client(socket_path, [io.StringIO('get a\n')]) == 1
+    assert 'Cannot connect to peek server' in capsys.readouterr().err
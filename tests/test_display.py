@@ -93,7 +93,21 @@ def test_display_will_not_print_header_when_in_batch_mode():
             mock_app.batch_mode = True
             display.info(1)
             print_formatted_text.assert_not_called()
-            mock_print.assert_called_once_with('1', file=mock_stdout, end='')
+            mock_print.assert_not_called()
+            mock_stdout.write.assert_called_once_with('1\n')
+
+
+def test_display_writes_raw_output_when_piped():
+    with patch('peek.display.pygments.lex') as mock_lex, patch('sys.stdout', StringIO()) as stdout:
+        mock_app.capture.file = MagicMock(return_value=None)
+        mock_app.batch_mode = True
+        display.info('{"a":  [1, 2]}')
+        display.info({'b': 'c'})
+        display.info('not json\n')
+        display.info('"hello"')
+        mock_lex.assert_not_called()
+        assert stdout.getvalue() == '{"a":  [1, 2]}\n{"b": "c"}\nnot json\nhello\n'
+    mock_app.batch_mode = False
 
 
 def test_display_will_support_formatted_text():
@@ -113,6 +127,17 @@ def test_display_will_support_formatted_text():
         )
 
 
+def test_display_shows_verbatim_text_as_is():
+    print_formatted_text = MagicMock()
+    with patch('peek.display.print_formatted_text', print_formatted_text):
+        mock_app.batch_mode = False
+        mock_app.capture.file = MagicMock(return_value=None)
+        display.info('{"index":"logs","health":"green"}\n', verbatim=True)
+        print_formatted_text.assert_called_with(
+            '{"index":"logs","health":"green"}\n', style=display.style, style_transformation=display.style_transformation
+        )
+
+
 class _PygmentsToken:
     def __eq__(self, other):
         return type(other) is PygmentsTokens
@@ -122,3 +147,26 @@ class _PygmentsToken:
 
     def __repr__(self):
         return '_PygmentsToken'
+
+
+def test_display_previews_large_output():
+    print_formatted_text = MagicMock()
+    render_config = {'render_limit': 100, 'render_preview_size': 10}
+    with patch('peek.display.print_formatted_text', print_formatted_text), patch.object(
+        mock_app.config, '__contains__', MagicMock(side_effect=lambda x: x in render_config)
+    ), patch.object(mock_app.config, 'as_int', MagicMock(side_effect=lambda x: render_config[x])):
+        mock_app.batch_mode = False
+        mock_app.capture.file = MagicMock(return_value=None)
+
+        display.info('{"a": "' + 'x' * 200 + '"}\n{"b": 1}')
+        source = print_formatted_text.call_args[0][0]
+        assert isinstance(source, FormattedText)
+        assert source[0] == ('', '{"a": "xxx')
+        assert source[1][1].startswith('\n... 218 bytes in 2 lines, showing the first and last 10 characters.')
+        assert source[2] == ('', '}\n{"b": 1}')
+
+        # Small output is still highlighted
+        display.info('"foo"')
+        print_formatted_text.assert_called_with(
+            _PygmentsToken(), style=display.style, style_transformation=display.style_transformation
+        )
@@ -0,0 +1,155 @@
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from configobj import ConfigObj
+
+from peek.errors import PeekError
+from peek.extensions import ExtensionIndex, LazyExport, static_exports
+from peek.natives import HelpFunc
+from peek.parser import PeekParser
+from peek.vm import PeekVM
+
+EXTENSION_SOURCE = '''
+import sys
+
+calls = []
+
+
+class Hello:
+    def __call__(self, app, name):
+        calls.append(name)
+        return f'hello {name}'
+
+    @property
+    def options(self):
+        return {'loud': False}
+
+
+EXPORTS = {
+    'hello': Hello(),
+    'greeting': 'hi',
+    'numbers': [1, 2, (3, 4)],
+}
+'''
+
+
+def test_static_exports():
+    assert static_exports(EXTENSION_SOURCE) == {'hello': None, 'greeting': "'hi'", 'numbers': '[1, 2, (3, 4)]'}
+    # Not a literal dict of string keys or changed after assignment
+    assert static_exports('EXPORTS = dict(a=1)') is None
+    assert static_exports('k = "a"\nEXPORTS = {k: 1}') is None
+    assert static_exports('EXPORTS = {"a": 1}\nEXPORTS["b"] = 2') is None
+    assert static_exports('EXPORTS = {**OTHER}') is None
+    assert static_exports('def broken(:') is None
+    assert static_exports('X = 1') is None
+
+
+def test_extension_index_is_cached_by_mtime(tmp_path):
+    ext = tmp_path / 'ext.py'
+    ext.write_text('EXPORTS = {"a": f}')
+    index_file = str(tmp_path / 'index.json')
+
+    index = ExtensionIndex(index_file)
+    assert index.exports(str(ext)) == {'a': None}
+    index.save()
+
+    index = ExtensionIndex(index_file)
+    assert index._entries[str(ext)]['exports'] == {'a': None}
+    ext.write_text('EXPORTS = {"a": f, "bb": g}')
+    os.utime(ext, ns=(0, 0))
+    assert index.exports(str(ext)) == {'a': None, 'bb': None}
+
+
+@pytest.fixture
+def extension_vm(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path / 'config'))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    ext_dir = tmp_path / 'extensions'
+    ext_dir.mkdir()
+    (ext_dir / 'peek_test_lazy_ext.py').write_text(EXTENSION_SOURCE)
+
+    def make_vm(lazy):
+        app = MagicMock(name='PeekApp')
+        app.config = ConfigObj(
+            {'load_extension': 'True', 'extension_path': str(ext_dir), 'lazy_extension': str(lazy), 'context_file': ''}
+        )
+        app.parser = PeekParser()
+        vm = PeekVM(app)
+        app.vm = vm
+        return vm
+
+    yield make_vm
+    import sys
+
+    sys.modules.pop('peek_test_lazy_ext', None)
+
+
+def test_lazy_extension_is_imported_on_first_use(extension_vm):
+    import sys
+
+    vm = extension_vm(lazy=True)
+    assert 'peek_test_lazy_ext' not in sys.modules
+    assert vm.context['greeting'] == 'hi'
+    assert vm.context['numbers'] == [1, 2, (3, 4)]
+    assert isinstance(vm.context['hello'], LazyExport)
+    assert 'hello' in vm.functions
+    assert 'hello - (not imported yet, from ' in HelpFunc()(vm.app)
+    assert 'peek_test_lazy_ext' not in sys.modules
+
+    vm.execute_node(vm.app.parser.parse('hello "world"')[0])
+    assert 'peek_test_lazy_ext' in sys.modules
+    assert sys.modules['peek_test_lazy_ext'].calls == ['world']
+    assert not isinstance(vm.context['hello'], LazyExport)
+    assert vm.context['hello'].options == {'loud': False}
+
+
+def test_eager_extension_is_imported_at_start(extension_vm):
+    import sys
+
+    vm = extension_vm(lazy=False)
+    assert 'peek_test_lazy_ext' in sys.modules
+    assert not isinstance(vm.context['hello'], LazyExport)
+
+
+def test_lazy_export_missing_after_import(extension_vm, tmp_path):
+    vm = extension_vm(lazy=True)
+    vm.context['gone'] = LazyExport(vm._resolve_lazy_export, str(tmp_path / 'extensions' / 'peek_test_lazy_ext.py'), 'gone')
+    with pytest.raises(PeekError):
+        vm.get_value('gone')
+    assert 'gone' not in vm.context
+
+
+def test_reload_changed_extensions_only(extension_vm, tmp_path):
+    import sys
+
+    vm = extension_vm(lazy=False)
+    vm.context['foo'] = 42
+    module = sys.modules['peek_test_lazy_ext']
+    assert vm.reload_extensions() == []
+
+    ext = tmp_path / 'extensions' / 'peek_test_lazy_ext.py'
+    ext.write_text(EXTENSION_SOURCE.replace("'greeting': 'hi',", "'farewell': 'bye',"))
+    os.utime(ext, ns=(0, 0))
+    other = tmp_path / 'extensions' / 'other.py'
+    other.write_text('EXPORTS = {"other": 1}')
+
+    assert sorted(vm.reload_extensions()) == sorted([str(ext), str(other)])
+    assert sys.modules['peek_test_lazy_ext'] is module
+    assert 'greeting' not in vm.context
+    assert vm.context['farewell'] == 'bye'
+    assert vm.context['other'] == 1
+    assert vm.context['foo'] == 42
+
+    # Names reassigned since the extension was loaded are left alone
+    vm.context['farewell'] = 'mine'
+    ext.write_text(EXTENSION_SOURCE)
+    os.utime(ext, ns=(1, 1))
+    assert vm.reload_extensions() == [str(ext)]
+    assert vm.context['farewell'] == 'mine'
+    assert vm.context['greeting'] == 'hi'
+
+    other.unlink()
+    assert vm.reload_extensions() == [str(other)]
+    assert 'other' not in vm.context
+    sys.modules.pop('other', None)
@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from peek.errors import PeekError
+from peek.formats import flatten, write_rows
+
+SEARCH_RESPONSE = {
+    'hits': {
+        'hits': [
+            {'_id': '1', '_source': {'user': {'name': 'a', 'age': 3}, 'tags': ['x', 'y']}},
+            {'_id': '2', '_source': {'user': {'name': 'b,c'}, 'ok': True, 'note': None}},
+        ]
+    }
+}
+
+CAT_RESPONSE = [
+    {'index': 'logs', 'docs.count': '10'},
+    {'index': 'metrics-with-a-long-name', 'docs.count': '2', 'health': 'green'},
+]
+
+
+def render(data, fmt):
+    outs = io.StringIO()
+    write_rows(data, fmt, outs)
+    return outs.getvalue()
+
+
+def test_flatten():
+    assert flatten({'a': {'b': {'c': 1}, 'd': []}, 'e': {}}) == {'a.b.c': 1, 'a.d': [], 'e': {}}
+
+
+def test_csv_and_tsv():
+    assert render(SEARCH_RESPONSE, 'csv') == (
+        '_id,user.name,user.age,tags,ok,note\n' '1,a,3,"[""x"",""y""]",,\n' '2,"b,c",,,true,\n'
+    )
+    assert render(CAT_RESPONSE, 'tsv') == 'index\tdocs.count\thealth\nlogs\t10\t\nmetrics-with-a-long-name\t2\tgreen\n'
+
+
+def test_ndjson():
+    assert render(CAT_RESPONSE, 'ndjson') == (
+        '{"index":"logs","docs.count":"10"}\n' '{"index":"metrics-with-a-long-name","docs.count":"2","health":"green"}\n'
+    )
+
+
+def test_table():
+    assert render(CAT_RESPONSE, 'table') == (
+        'index                     docs.count  health\n'
+        '------------------------  ----------  ------\n'
+        'logs                      10\n'
+        'metrics-with-a-long-name  2           green\n'
+    )
+
+
+def test_not_rows():
+    with pytest.raises(PeekError):
+        render({'acknowledged': True}, 'csv')
+    with pytest.raises(PeekError):
+        render(CAT_RESPONSE, 'parquet')
@@ -0,0 +1,294 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.document import Document
+
+from peek import history
+from peek.history import HistoryAutoSuggest, RequestRecord, SqLiteHistory, SuggestionIndex, normalize_path
+
+
+@pytest.fixture
+def sqlite_history(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        yield SqLiteHistory()
+
+
+async def _collect(async_gen, limit=None):
+    items = []
+    async for item in async_gen:
+        items.append(item)
+        if limit is not None and len(items) == limit:
+            break
+    return items
+
+
+def test_load_history_strings_in_pages(sqlite_history):
+    with patch.object(history, 'HIST_PAGE_SIZE', 3):
+        for i in range(8):
+            sqlite_history.store_string(f'GET /{i}')
+        assert list(sqlite_history.load_history_strings()) == [f'GET /{i}' for i in reversed(range(8))]
+
+
+def test_load_resumes_from_oldest_loaded_entry(tmpdir):
+    with patch.object(history, 'HIST_PAGE_SIZE', 3), patch.object(history, 'HIST_LOAD_PAGES', 10), patch(
+        'peek.history.config_location', return_value=str(tmpdir) + '/'
+    ):
+        previous_history = SqLiteHistory()
+        for i in range(8):
+            previous_history.store_string(f'GET /{i}')
+        previous_history.close()
+        sqlite_history = SqLiteHistory()
+
+        # Loading is interrupted, e.g. by the prompt returning, after the first page
+        assert asyncio.run(_collect(sqlite_history.load(), limit=3)) == ['GET /7', 'GET /6', 'GET /5']
+        assert sqlite_history.get_strings() == ['GET /5', 'GET /6', 'GET /7']
+
+        sqlite_history.append_string('GET /8')
+        assert asyncio.run(_collect(sqlite_history.load())) == [f'GET /{i}' for i in reversed(range(9))]
+        assert sqlite_history._loaded
+        assert asyncio.run(_collect(sqlite_history.load())) == [f'GET /{i}' for i in reversed(range(9))]
+
+
+def test_load_pauses_until_older_entries_are_wanted(tmpdir):
+    with patch.object(history, 'HIST_PAGE_SIZE', 3), patch.object(history, 'HIST_LOAD_PAGES', 2), patch(
+        'peek.history.config_location', return_value=str(tmpdir) + '/'
+    ):
+        previous_history = SqLiteHistory()
+        for i in range(8):
+            previous_history.store_string(f'GET /{i}')
+        previous_history.close()
+        sqlite_history = SqLiteHistory()
+
+        async def load():
+            items = []
+
+            async def collect():
+                async for item in sqlite_history.load():
+                    items.append(item)
+
+            task = asyncio.create_task(collect())
+            await asyncio.sleep(0.2)
+            assert items == [f'GET /{i}' for i in reversed(range(2, 8))]
+            sqlite_history.load_older()
+            await asyncio.wait_for(task, 5)
+            return items
+
+        assert asyncio.run(load()) == [f'GET /{i}' for i in reversed(range(8))]
+        assert sqlite_history._loaded
+
+
+def test_search(sqlite_history):
+    sqlite_history.store_string('POST _reindex?slices=5\n{"source": {"index": "logs"}}')
+    sqlite_history.store_string('GET logs/_search')
+    sqlite_history.store_string('GET _cat/indices')
+    assert [content for _, content in sqlite_history.search('_reindex')] == [
+        'POST _reindex?slices=5\n{"source": {"index": "logs"}}'
+    ]
+    assert [content for _, content in sqlite_history.search('slic reind')] == [
+        'POST _reindex?slices=5\n{"source": {"index": "logs"}}'
+    ]
+    assert [_id for _id, _ in sqlite_history.search('logs')] == [2, 1]
+    assert sqlite_history.search('logs', size=1) == [(2, 'GET logs/_search')]
+    assert sqlite_history.search('_/') == []
+
+
+def test_search_index_follows_pruning(tmpdir, sqlite_history):
+    assert sqlite_history.fts_enabled
+    for i in range(5):
+        sqlite_history.store_string(f'GET index-{i}/_search')
+    sqlite_history.flush()
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        pruned_history = SqLiteHistory(history_max=2)
+    assert [content for _, content in pruned_history.search('search')] == ['GET index-4/_search', 'GET index-3/_search']
+
+
+def test_search_index_is_created_only_if_asked_for(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        assert not SqLiteHistory(search_index=False).fts_enabled
+        assert SqLiteHistory().fts_enabled
+        # An existing index is kept up-to-date and used
+        batch_history = SqLiteHistory(search_index=False)
+    assert batch_history.fts_enabled
+    batch_history.store_string('GET logs/_search')
+    assert batch_history.search('logs') == [(1, 'GET logs/_search')]
+
+
+def test_search_without_fts(sqlite_history):
+    sqlite_history.fts_enabled = False
+    sqlite_history.store_string('POST _reindex?slices=5')
+    sqlite_history.store_string('GET logs/_search')
+    assert sqlite_history.search('reindex slices') == [(1, 'POST _reindex?slices=5')]
+
+
+def test_writes_are_grouped_into_commits(tmpdir, sqlite_history):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        other_history = SqLiteHistory()
+    sqlite_history.store_string('GET /0')
+    # Committed right away after a quiet period
+    assert other_history.load_recent() == [(1, 'GET /0')]
+
+    sqlite_history.store_string('GET /1')
+    sqlite_history.store_string('GET /2')
+    assert other_history.load_recent() == [(1, 'GET /0')]
+    assert sqlite_history.load_recent() == [(1, 'GET /0'), (2, 'GET /1'), (3, 'GET /2')]
+    assert other_history.load_recent() == [(1, 'GET /0'), (2, 'GET /1'), (3, 'GET /2')]
+
+    sqlite_history.store_string('GET /3')
+    sqlite_history.close()
+    assert other_history.get_entry(3) == (3, 'GET /2')
+    assert other_history.get_entry(4) == (4, 'GET /3')
+
+
+def test_lone_write_is_committed_after_interval(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'), patch.object(
+        history, 'HIST_COMMIT_INTERVAL', 0.2
+    ):
+        sqlite_history = SqLiteHistory()
+        other_history = SqLiteHistory()
+        sqlite_history.store_string('GET /0')
+        sqlite_history.store_string('GET /1')
+        assert other_history.load_recent() == [(1, 'GET /0')]
+        time.sleep(0.5)
+        # Committed by the timer without another write or flush
+        assert other_history.load_recent() == [(1, 'GET /0'), (2, 'GET /1')]
+        sqlite_history.store_string('GET /2')
+        sqlite_history.close()
+        assert other_history.load_recent() == [(1, 'GET /0'), (2, 'GET /1'), (3, 'GET /2')]
+
+
+def test_concurrent_writers(tmpdir):
+    errors = []
+
+    def store(n):
+        try:
+            # Separate connections in threads contend for the database the same way processes do
+            h = SqLiteHistory(history_max=250)
+            for i in range(100):
+                h.store_string(f'GET /{n}/{i}')
+            h.close()
+        except Exception as e:
+            errors.append(e)
+
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        threads = [threading.Thread(target=store, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        assert len(SqLiteHistory(history_max=250).load_recent(size=1000)) == 250
+
+
+def test_session_writes_release_the_write_lock(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'), patch.object(
+        history, 'HIST_BUSY_TIMEOUT', 0.1
+    ):
+        first = SqLiteHistory()
+        first.save_session('a', '{}')
+        first.save_session('b', '{}')
+        assert first.delete_session('a')
+        # Would fail with "database is locked" if the delete was left uncommitted
+        second = SqLiteHistory()
+        assert [name for name, _ in second.list_sessions()] == ['b']
+        first.clear_sessions()
+        third = SqLiteHistory()
+        assert third.list_sessions() == []
+        for h in (first, second, third):
+            h.close()
+
+
+def test_normalize_path():
+    assert normalize_path('/logs-2024.01/_doc/42?refresh') == '/*/_doc/*'
+    assert normalize_path('_cat/indices/logs-*') == '/_cat/indices/*'
+    assert normalize_path('/_cluster/health') == '/_cluster/health'
+    assert normalize_path('/_nodes/abc123/stats') == '/_nodes/*/stats'
+    assert normalize_path('/') == '/'
+
+
+def test_perf_summary(sqlite_history):
+    def record(timestamp, path, elapsed, took=None):
+        sqlite_history.record_request(RequestRecord(timestamp, 'local', 'GET', path, 200, took, elapsed, 0, 100, None))
+
+    record(100, '/*/_search', 0.5, 400)
+    record(110, '/*/_search', 0.3, 200)
+    record(120, '/_cluster/health', 0.01)
+    record(130, '/_cluster/health', 0.01)
+    record(140, '/_cluster/health', 0.01)
+    record(10, '/_cat/indices', 9.0)
+
+    assert sqlite_history.perf_summary(100, 200) == [
+        ('GET', '/*/_search', 2, 0.4, 0.5, 300.0, 200),
+        ('GET', '/_cluster/health', 3, 0.01, 0.01, None, 300),
+    ]
+    assert [r[1] for r in sqlite_history.perf_summary(0, 200, order='frequent', size=2)] == [
+        '/_cluster/health',
+        '/*/_search',
+    ]
+    assert [r[1] for r in sqlite_history.perf_summary(0, 50)] == ['/_cat/indices']
+    with pytest.raises(ValueError):
+        sqlite_history.perf_summary(0, 200, order='largest')
+
+
+def test_suggestion_index():
+    index = SuggestionIndex()
+    index.add('GET _search', 1)
+    index.add('GET _cat/indices', 2)
+    index.add('POST _bulk', 3)
+    assert index.most_recent('GET _') == 'GET _cat/indices'
+    assert index.most_recent('GET _s') == 'GET _search'
+    assert index.most_recent('PUT') is None
+    assert index.most_recent('') is None
+
+    # Results follow newly added lines
+    index.add('GET _search', 4)
+    assert index.most_recent('GET _') == 'GET _search'
+    index.add('GET _cat/indices', 0)
+    assert index.most_recent('GET _') == 'GET _search'
+    index.add('PUT my-index', 5)
+    assert index.most_recent('PUT') == 'PUT my-index'
+    assert len(index) == 4
+
+    index.extend([('PUT other', 6), ('PUT my-index', 7), ('PUT other', 1)])
+    assert index.most_recent('PUT') == 'PUT my-index'
+    assert index.most_recent('PUT o') == 'PUT other'
+    assert len(index) == 5
+
+    # Prefixes ending within or branching off a shared part of lines
+    index.add('GET _search?size=0', 2)
+    assert index.most_recent('GET _search') == 'GET _search'
+    assert index.most_recent('GET _search?') == 'GET _search?size=0'
+    assert index.most_recent('GET _sea') == 'GET _search'
+    assert index.most_recent('GET _sx') is None
+    assert index.most_recent('GET _search?size=01') is None
+
+
+def test_auto_suggest_from_indexed_history(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        previous_history = SqLiteHistory()
+        previous_history.store_string('GET _nodes')
+        previous_history.close()
+        sqlite_history = SqLiteHistory()
+    auto_suggest = HistoryAutoSuggest()
+    buffer = Buffer(history=sqlite_history)
+    sqlite_history.append_string('GET _search\n{"query": {"match_all": {}}}')
+    sqlite_history.append_string('GET _cat/indices')
+
+    def suggest(text):
+        suggestion = auto_suggest.get_suggestion(buffer, Document(text))
+        return suggestion.text if suggestion is not None else None
+
+    assert suggest('GET _') == 'cat/indices'
+    assert suggest('POST x\n{"qu') == 'ery": {"match_all": {}}}'
+    assert suggest('  ') is None
+    assert suggest('GET _n') is None
+    sqlite_history.append_string('GET _search?size=0')
+    assert suggest('GET _') == 'search?size=0'
+
+    # Older entries loaded later are suggested only when nothing more recent matches
+    asyncio.run(_collect(sqlite_history.load()))
+    assert suggest('GET _') == 'search?size=0'
+    assert suggest('GET _n') == 'odes'
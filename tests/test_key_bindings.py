@@ -1,8 +1,10 @@
 from unittest.mock import MagicMock, patch
 
+from prompt_toolkit.buffer import Buffer
 from prompt_toolkit.document import Document
 
-from peek.key_bindings import buffer_should_be_handled
+from peek.history import SqLiteHistory
+from peek.key_bindings import buffer_should_be_handled, history_search_available, show_history_matches
 
 mock_app = MagicMock()
 layout = MagicMock(name='layout')
@@ -134,3 +136,41 @@ def test_multi_line_buffer_will_be_not_handled_if_cursor_line_is_not_blank():
 
     buffer.document = Document('''echo "foo"\n  get / \n  ''', cursor_position=19)
     assert buffer_should_be_handled(mock_app)() is False
+
+
+def test_reverse_search_offers_full_text_matches(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        history = SqLiteHistory()
+    history.store_string('POST _reindex?slices=5\n{"source": {"index": "a"}}')
+    history.store_string('GET _cat/indices')
+    history.store_string('POST _reindex?wait_for_completion=false')
+    b = Buffer(history=history)
+
+    b.text = 'reind slic'
+    b.cursor_position = 0
+    assert show_history_matches(b)
+    assert [c.display_text for c in b.complete_state.completions] == ['POST _reindex?slices=5 ...']
+    assert b.text == 'POST _reindex?slices=5\n{"source": {"index": "a"}}'
+
+    b.reset(Document('reindex'))
+    assert show_history_matches(b)
+    assert b.text == 'POST _reindex?wait_for_completion=false'
+    b.complete_next()
+    assert b.text.startswith('POST _reindex?slices=5')
+
+    b.reset(Document('nothing'))
+    assert not show_history_matches(b)
+    assert b.text == 'nothing'
+    history.close()
+
+
+def test_reverse_search_is_incremental_for_empty_buffer(tmpdir):
+    with patch('peek.history.config_location', return_value=str(tmpdir) + '/'):
+        history = SqLiteHistory()
+    search_app = MagicMock()
+    search_app.current_buffer = Buffer(history=history)
+    with patch('peek.key_bindings.get_app', MagicMock(return_value=search_app)):
+        assert history_search_available()() is False
+        search_app.current_buffer.text = 'GET'
+        assert history_search_available()() is True
+    history.close()
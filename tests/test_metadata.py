@@ -0,0 +1,88 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from peek.metadata import MetadataCompleter, PrefixIndex, TtlCache
+
+
+def _wait_for_loaders():
+    for t in threading.enumerate():
+        if t.name == 'peek-metadata-loader':
+            t.join(5)
+
+
+def test_prefix_index():
+    index = PrefixIndex(['logs-b', 'metrics', 'logs-a', 'logs-a', 'log'])
+    assert len(index) == 4
+    assert 'logs-a' in index
+    assert 'logs' not in index
+    assert index.with_prefix('logs') == ['logs-a', 'logs-b']
+    assert index.with_prefix('log', limit=2) == ['log', 'logs-a']
+    assert index.with_prefix('x') == []
+
+
+def test_ttl_cache_loads_in_background_and_serves_stale_value():
+    cache = TtlCache(ttl=60)
+    values = iter(['first', 'second'])
+    assert cache.get('k', lambda: next(values)) is None
+    _wait_for_loaders()
+    assert cache.get('k', lambda: next(values)) == 'first'
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get('k', lambda: next(values)) == 'first'
+    _wait_for_loaders()
+    cache.ttl = 60
+    assert cache.get('k', lambda: next(values)) == 'second'
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TtlCache(ttl=60, max_entries=2)
+    for k in ('a', 'b'):
+        cache.get(k, lambda k=k: k)
+        _wait_for_loaders()
+    assert cache.get('a', lambda: 'x') == 'a'
+    cache.get('c', lambda: 'c')
+    _wait_for_loaders()
+    assert cache.get('a', lambda: 'x') == 'a'
+    assert cache.get('c', lambda: 'x') == 'c'
+    assert cache.get('b', lambda: 'b') is None
+
+
+def test_metadata_completer():
+    client = MagicMock(name='client')
+
+    def perform_request(method, path, **kwargs):
+        if path.startswith('/_resolve/index/'):
+            body = {
+                'indices': [{'name': 'logs-1'}, {'name': 'metrics-1'}],
+                'aliases': [{'name': 'logs'}],
+                'data_streams': [{'name': 'logs-app'}],
+            }
+        else:
+            body = {'fields': {'user': {'object': {}}, 'user.name': {'keyword': {}}, 'message': {'text': {}}}}
+        return MagicMock(body=body)
+
+    client.perform_request.side_effect = perform_request
+    app = MagicMock(name='PeekApp')
+    app.es_client_manager.current = client
+    completer = MetadataCompleter(app)
+
+    assert completer.complete_targets(['index'], 'lo') == []
+    _wait_for_loaders()
+    completions = completer.complete_targets(['index'], 'metrics-1,lo')
+    assert [(c.text, c.start_position, c.display_meta_text) for c in completions] == [
+        ('logs-1', -2, 'index'),
+        ('logs', -2, 'alias'),
+        ('logs-app', -2, 'data stream'),
+    ]
+    assert [c.text for c in completer.complete_targets(['alias'], 'lo')] == ['logs']
+    assert completer.complete_targets(['node_id'], 'lo') == []
+
+    assert completer.field_names('logs-*', 'u') == []
+    _wait_for_loaders()
+    assert completer.field_names('logs-*', 'u') == ['user.name']
+    client.perform_request.assert_called_with(
+        'GET', '/logs-*/_field_caps?fields=*&filter_path=fields', deserialize_it=True
+    )
+    assert client.perform_request.call_count == 2
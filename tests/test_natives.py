@@ -6,7 +6,8 @@ import pytest
 from configobj import ConfigObj
 
 from peek.connection import ConnectFunc
-from peek.natives import ConnectionFunc, SessionFunc
+from peek.errors import PeekError
+from peek.natives import ConnectionFunc, DownloadApiSpecsFunc, HistoryFunc, SessionFunc
 from peek.peekapp import PeekApp
 
 mock_history = MagicMock()
@@ -228,3 +229,29 @@ def test_version(peek_app):
 
     assert f'v{__version__}' in value
     assert 'elastic_transport' in value
+
+
+def test_history_search(peek_app):
+    mock_history.search = MagicMock(return_value=[(7, 'GET logs/_search'), (3, 'POST _reindex')])
+    assert HistoryFunc()(peek_app, search='logs', size=10) == "     3 'POST _reindex'\n     7 'GET logs/_search'"
+    mock_history.search.assert_called_with('logs', size=10)
+
+
+def test_history_perf(peek_app):
+    mock_history.perf_summary = MagicMock(return_value=[('GET', '/*/_search', 2, 0.4, 0.5, 300.0, 2048)])
+    with patch('peek.natives.time.time', return_value=1000000):
+        assert HistoryFunc()(peek_app, **{'@': ['perf'], 'since': '7d', 'until': '1d'}) == (
+            '  count    avg ms    max ms   took ms   resp KiB  endpoint\n'
+            '      2     400.0     500.0     300.0        2.0  GET /*/_search'
+        )
+    mock_history.perf_summary.assert_called_with(1000000 - 7 * 86400, 1000000 - 86400, order='slowest', size=20)
+
+
+def test_download_api_specs_rejects_version_outside_config_dir(tmpdir):
+    with patch('peek.natives.config_location', return_value=str(tmpdir) + '/'), patch(
+        'peek.natives.get_global_config', return_value={}
+    ), patch('urllib.request.urlopen') as mock_urlopen:
+        for version in ('../../x', '/etc', '..', '9.2/../..', ''):
+            with pytest.raises(PeekError):
+                DownloadApiSpecsFunc()(MagicMock(), version=version)
+        mock_urlopen.assert_not_called()
@@ -0,0 +1,51 @@
+import json
+import re
+
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from peek.pager import Pager
+
+DATA = json.dumps({'nodes': {f'node-{i}': {'name': f'n{i}', 'roles': ['data'], 'up': True} for i in range(100)}}, indent=2)
+
+
+def test_pager_highlights_only_shown_lines():
+    with create_pipe_input() as inp:
+        pager = Pager(DATA, input=inp, output=DummyOutput())
+        inp.send_text('q')
+        pager.run()
+    # Lines of the first screen only
+    assert 0 in pager.control._cache
+    assert max(pager.control._cache) < pager.app.output.get_size().rows
+
+
+def test_pager_search_and_jump_to_key():
+    with create_pipe_input() as inp:
+        pager = Pager(DATA, input=inp, output=DummyOutput())
+        lines = pager.lines
+
+        assert pager.search(re.compile('node-42'))
+        assert lines[pager.control.match_line].strip().startswith('"node-42"')
+        assert pager.control.top == pager.control.match_line
+
+        inp.send_text(':roles\rnnq')
+        pager.run()
+        # Third "roles" key from node-42
+        assert lines.index('    "node-44": {') + 2 == pager.control.match_line
+
+        inp.send_text('/NODE-5\rNq')
+        pager.run()
+        # A new search starts from the top line at node-42, so node-50 is found first and then node-5 before it
+        assert lines[pager.control.match_line] == '    "node-5": {'
+
+        assert not pager.search(re.compile('no such thing'))
+        assert pager.message.startswith('Pattern not found')
+
+
+def test_pager_highlights_json_tokens():
+    pager = Pager('{\n  "a": [1, true, "x"]\n}', output=DummyOutput())
+    fragments = pager.control._get_line(1)
+    assert ''.join(text for _, text in fragments) == '  "a": [1, true, "x"]'
+    styles = {text: style for style, text in fragments}
+    assert 'string.symbol' in styles['"a"']
+    assert 'name.builtin' in styles['true']
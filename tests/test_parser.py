@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from pygments.token import Comment, Literal, Name, String, Whitespace
 
@@ -448,3 +450,103 @@ def test_allow_error_token(parser):
     with pytest.raises(PeekSyntaxError):
         parser.parse(text, fail_fast_on_error_token=False)
     assert len(events) > 0
+
+
+def test_parse_stream(parser):
+    text = '''echo 1 +
+2
+GET /
+{
+  "query": {}
+
+}
+
+
+for x in [1, 2] {
+GET /b
+}
+echo """
+abc
+
+GET
+"""
+// comment
+!ls
+'''
+    streamed = [str(n) for nodes in parser.parse_stream(text.splitlines(keepends=True)) for n in nodes]
+    assert streamed == [str(n) for n in parser.parse(text)]
+    assert len(streamed) == 5
+
+
+def test_parse_stream_yields_complete_statements_early(parser):
+    def lines():
+        yield 'GET /a\n'
+        yield '{"a": 1}\n'
+        yield 'GET /b\n'
+        raise AssertionError('should not read further before the first statement is yielded')
+
+    assert [str(n) for n in next(parser.parse_stream(lines()))] == ['GET /a {}\n{"a":1}\n']
+
+
+def test_parse_stream_incomplete_statement(parser):
+    stream = parser.parse_stream(['GET /a\n', 'GET /b\n', '{"a": \n'])
+    assert len(next(stream)) == 1
+    with pytest.raises(PeekSyntaxError):
+        next(stream)
+
+
+def test_parse_stream_reports_line_of_whole_input(parser):
+    lines = ['GET /a\n', '\n', 'GET /b\n', '{"a": 1,\n', '"b": ]}\n']
+    with pytest.raises(PeekSyntaxError) as e:
+        list(parser.parse_stream(lines))
+    assert str(e.value).startswith('Syntax error at Line 5, Column 6:\n')
+    with pytest.raises(PeekSyntaxError) as whole:
+        parser.parse(''.join(lines))
+    assert str(e.value) == str(whole.value)
+
+
+def test_parse_stream_resumes_after_syntax_error(parser):
+    lines = ['GET /a b=\n', 'GET /b\n', 'PUT /c\n', '{"a": ]\n', '  "b": 1}\n', '\n', 'GET /d\n', 'GET /e @@\n']
+    errors = []
+    streamed = [str(n) for nodes in parser.parse_stream(lines, on_error=errors.append) for n in nodes]
+    assert streamed == ['GET /b {}\n', 'GET /d {}\n']
+    assert [str(e).split(':')[0] for e in errors] == [
+        'Syntax error at Line 1, Column 10',
+        'Syntax error at Line 4, Column 7',
+        'Syntax error at Line 8, Column 8',
+    ]
+
+    # Without on_error, the error is raised as soon as more lines cannot fix it
+    def lines_after_error():
+        yield 'GET /a b=\n'
+        yield 'GET /b\n'
+        yield 'GET /c\n'
+        raise AssertionError('should not read further after the error')
+
+    with pytest.raises(PeekSyntaxError):
+        list(parser.parse_stream(lines_after_error()))
+
+
+def test_parse_stream_after_syntax_error_is_linear(parser):
+    lines = ['GET /a b=\n'] + ['GET /b\n'] * 2000
+    started = time.perf_counter()
+    nodes = [n for nodes in parser.parse_stream(lines, on_error=lambda e: None) for n in nodes]
+    assert len(nodes) == 2000
+    assert time.perf_counter() - started < 10
+
+
+def test_parser_keeps_source_of_statements(parser):
+    text = '''// comment
+conn foo=bar
+GET /a
+{"a": 1}
+
+for x in [1, 2] {
+  echo x
+}
+'''
+    assert [n.source for n in parser.parse(text)] == [
+        'conn foo=bar',
+        'GET /a\n{"a": 1}',
+        'for x in [1, 2] {\n  echo x\n}',
+    ]
@@ -7,8 +7,10 @@ from unittest.mock import MagicMock, call, patch
 
 import pytest
 from configobj import ConfigObj
+from elastic_transport import ApiResponseMeta, HttpHeaders, TransportApiResponse
 
 from peek.common import AUTO_SAVE_NAME
+from peek.errors import PeekError
 from peek.peekapp import PeekApp
 
 
@@ -52,6 +54,92 @@ get abc
     ]
 
 
+def test_batch_mode_does_not_build_completer(config_obj):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        assert peek.prompt is None
+        assert peek._completer is None
+        peek.reset()
+        peek.reload_api_completer()
+        assert peek._completer is None
+
+        # History is opened only when used, without setting up the search index
+        MockHistory.assert_not_called()
+        assert peek.history is MockHistory.return_value
+        MockHistory.assert_called_once_with(config_obj.as_int('history_max'), search_index=False)
+
+
+def test_process_stream_executes_statements_as_they_complete(config_obj):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    nodes = []
+
+    def lines():
+        yield 'get abc\n'
+        yield 'post abc/_doc\n'
+        assert [str(n) for n in nodes] == ['get abc {}\n']
+        yield '{ "foo":\n'
+        yield '  "bar" }\n'
+        yield 'get abc {\n'
+
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.execute_node = lambda stmt: nodes.append(stmt)
+        peek.display = MagicMock()
+        peek.process_stream(lines())
+
+    assert [str(n) for n in nodes] == ['get abc {}\n', 'post abc/_doc {}\n{"foo":"bar"}\n']
+    # The incomplete statement at the end is reported
+    peek.display.error.assert_called_once()
+    assert peek.error_count == 1
+
+
+def test_process_stream_continues_after_syntax_error(config_obj):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    nodes = []
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.execute_node = lambda stmt: nodes.append(stmt)
+        peek.display = MagicMock()
+        peek.process_stream(['get abc b=\n', 'get a\n', 'get b\n', '\n', 'get c\n'])
+
+    assert [str(n) for n in nodes] == ['get a {}\n', 'get b {}\n', 'get c {}\n']
+    peek.display.error.assert_called_once()
+    assert peek.error_count == 1
+
+
+def test_error_count_of_failed_statements(config_obj):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        peek.execute_node = MagicMock(side_effect=[None, PeekError('failed'), RuntimeError('boom')])
+        peek.process_input('get a\nget b\nget c\n')
+        assert peek.error_count == 2
+        peek.process_input('get (')
+        assert peek.error_count == 3
+
+
 @patch('peek.peekapp.PromptSession', MagicMock())
 def test_app_will_not_auto_load_session_by_default(config_obj):
     mock_history = MagicMock()
@@ -240,3 +328,128 @@ def config_obj():
     package_root = os.path.dirname(package_root)
     package_config_file = os.path.join(package_root, 'peekrc')
     return ConfigObj(package_config_file)
+
+
+def test_structured_capture_can_be_run(config_obj, tmp_path):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    f = str(tmp_path / 'session.ndjson')
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        peek.process_input(f'capture @start "{f}"\nlet a = 1\necho a + 1\necho """x\n\ny"""\necho b\ncapture @stop\n')
+
+        with open(f) as ins:
+            entries = [json.loads(line) for line in ins]
+        assert [e['input'] for e in entries] == ['let a = 1', 'echo a + 1', 'echo """x\n\ny"""', 'echo b']
+        assert all(e['duration'] >= 0 and e['status'] is None and e['requests'] == [] for e in entries)
+        assert [e['error'] is not None for e in entries] == [False, False, False, True]
+
+        executed = []
+        execute_node = peek.execute_node
+
+        def record_and_run(node):
+            executed.append(node.source)
+            if node.source.startswith('run '):
+                execute_node(node)
+
+        peek.execute_node = record_and_run
+        peek.process_input(f'run "{f}" echo=false')
+        assert executed == [f'run "{f}" echo=false', 'let a = 1', 'echo a + 1', 'echo """x\n\ny"""', 'echo b']
+
+
+def test_ndjson_without_capture_entries_runs_as_script(config_obj, tmp_path):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    f = tmp_path / 'docs.ndjson'
+    f.write_text('echo 1\necho 2\n')
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        executed = []
+        execute_node = peek.execute_node
+
+        def record_and_run(node):
+            executed.append(node.source)
+            if node.source.startswith('run '):
+                execute_node(node)
+
+        peek.execute_node = record_and_run
+        peek.process_input(f'run "{f}"')
+        assert executed == [f'run "{f}"', 'echo 1', 'echo 2']
+
+
+def test_structured_capture_reports_bad_line(config_obj, tmp_path):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    f = tmp_path / 'session.ndjson'
+    f.write_text('{"input": "echo 1"}\n\n{"output": 1}\n')
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        peek.process_input(f'run "{f}"')
+        error = peek.display.error.call_args[0][0]
+        assert isinstance(error, PeekError)
+        assert 'Line 3 ' in str(error)
+
+
+def test_error_count_of_failed_api_calls(config_obj):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    class HttpError(Exception):
+        status_code = 404
+        info = '{"error": "index_not_found_exception"}'
+
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        peek.es_client_manager = MagicMock()
+        peek.es_client_manager.current.perform_request.side_effect = [
+            ConnectionRefusedError('Connection refused'),
+            HttpError(),
+            TransportApiResponse(ApiResponseMeta(200, '1.1', HttpHeaders(), 0.0, MagicMock()), '{}'),
+        ]
+        peek.process_input('GET /\nGET /missing\nGET /\n')
+        assert peek.error_count == 2
+
+
+def test_structured_capture_records_only_top_level_statements(config_obj, tmp_path):
+    MockHistory = MagicMock(return_value=MagicMock())
+
+    def get_config(_, extra_config):
+        config_obj.merge(ConfigObj(extra_config))
+        return config_obj
+
+    f = str(tmp_path / 'session.ndjson')
+    inner = tmp_path / 'inner.es'
+    inner.write_text('let b = 2\nGET /b\n')
+    with patch('peek.peekapp.get_config', get_config), patch('peek.peekapp.SqLiteHistory', MockHistory):
+        peek = PeekApp(batch_mode=True, extra_config_options=('log_level=None', 'use_keyring=False'))
+        peek.display = MagicMock()
+        peek.es_client_manager = MagicMock()
+        peek.es_client_manager.current.perform_request.return_value = TransportApiResponse(
+            ApiResponseMeta(200, '1.1', HttpHeaders(), 0.0, MagicMock()), '{}'
+        )
+        peek.process_input(f'capture @start "{f}"\nlet a = 1\nrun "{inner}"\nGET /a\ncapture @stop\n')
+
+    with open(f) as ins:
+        entries = [json.loads(line) for line in ins]
+    assert [e['input'] for e in entries] == ['let a = 1', f'run "{inner}"', 'GET /a']
+    assert [[r['path'] for r in e['requests']] for e in entries] == [[], ['/b'], ['/a']]
+    assert entries[1]['status'] == 200
@@ -0,0 +1,57 @@
+import json
+import threading
+import time
+
+from peek.profiling import StartupProfiler
+
+
+def test_startup_profiler_records_nested_phases_in_order():
+    profiler = StartupProfiler(enabled=True)
+    with profiler.phase('vm'):
+        with profiler.phase('a.py', kind='extension'):
+            pass
+    with profiler.phase('connection'):
+        pass
+    profiler.time_imports(['json', 'peek.profiling'])
+
+    assert [(r.kind, r.name, r.depth) for r in profiler.records] == [
+        ('phase', 'vm', 0),
+        ('extension', 'a.py', 1),
+        ('phase', 'connection', 0),
+    ]
+    assert profiler.records[0].seconds >= profiler.records[1].seconds
+
+    table = profiler.report().splitlines()
+    assert table[0].startswith('Startup')
+    assert table[2].startswith('  extension a.py')
+    assert table[-1].startswith('Total')
+
+    data = json.loads(profiler.report('json'))
+    assert [r['name'] for r in data['records']] == ['vm', 'a.py', 'connection']
+
+
+def test_startup_profiler_disabled_records_nothing():
+    profiler = StartupProfiler()
+    with profiler.phase('vm'):
+        pass
+    assert profiler.records == []
+
+
+def test_startup_profiler_reports_background_phase_outside_total():
+    profiler = StartupProfiler(enabled=True)
+    with profiler.phase('vm'):
+        pass
+
+    def load():
+        with profiler.background_phase('schema load'):
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=load)
+    thread.start()
+    thread.join()
+
+    assert [(r.kind, r.name, r.depth) for r in profiler.records] == [('phase', 'vm', 0), ('async', 'schema load', 0)]
+    assert profiler.records[1].seconds >= 0.01
+    data = json.loads(profiler.report('json'))
+    assert data['total'] == profiler.records[0].seconds
+    assert profiler.report().splitlines()[2].startswith('async schema load')
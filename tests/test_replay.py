@@ -0,0 +1,130 @@
+import _thread
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from peek.errors import PeekError
+from peek.replay import load_requests, parse_speed, percentile, replay
+
+
+def _request(timestamp, path='/a', status=200, elapsed=0.01):
+    return {
+        'timestamp': timestamp,
+        'conn': 'prod',
+        'method': 'GET',
+        'path': path,
+        'headers': None,
+        'payload': None,
+        'status': status,
+        'elapsed': elapsed,
+        'response_bytes': 2,
+    }
+
+
+class FakeClient:
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def perform_request(self, method, path, payload, headers=None):
+        with self.lock:
+            self.sent.append((time.monotonic(), method, path))
+        status = self.statuses.get(path, 200)
+        if status >= 400:
+            e = Exception('failed')
+            e.status_code = status
+            raise e
+        return MagicMock(meta=MagicMock(status=status))
+
+
+def test_load_requests_of_structured_capture(tmp_path):
+    f = tmp_path / 'session.ndjson'
+    entries = [
+        {'input': 'let a = 1', 'requests': []},
+        {'input': 'for i in [1, 2] {\nGET /a\n}', 'requests': [_request(1.0), _request(1.5)]},
+        {'input': 'GET /b', 'requests': [_request(2.0, path='/b')]},
+    ]
+    f.write_text(''.join(json.dumps(e) + '\n' for e in entries) + '\n')
+    assert [(r['timestamp'], r['path']) for r in load_requests(str(f))] == [(1.0, '/a'), (1.5, '/a'), (2.0, '/b')]
+
+    f.write_text('GET /a\n')
+    with pytest.raises(PeekError):
+        load_requests(str(f))
+
+
+def test_parse_speed():
+    assert parse_speed(1) == 1.0
+    assert parse_speed('10x') == 10.0
+    assert parse_speed('0.5X') == 0.5
+    assert parse_speed(0) == 0.0
+    for invalid in ('fast', -1, 'infx'):
+        with pytest.raises(PeekError):
+            parse_speed(invalid)
+
+
+def test_percentile():
+    values = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 99) == 10.0
+    assert percentile([], 50) is None
+
+
+def test_replay_scales_original_timing():
+    client = FakeClient()
+    requests = [_request(100.0), _request(101.0, path='/b'), _request(102.0, path='/c')]
+    started = time.monotonic()
+    result = replay(requests, client, speed=10)
+
+    assert [path for _, _, path in client.sent] == ['/a', '/b', '/c']
+    offsets = [t - started for t, _, _ in client.sent]
+    assert offsets[1] >= 0.1 and offsets[2] >= 0.2
+    assert result['sent'] == 3
+    assert result['replay']['elapsed'] >= 0.2
+    assert result['original']['elapsed'] == pytest.approx(2.01)
+
+
+def test_replay_reports_errors_against_original():
+    client = FakeClient(statuses={'/b': 503})
+    requests = [_request(1.0, elapsed=0.01), _request(1.0, path='/b', elapsed=0.02), _request(1.0, status=404)]
+    result = replay(requests, client, speed=0, users=3)
+
+    assert len(client.sent) == 3
+    assert result['original']['errors'] == 1
+    assert result['original']['error_rate'] == pytest.approx(0.3333)
+    assert result['original']['p50_ms'] == 10.0
+    assert result['original']['max_ms'] == 20.0
+    assert result['replay']['errors'] == 1
+    assert result['replay']['p99_ms'] is not None
+
+
+def test_replay_requires_a_user():
+    with pytest.raises(PeekError):
+        replay([_request(1.0)], FakeClient(), users=0)
+
+
+def test_replay_leaves_redacted_credentials_to_the_connection():
+    client = MagicMock()
+    client.perform_request.return_value = MagicMock(meta=MagicMock(status=200))
+    request = dict(_request(1.0), headers={'Authorization': '<redacted>', 'x-opaque-id': 'hourly'})
+    replay([request, _request(1.0)], client, speed=0)
+
+    assert [c.kwargs['headers'] for c in client.perform_request.call_args_list] == [{'x-opaque-id': 'hourly'}, None]
+
+
+def test_replay_interrupted_reports_request_in_flight():
+    def perform_request(method, path, payload, headers=None):
+        _thread.interrupt_main()
+        time.sleep(0.3)
+        return MagicMock(meta=MagicMock(status=200))
+
+    client = MagicMock()
+    client.perform_request.side_effect = perform_request
+    result = replay([_request(1.0), _request(1.0, path='/b')], client, speed=0)
+
+    assert client.perform_request.call_count == 1
+    assert result['sent'] == 1
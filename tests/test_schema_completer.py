@@ -1,6 +1,9 @@
+import json
 import os
+import tempfile
+import threading
 from typing import Iterable
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from configobj import ConfigObj
 from prompt_toolkit.completion import CompleteEvent, Completion
@@ -8,7 +11,9 @@ from prompt_toolkit.document import Document
 
 from peek import __file__ as package_root
 from peek.completer import PeekCompleter
+from peek.es_api_spec.api_completer import NoopESApiCompleter, SchemaESApiCompleter
 from peek.natives import EXPORTS
+from tests.es_api_spec.test_schema import SCHEMA_DATA
 
 package_root = os.path.dirname(package_root)
 schema_file = os.path.join(package_root, 'specs', 'schema.json')
@@ -19,7 +24,11 @@ mock_app.config.as_bool.return_value = True
 mock_app.batch_mode = False
 mock_app.config = ConfigObj({})
 
-completer = PeekCompleter(mock_app)
+# Keep compiled schema caches of tests out of the real config folder
+schema_cache_dir = tempfile.TemporaryDirectory()
+with patch('peek.es_api_spec.schema_cache.default_cache_dir', return_value=schema_cache_dir.name):
+    completer = PeekCompleter(mock_app)
+    completer.wait_for_api_completer()
 
 
 def test_complete_http_method_and_func_name():
@@ -1053,6 +1062,65 @@ def test_query_types():
     )
 
 
+def test_api_completer_is_loaded_in_background():
+    release = threading.Event()
+    api_completer = MagicMock(name='SchemaESApiCompleter')
+
+    def build_api_completer(_):
+        release.wait(5)
+        return api_completer
+
+    with patch.object(PeekCompleter, '_build_api_completer', build_api_completer):
+        background_completer = PeekCompleter(mock_app)
+        assert isinstance(background_completer.api_completer, NoopESApiCompleter)
+        assert no_completion(background_completer.get_completions(Document('get _sec'), CompleteEvent(True)))
+
+        release.set()
+        assert background_completer.wait_for_api_completer(5)
+        assert background_completer.api_completer is api_completer
+
+        # Reloading keeps serving with the existing completer until the new one is ready
+        release.clear()
+        background_completer.init_api_completer()
+        assert background_completer.api_completer is api_completer
+        release.set()
+        assert background_completer.wait_for_api_completer(5)
+
+
+def test_complete_cluster_metadata(tmpdir):
+    schema_filepath = os.path.join(str(tmpdir), 'schema.json')
+    with open(schema_filepath, 'w') as outs:
+        json.dump(SCHEMA_DATA, outs)
+    metadata_app = MagicMock(name='PeekApp')
+    metadata_app.config = ConfigObj(
+        {'metadata_completion': 'True', 'metadata_completion_ttl': '60', 'metadata_completion_max_entries': '8'}
+    )
+    with patch.object(PeekCompleter, '_build_api_completer', lambda _: SchemaESApiCompleter(schema_filepath)), patch(
+        'peek.es_api_spec.schema_cache.default_cache_dir', return_value=str(tmpdir)
+    ):
+        metadata_completer = PeekCompleter(metadata_app)
+        metadata_completer.wait_for_api_completer(5)
+    metadata_completer.metadata_completer = MagicMock(name='MetadataCompleter')
+    metadata_completer.metadata_completer.complete_targets.return_value = [Completion('logs-1', start_position=-2)]
+    metadata_completer.metadata_completer.field_names.return_value = ['user.name']
+
+    def texts(text):
+        return [(c.text, c.start_position) for c in metadata_completer.get_completions(Document(text), CompleteEvent())]
+
+    assert ('logs-1', -2) in texts('get lo')
+    metadata_completer.metadata_completer.complete_targets.assert_called_with(['index'], 'lo')
+    assert ('logs-1', -2) not in texts('get _se')
+
+    assert ('user.name', -1) in texts('get logs-*/_search\n{"query": {"term": {"u')
+    metadata_completer.metadata_completer.field_names.assert_called_with('logs-*', 'u')
+    assert ('user.name', 0) not in texts('get logs-*/_search\n{"query": {"nested": {"u')
+
+    assert ('"user.name"', 0) in texts('get _search\n{"aggs": {"a": {"terms": {"field": ')
+    metadata_completer.metadata_completer.field_names.assert_called_with(None, '')
+    assert ('user.name', -1) in texts('get _search\n{"aggs": {"a": {"terms": {"field": "u')
+    assert ('user.name', -1) not in texts('get _search\n{"query": {"nested": {"path": "u')
+
+
 def equivalent_completions(c0: Completion, c1: Completion):
     return c0.text == c1.text and c0.start_position == c1.start_position
 
@@ -1,5 +1,5 @@
 import os
-from unittest.mock import MagicMock, call
+from unittest.mock import ANY, MagicMock, call
 
 import pytest
 from configobj import ConfigObj
@@ -75,7 +75,7 @@ def test_peek_vm_func(peek_vm, parser):
 def test_peek_vm_es_api_call(peek_vm, parser):
     peek_vm.execute_node(parser.parse('GET /')[0])
     peek_vm.app.display.info.assert_called_with(
-        '{"foo": [1, 2, 3, 4], "bar": {"hello": [42, "world"]}}', header_text='took=0.000ms'
+        '{"foo": [1, 2, 3, 4], "bar": {"hello": [42, "world"]}}', header_text='took=0.000ms', verbatim=False
     )
     assert peek_vm.get_value('_') == {'foo': [1, 2, 3, 4], 'bar': {'hello': [42, 'world']}}
     peek_vm.execute_node(parser.parse('debug _."bar".@hello.1')[0])
@@ -88,6 +88,41 @@ def test_peek_vm_es_api_call(peek_vm, parser):
     )
 
 
+def test_es_api_call_records_request_perf(peek_vm, parser):
+    es_client = peek_vm.app.es_client_manager.current
+    es_client.perform_request.return_value = TransportApiResponse(
+        ApiResponseMeta(200, "1.1", HttpHeaders(), 0.0, MagicMock()), '{"took": 12, "hits": {}}'
+    )
+    peek_vm.execute_node(parser.parse('POST /logs-1/_search?size=0 xoid="daily"\n{"query": {}}')[0])
+    record = peek_vm.app.history.record_request.call_args[0][0]
+    assert (record.method, record.path, record.status, record.took) == ('POST', '/*/_search', 200, 12)
+    assert (record.request_bytes, record.response_bytes, record.opaque_id) == (14, 24, 'daily')
+    assert record.conn == str(es_client)
+
+    peek_vm.execute_node(parser.parse('GET / headers={"X-Opaque-Id": "hourly"}')[0])
+    assert peek_vm.app.history.record_request.call_args[0][0].opaque_id == 'hourly'
+
+    peek_vm.app.config['record_request_perf'] = 'False'
+    peek_vm.app.history.record_request.reset_mock()
+    peek_vm.execute_node(parser.parse('GET /')[0])
+    peek_vm.app.history.record_request.assert_not_called()
+
+
+def test_es_api_call_appends_to_request_log(peek_vm, parser):
+    peek_vm.app.config['record_request_perf'] = 'False'
+    peek_vm.execute_node(parser.parse('GET /')[0])
+    assert peek_vm.request_log is None
+
+    peek_vm.request_log = []
+    peek_vm.execute_node(parser.parse('POST /logs-1/_search xoid="daily"\n{"query": {}}')[0])
+    (request,) = peek_vm.request_log
+    assert (request['method'], request['path'], request['payload']) == ('POST', '/logs-1/_search', '{"query": {}}\n')
+    assert (request['headers'], request['status'], request['response_bytes']) == ({'x-opaque-id': 'daily'}, 200, 54)
+
+    peek_vm.execute_node(parser.parse('GET / runas="admin" headers={"Authorization": "ApiKey c2VjcmV0"}')[0])
+    assert peek_vm.request_log[-1]['headers'] == {'Authorization': '<redacted>', 'es-security-runas-user': '<redacted>'}
+
+
 def test_es_api_call_quiet(peek_vm, parser):
     peek_vm.execute_node(parser.parse('GET / quiet=true')[0])
     peek_vm.app.display.info.assert_not_called()
@@ -197,3 +232,27 @@ def test_maybe_encode_date_math():
         _maybe_encode_date_math('/<logstash-{now/d-2d}>,<logstash-{now/d-1d}>,<logstash-{now/d}>/_search')
         == '/%3Clogstash-%7Bnow%2Fd-2d%7D%3E,%3Clogstash-%7Bnow%2Fd-1d%7D%3E,%3Clogstash-%7Bnow%2Fd%7D%3E/_search'
     )
+
+
+def test_output_format(peek_vm, parser, tmp_path):
+    es_client = peek_vm.app.es_client_manager.get_client()
+    es_client.perform_request = MagicMock(
+        return_value=TransportApiResponse(
+            ApiResponseMeta(200, '1.1', HttpHeaders(), 0.0, MagicMock()),
+            '[{"index": "logs", "health": "green"}, {"index": "metrics", "health": "yellow"}]',
+        )
+    )
+    peek_vm.execute_node(parser.parse('GET _cat/indices format="csv"')[0])
+    es_client.perform_request.assert_called_with('GET', '/_cat/indices', None, headers={'accept': 'application/json'})
+    peek_vm.app.display.info.assert_called_with(
+        'index,health\nlogs,green\nmetrics,yellow\n', header_text=ANY, verbatim=True
+    )
+
+    peek_vm.execute_node(parser.parse('GET _cat/indices format="xml"')[0])
+    assert str(peek_vm.app.display.error.call_args[0][0]) == (
+        "Unknown output format: 'xml', must be one of table, csv, tsv, ndjson"
+    )
+
+    out = tmp_path / 'indices.tsv'
+    peek_vm.execute_node(parser.parse(f'GET _cat/indices format="tsv" out="{out}"')[0])
+    assert out.read_text() == 'index\thealth\nlogs\tgreen\nmetrics\tyellow\n'